@@ -0,0 +1,34 @@
+from services.logger import start_request, end_request
+from services.resilience import request_deadline, start_deadline, end_deadline
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+class RequestContextMiddleware:
+    """
+    Gives every HTTP request a request id (the caller's X-Request-ID, or a new one) that is
+    stamped on its log records and echoed in the response headers, and a deadline
+    (REQUEST_DEADLINES) its stages draw their timeouts from. Plain ASGI, so streamed
+    responses keep the context until their last chunk.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER)
+        request_id, tokens = start_request(incoming.decode("latin-1")[:64] if incoming else None)
+        deadline_token = start_deadline(request_deadline(scope["path"]))
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            end_deadline(deadline_token)
+            end_request(tokens)
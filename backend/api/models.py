@@ -1,32 +1,79 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
 
 class VerseResult(BaseModel):
+    """One search hit, a Quran verse or a hadith; corpus says which fields are set"""
     id: int
     score: float
-    quran_id: int
-    surah_id: int
-    ayah_id: int
-    juz_id: int
-    surah_type: str
+    corpus: str = "quran"
     arabic_text: str
     english_text: str
     urdu_text: str
+    # Quran verses
+    quran_id: Optional[int] = None
+    surah_id: Optional[int] = None
+    ayah_id: Optional[int] = None
+    juz_id: Optional[int] = None
+    surah_type: Optional[str] = None
     surah_name_ar: Optional[str] = ""
     surah_name_ur: Optional[str] = ""
     surah_name_en: Optional[str] = ""
     transliteration: Optional[str] = ""
+    # Hadith
+    hadith_id: Optional[int] = None
+    book_id: Optional[int] = None
+    chapter_id: Optional[int] = None
+    book: Optional[str] = None
+    chapter_name_ar: Optional[str] = None
+    chapter_name_ur: Optional[str] = None
+    chapter_name_en: Optional[str] = None
+    narrator: Optional[str] = None
+    status: Optional[str] = None
 
 class LLMExplanation(BaseModel):
     urdu: str
-    verses_used: List[int]
+    verses_used: List[Union[int, str]]   # quran_id, or "<corpus>:<hadith_id>" for hadith
 
 class SearchResponse(BaseModel):
     query: str
     processed_query: str
     top_results: List[VerseResult]
     llm_explanation: LLMExplanation
+    skipped_corpora: List[str] = []   # corpora that timed out or failed
 
 class Query(BaseModel):
     text: str
-    top_k: int = 5
\ No newline at end of file
+    top_k: int = 5
+    # Corpora to search (names from settings.CORPORA, default DEFAULT_CORPORA)
+    corpora: Optional[List[str]] = None
+    # Quran metadata filters, applied inside the search (ignored by hadith corpora)
+    surah_ids: Optional[List[int]] = None
+    juz_ids: Optional[List[int]] = None
+    surah_type: Optional[str] = None   # as stored in the payload, e.g. "Meccan"
+    # Hybrid fusion overrides (defaults from settings)
+    fusion: Optional[Literal["rrf", "weighted", "server"]] = None
+    dense_weight: Optional[float] = None
+    sparse_weight: Optional[float] = None
+
+class BatchQuery(BaseModel):
+    queries: List[str]
+    top_k: int = 5
+    corpora: Optional[List[str]] = None
+    surah_ids: Optional[List[int]] = None
+    juz_ids: Optional[List[int]] = None
+    surah_type: Optional[str] = None
+    fusion: Optional[Literal["rrf", "weighted", "server"]] = None
+    dense_weight: Optional[float] = None
+    sparse_weight: Optional[float] = None
+    # LLM explanations are off by default; bulk and evaluation jobs usually only need results
+    explain: bool = False
+
+class BatchSearchResult(BaseModel):
+    query: str
+    processed_query: str
+    top_results: List[VerseResult]
+    llm_explanation: Optional[LLMExplanation] = None
+
+class BatchSearchResponse(BaseModel):
+    results: List[BatchSearchResult]   # same order as BatchQuery.queries
+    skipped_corpora: List[str] = []
@@ -1,129 +1,130 @@
-from fastapi import APIRouter, HTTPException
-from api.models import Query, SearchResponse
-from services.embedding_service import get_embeddings_from_colab
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from api.models import Query, SearchResponse, VerseResult, BatchQuery, BatchSearchResponse
+from services.embedding_service import get_embeddings, get_embeddings_batch, embedding_batcher
+from services.embedding_cache import embedding_cache
+from services.explanation_cache import explanation_cache
 from services.qdrant_service import qdrant_service
-from services.postgres_service import get_verse_texts_from_db
-from services.llm_service import get_llm_explanation
+from services.search_filters import request_filters
+from services.corpus_search import search_corpora, search_corpora_batch, result_ref
+from config.settings import SEARCH_ENGINE, CORPORA, DEFAULT_CORPORA, SEARCH_BATCH_MAX_QUERIES, SEARCH_BATCH_LLM_CONCURRENCY, METRICS_ENABLED, ADMIN_TOKEN
+from services.metrics import STAGE_SECONDS, observe, timed, count_fallback, render
+from services.postgres_service import get_pool_metrics
+from services.resilience import breaker_stats
+from services.prompt_builder import prompt_tokenizer
+from services.llm_service import get_llm_explanation, stream_llm_explanation
 from services.logger import logger
+import asyncio
+import json
+import secrets
+import time
 import traceback
 
 router = APIRouter()
 
+def _require_admin(token):
+    """404 while admin endpoints are disabled (no ADMIN_TOKEN), 403 on a wrong token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(404, "Admin endpoints are disabled (ADMIN_TOKEN)")
+    if not token or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(403, "Invalid admin token")
+
+def _corpora(requested):
+    """Requested corpora (default DEFAULT_CORPORA); 400 on unknown names"""
+    corpora = requested or DEFAULT_CORPORA
+    unknown = [corpus for corpus in corpora if corpus not in CORPORA]
+    if unknown:
+        raise HTTPException(400, f"Unknown corpora: {', '.join(unknown)} (available: {', '.join(CORPORA)})")
+    return corpora
+
+async def _retrieve(query: Query, endpoint: str):
+    """
+    Embed the query, then search the requested corpora concurrently and merge their
+    results. Returns (processed_text, formatted_results, skipped_corpora).
+    endpoint labels the stage metrics.
+    """
+    corpora = _corpora(query.corpora)
+    
+    # 1. Get query embeddings
+    logger.debug("🚀 Step 1/2: Getting embeddings...")
+    start = time.perf_counter()
+    embeddings, processed_text = await get_embeddings(query.text)
+    embedded = time.perf_counter()
+    observe(STAGE_SECONDS, embedded - start, endpoint=endpoint, stage="embed")
+    logger.debug(f"⏱️ Embedding {(embedded - start) * 1000:.1f}ms")
+    
+    # 2. Hybrid search + texts per corpus (Quran through the search engine and verse store)
+    logger.debug(f"🚀 Step 2/2: Searching {', '.join(corpora)} ({SEARCH_ENGINE})...")
+    with timed(STAGE_SECONDS, endpoint=endpoint, stage="retrieve"):
+        formatted_results, timed_out, failed = await search_corpora(
+            embeddings,
+            corpora,
+            query.top_k,
+            fusion=query.fusion,
+            dense_weight=query.dense_weight,
+            sparse_weight=query.sparse_weight,
+            filters=request_filters(query)
+        )
+    
+    if not formatted_results:
+        if timed_out:
+            raise HTTPException(504, f"Search timed out for {', '.join(timed_out)}")
+        if failed:
+            raise HTTPException(500, f"Search failed for {', '.join(failed)}")
+        raise HTTPException(404, "No verses found matching your query")
+    
+    return processed_text, formatted_results, timed_out + failed
+
+def _llm_inputs(formatted_results):
+    """Arabic texts, Urdu texts and verse (or hadith) ids passed to the LLM"""
+    arabic_texts = [result["arabic_text"] for result in formatted_results if result["arabic_text"]]
+    urdu_texts = [result["urdu_text"] for result in formatted_results if result["urdu_text"]]
+    verse_ids = [result_ref(result) for result in formatted_results]
+    return arabic_texts, urdu_texts, verse_ids
+
+def _sse(event: str, data) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @router.post("/search", response_model=SearchResponse)
 async def search_quran(query: Query):
-    logger.info(f"🔍 HYBRID SEARCH REQUEST")
-    logger.info(f"  Query: '{query.text}'")
-    logger.info(f"  Top K: {query.top_k}")
+    logger.info(f"🔍 HYBRID SEARCH REQUEST: '{query.text}' (top_k={query.top_k})")
+    start = time.perf_counter()
     
     try:
-        # 1. Get embeddings from Colab
-        logger.info("🚀 Step 1/5: Getting embeddings from Colab...")
-        embeddings, processed_text = await get_embeddings_from_colab(query.text)
-        
-        # 2. Hybrid search in Qdrant
-        logger.info("🚀 Step 2/5: Hybrid search in Qdrant...")
-        try:
-            hits = qdrant_service.search(embeddings, query.top_k)
-            logger.info(f"✅ Qdrant search successful, got {len(hits) if hits else 0} hits")
-        except Exception as qdrant_error:
-            logger.error(f"❌ Qdrant search failed: {qdrant_error}")
-            raise HTTPException(500, f"Qdrant search failed: {str(qdrant_error)}")
-        
-        if not hits:
-            raise HTTPException(404, "No verses found matching your query")
-        
-        # 3. Extract verse details
-        logger.info("🚀 Step 3/5: Extracting verse details...")
-        verse_details = []
-        for i, hit in enumerate(hits):
-            try:
-                payload = hit.payload or {}
-                verse_details.append({
-                    "quran_id": payload.get("quran_id"),
-                    "surah_id": payload.get("surah_id"),
-                    "ayah_id": payload.get("ayah_id"),
-                    "juz_id": payload.get("juz_id"),
-                    "surah_type": payload.get("surah_type"),
-                    "hit_id": hit.id,
-                    "score": float(hit.score) if hasattr(hit, 'score') else 0.0
-                })
-                logger.info(f"  Verse {i+1}: ID={hit.id}, Quran_ID={payload.get('quran_id')}")
-            except Exception as e:
-                logger.error(f"Error processing hit {i}: {e}")
-                continue
+        processed_text, formatted_results, skipped_corpora = await _retrieve(query, "search")
         
-        # 4. Get verse texts from PostgreSQL
-        logger.info("🚀 Step 4/5: Fetching from PostgreSQL...")
+        # 3. Get LLM explanation
+        logger.debug("🤖 Getting LLM explanation...")
         try:
-            verse_texts = get_verse_texts_from_db(verse_details)
-            logger.info(f"✅ Retrieved {len(verse_texts)} verses from PostgreSQL")
-        except Exception as pg_error:
-            logger.error(f"❌ PostgreSQL error: {pg_error}")
-            verse_texts = []
-        
-        # 5. Format results
-        logger.info("🚀 Step 5/5: Formatting results...")
-        formatted_results = []
-        for i, detail in enumerate(verse_details):
-            try:
-                # Match verse_text with detail by quran_id
-                matched_text = next(
-                    (text for text in verse_texts if text["quran_id"] == detail["quran_id"]),
-                    {}
-                )
-                
-                result = {
-                    "id": detail["hit_id"],
-                    "score": detail["score"],
-                    "quran_id": detail["quran_id"],
-                    "surah_id": detail["surah_id"],
-                    "ayah_id": detail["ayah_id"],
-                    "juz_id": detail["juz_id"],
-                    "surah_type": detail["surah_type"],
-                    "arabic_text": matched_text.get("text_ar", f"Verse {detail['quran_id']}"),
-                    "english_text": matched_text.get("text_en", f"Verse {detail['quran_id']}"),
-                    "urdu_text": matched_text.get("text_ur", f"آیت {detail['quran_id']}"),
-                    "surah_name_ar": matched_text.get("surah_name_ar", ""),
-                    "surah_name_ur": matched_text.get("surah_name_ur", ""),
-                    "surah_name_en": matched_text.get("surah_name_en", ""),
-                    "transliteration": matched_text.get("transliteration", "")
-                }
-                formatted_results.append(result)
-                
-                logger.info(f"  Formatted result {i+1}: Surah {detail['surah_id']}:{detail['ayah_id']}")
-                
-            except Exception as e:
-                logger.error(f"Error formatting result {i}: {e}")
-                continue
-        
-        # 6. Get LLM explanation
-        logger.info("🤖 Getting LLM explanation...")
-        try:
-            arabic_texts = [result["arabic_text"] for result in formatted_results if result["arabic_text"]]
-            urdu_texts = [result["urdu_text"] for result in formatted_results if result["urdu_text"]]
-            verse_ids = [detail["quran_id"] for detail in verse_details]
+            arabic_texts, urdu_texts, verse_ids = _llm_inputs(formatted_results)
             
-            llm_explanation = get_llm_explanation(
-                query.text, 
-                arabic_texts, 
-                urdu_texts, 
-                verse_ids
-            )
-            logger.info(f"✅ LLM explanation generated ({len(llm_explanation.urdu)} chars)")
+            with timed(STAGE_SECONDS, endpoint="search", stage="llm"):
+                llm_explanation = await get_llm_explanation(
+                    query.text, 
+                    arabic_texts, 
+                    urdu_texts, 
+                    verse_ids
+                )
+            logger.debug(f"✅ LLM explanation generated ({len(llm_explanation.urdu)} chars)")
         except Exception as llm_error:
             logger.error(f"❌ LLM error: {llm_error}")
+            count_fallback("llm")
             llm_explanation = {
                 "urdu": f"سوال '{query.text}' کے بارے میں وضاحت تیار کی جا رہی ہے۔",
-                "verses_used": [detail["quran_id"] for detail in verse_details[:3]]
+                "verses_used": [result_ref(result) for result in formatted_results[:3]]
             }
         
-        logger.info(f"🎉 SEARCH COMPLETE! Found {len(formatted_results)} verses")
+        total = time.perf_counter() - start
+        observe(STAGE_SECONDS, total, endpoint="search", stage="total")
+        logger.info(f"🎉 SEARCH COMPLETE! Found {len(formatted_results)} verses in {total * 1000:.0f}ms")
         
         return SearchResponse(
             query=query.text,
             processed_query=processed_text,
             top_results=formatted_results,
-            llm_explanation=llm_explanation
+            llm_explanation=llm_explanation,
+            skipped_corpora=skipped_corpora
         )
         
     except HTTPException as http_err:
@@ -134,15 +135,182 @@ async def search_quran(query: Query):
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(500, f"Search error: {str(e)}")
 
+@router.post("/search/stream")
+async def search_quran_stream(query: Query):
+    """
+    Streaming /search over Server-Sent Events: a `results` event with top_results as
+    soon as retrieval is done, `token` events with explanation chunks, then `done`
+    with the full explanation and timings (results_ms is the time to first byte).
+    """
+    logger.info(f"🔍 STREAMING SEARCH REQUEST: '{query.text}' (top_k={query.top_k})")
+    start = time.perf_counter()
+    
+    try:
+        processed_text, formatted_results, skipped_corpora = await _retrieve(query, "stream")
+    except HTTPException as http_err:
+        logger.error(f"HTTP Exception: {http_err.detail}")
+        raise
+    except Exception as e:
+        logger.error(f"🚨 UNEXPECTED ERROR in stream endpoint: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(500, f"Search error: {str(e)}")
+    
+    arabic_texts, urdu_texts, verse_ids = _llm_inputs(formatted_results)
+    
+    async def events():
+        results_ms = (time.perf_counter() - start) * 1000
+        yield _sse("results", {
+            "query": query.text,
+            "processed_query": processed_text,
+            "top_results": [VerseResult(**result).model_dump() for result in formatted_results],
+            "skipped_corpora": skipped_corpora,
+            "timings": {"results_ms": round(results_ms, 1)}
+        })
+        
+        first_token_ms = None
+        chunks = []
+        try:
+            async for chunk in stream_llm_explanation(query.text, arabic_texts, urdu_texts, verse_ids):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                    observe(STAGE_SECONDS, first_token_ms / 1000, endpoint="stream", stage="first_token")
+                chunks.append(chunk)
+                yield _sse("token", {"text": chunk})
+        except Exception as llm_error:
+            logger.error(f"❌ LLM stream error: {llm_error}")
+            yield _sse("error", {"detail": str(llm_error)})
+        
+        total_ms = (time.perf_counter() - start) * 1000
+        observe(STAGE_SECONDS, (total_ms - results_ms) / 1000, endpoint="stream", stage="llm")
+        observe(STAGE_SECONDS, total_ms / 1000, endpoint="stream", stage="total")
+        timings = {
+            "results_ms": round(results_ms, 1),
+            "first_token_ms": round(first_token_ms, 1) if first_token_ms is not None else None,
+            "total_ms": round(total_ms, 1)
+        }
+        logger.info(f"🎉 STREAM COMPLETE! results={timings['results_ms']}ms first_token={timings['first_token_ms']}ms total={timings['total_ms']}ms")
+        yield _sse("done", {
+            "llm_explanation": {"urdu": "".join(chunks), "verses_used": verse_ids},
+            "timings": timings
+        })
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_batch(batch: BatchQuery):
+    """
+    Many queries in one request: one batched embedding call, one batched search per
+    corpus and one text fetch for the union of hits. Results keep the order of
+    batch.queries; explanations (explain=true) run SEARCH_BATCH_LLM_CONCURRENCY at a time.
+    """
+    logger.info(f"🔍 BATCH SEARCH REQUEST: {len(batch.queries)} queries, top_k={batch.top_k}, explain={batch.explain}")
+    if not batch.queries:
+        raise HTTPException(400, "queries must not be empty")
+    if len(batch.queries) > SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(413, f"At most {SEARCH_BATCH_MAX_QUERIES} queries per batch")
+    corpora = _corpora(batch.corpora)
+    start = time.perf_counter()
+    
+    try:
+        with timed(STAGE_SECONDS, endpoint="batch", stage="embed"):
+            embedded = await get_embeddings_batch(batch.queries)
+        with timed(STAGE_SECONDS, endpoint="batch", stage="retrieve"):
+            results_per_query, timed_out, failed = await search_corpora_batch(
+                [embeddings for embeddings, _ in embedded],
+                corpora,
+                batch.top_k,
+                fusion=batch.fusion,
+                dense_weight=batch.dense_weight,
+                sparse_weight=batch.sparse_weight,
+                filters=request_filters(batch)
+            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"🚨 UNEXPECTED ERROR in batch endpoint: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(500, f"Search error: {str(e)}")
+    
+    if len(failed) + len(timed_out) == len(corpora):
+        status = 504 if timed_out else 500
+        raise HTTPException(status, f"Search failed for {', '.join(timed_out + failed)}")
+    
+    explanations = [None] * len(batch.queries)
+    if batch.explain:
+        semaphore = asyncio.Semaphore(SEARCH_BATCH_LLM_CONCURRENCY)
+        
+        async def explain(i):
+            if not results_per_query[i]:
+                return
+            async with semaphore:
+                try:
+                    explanations[i] = await get_llm_explanation(batch.queries[i], *_llm_inputs(results_per_query[i]))
+                except Exception as llm_error:
+                    logger.error(f"❌ LLM error for batch query {i}: {llm_error}")
+        
+        with timed(STAGE_SECONDS, endpoint="batch", stage="llm"):
+            await asyncio.gather(*(explain(i) for i in range(len(batch.queries))))
+    
+    observe(STAGE_SECONDS, time.perf_counter() - start, endpoint="batch", stage="total")
+    logger.info(f"🎉 BATCH COMPLETE! {len(batch.queries)} queries in {(time.perf_counter() - start) * 1000:.0f}ms")
+    return BatchSearchResponse(
+        results=[
+            {
+                "query": text,
+                "processed_query": processed_text,
+                "top_results": results,
+                "llm_explanation": explanation
+            }
+            for text, (_, processed_text), results, explanation in zip(batch.queries, embedded, results_per_query, explanations)
+        ],
+        skipped_corpora=timed_out + failed
+    )
+
 @router.get("/health")
 async def health():
-    logger.info("Health check request")
+    logger.debug("Health check request")
     return {
         "status": "healthy", 
         "service": "Quran Search API",
-        "qdrant": "connected" if qdrant_service else "disconnected"
+        "qdrant": "connected" if qdrant_service else "disconnected",
+        "qdrant_layout": qdrant_service.layout,
+        "qdrant_collection": qdrant_service.dense_collection,
+        "search_engine": SEARCH_ENGINE,
+        "corpora": {name: config["collection"] for name, config in CORPORA.items()},
+        "postgres_pool": get_pool_metrics(),
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "embedding_batcher": embedding_batcher.stats() if embedding_batcher else None,
+        "explanation_cache": explanation_cache.stats() if explanation_cache else None,
+        "circuit_breakers": breaker_stats(),
+        "prompt_tokenizer": prompt_tokenizer.stats()
     }
 
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latency histograms and fallback counters"""
+    if not METRICS_ENABLED:
+        raise HTTPException(404, "Metrics are disabled (METRICS_ENABLED)")
+    body, content_type = render()
+    return Response(body, media_type=content_type)
+
+@router.post("/admin/qdrant/refresh-alias", include_in_schema=False)
+async def refresh_qdrant_alias(x_admin_token: str = Header(None)):
+    """Follow the Qdrant alias to its current build right after a swap or rollback"""
+    _require_admin(x_admin_token)
+    previous = qdrant_service.dense_collection
+    try:
+        collection = await qdrant_service.refresh_alias()
+    except Exception as e:
+        logger.error(f"Alias refresh failed: {e}")
+        raise HTTPException(500, f"Alias refresh failed: {str(e)}")
+    if collection is None:
+        raise HTTPException(409, f"Qdrant layout is {qdrant_service.layout}, there is no alias to refresh")
+    return {"previous": previous, "collection": collection, "changed": previous != collection}
+
 @router.get("/test-qdrant")
 async def test_qdrant():
     """Test Qdrant connection"""
@@ -152,7 +320,7 @@ async def test_qdrant():
             "dense": [0.01] * 1024,
             "sparse": {"indices": [1, 2, 3], "values": [0.1, 0.2, 0.3]}
         }
-        results = qdrant_service.search(dummy_embeddings, 2)
+        results = await qdrant_service.search(dummy_embeddings, 2)
         return {
             "status": "success",
             "qdrant_working": True,
@@ -174,7 +342,10 @@ async def root():
         "version": "2.0.0",
         "endpoints": {
             "search": "POST /search",
+            "search_stream": "POST /search/stream (Server-Sent Events)",
+            "search_batch": "POST /search/batch",
             "health": "GET /health",
+            "metrics": "GET /metrics (Prometheus)",
             "test_qdrant": "GET /test-qdrant",
             "docs": "GET /docs"
         }
@@ -0,0 +1,117 @@
+"""
+Throughput of N single POST /search calls vs one POST /search/batch with the same N queries.
+
+Embeddings come from the fake /embed server (mounted in-process, query cache off, so every
+query is encoded); Qdrant and the verse fetch are stubs charging a fixed round-trip latency
+per call plus a small per-query cost; the LLM answers instantly so only retrieval is measured.
+Run from the backend directory:
+    python -m benchmarks.bench_batch_search --queries 200 --concurrency 16
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+
+from api import routes
+from api.models import LLMExplanation
+from benchmarks.fake_embed_server import create_app
+from main import app
+from services import corpus_search, embedding_service
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+
+def install_stubs(search_rtt, search_per_query, pg_rtt, counters):
+    """Fixed-latency stand-ins for the Qdrant search, the verse fetch and the LLM"""
+
+    def hits(top_k, seed):
+        return [
+            SimpleNamespace(
+                id=(seed * 7 + i) % 6236 + 1,
+                score=1.0 - i * 0.01,
+                payload={"quran_id": (seed * 7 + i) % 6236 + 1, "surah_id": 1, "ayah_id": i + 1, "juz_id": 1, "surah_type": "Meccan"}
+            )
+            for i in range(top_k)
+        ]
+
+    async def search(embeddings, top_k=5, **options):
+        counters["search"].calls += 1
+        await asyncio.sleep(search_rtt + search_per_query)
+        return hits(top_k, int(embeddings["dense"][0] * 1e6))
+
+    async def search_batch(embeddings_list, top_k=5, **options):
+        counters["search"].calls += 1
+        await asyncio.sleep(search_rtt + search_per_query * len(embeddings_list))
+        return [hits(top_k, int(e["dense"][0] * 1e6)) for e in embeddings_list]
+
+    async def verse_texts(verse_details):
+        counters["pg"].calls += 1
+        await asyncio.sleep(pg_rtt)
+        return [
+            {"quran_id": d["quran_id"], "text_ar": "نص", "text_ur": "متن", "text_en": "text"}
+            for d in verse_details
+        ]
+
+    async def llm(query, arabic_texts, urdu_texts, verse_ids):
+        return LLMExplanation(urdu="وضاحت", verses_used=verse_ids)
+
+    corpus_search.search_service = SimpleNamespace(search=search, search_batch=search_batch)
+    corpus_search.get_verse_texts = verse_texts
+    routes.get_llm_explanation = llm
+    embedding_service.embedding_cache = None
+
+
+async def run(mode, queries, concurrency, embed_app):
+    await embedding_service.close_http_client()
+    await embedding_service.init_http_client(transport=httpx.ASGITransport(app=embed_app))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        start = time.perf_counter()
+        if mode == "batch":
+            response = await client.post("/search/batch", json={"queries": queries, "top_k": 5})
+            response.raise_for_status()
+            assert [r["query"] for r in response.json()["results"]] == queries
+        else:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one(text):
+                async with semaphore:
+                    response = await client.post("/search", json={"text": text, "top_k": 5})
+                    response.raise_for_status()
+
+            await asyncio.gather(*(one(text) for text in queries))
+        elapsed = time.perf_counter() - start
+    await embedding_service.close_http_client()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="POST /search vs POST /search/batch throughput")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16, help="in-flight single /search calls")
+    parser.add_argument("--embed-latency-ms", type=float, default=40.0)
+    parser.add_argument("--embed-per-item-ms", type=float, default=1.0)
+    parser.add_argument("--search-rtt-ms", type=float, default=5.0)
+    parser.add_argument("--search-per-query-ms", type=float, default=0.5)
+    parser.add_argument("--pg-rtt-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    queries = [f"patience in hardship {i}" for i in range(args.queries)]
+    print(f"{args.queries} queries, single calls with concurrency {args.concurrency}\n")
+    for label, mode in (("N x POST /search", "single"), ("1 x POST /search/batch", "batch")):
+        counters = {"search": Counter(), "pg": Counter()}
+        install_stubs(args.search_rtt_ms / 1000, args.search_per_query_ms / 1000, args.pg_rtt_ms / 1000, counters)
+        embed_app = create_app(args.embed_latency_ms, args.embed_per_item_ms)
+        elapsed = asyncio.run(run(mode, queries, args.concurrency, embed_app))
+        print(f"{label:>24}: {elapsed:6.2f}s  {args.queries / elapsed:7.1f} queries/sec  "
+              f"embed requests={embed_app.state.requests}  search calls={counters['search'].calls}  "
+              f"verse fetches={counters['pg'].calls}")
+
+
+if __name__ == "__main__":
+    main()
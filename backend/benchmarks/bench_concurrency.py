@@ -0,0 +1,98 @@
+"""
+Load benchmark for the /search pipeline: do concurrent requests queue behind each other?
+
+Every external stage (Colab embed, Qdrant, PostgreSQL, LLM) is replaced by a stub that
+waits a fixed latency. With a non-blocking pipeline, N concurrent requests finish in about
+the latency of ONE request; with a blocking stage they finish in about N times that.
+
+Run from the backend directory:
+    python -m benchmarks.bench_concurrency --requests 20 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+
+from api import routes
+from services import corpus_search
+from api.models import LLMExplanation
+from main import app
+
+
+def install_stubs(embed_latency, qdrant_latency, pg_latency, llm_latency, blocking_llm=False):
+    """Replace the external stages used by api.routes and the corpus fan-out with fixed-latency stubs"""
+
+    async def fake_embeddings(text):
+        await asyncio.sleep(embed_latency)
+        return {"dense": [0.01] * 1024, "sparse": {"indices": [1], "values": [0.1]}}, text
+
+    async def fake_search(embeddings, top_k=5, **options):
+        await asyncio.sleep(qdrant_latency)
+        return [
+            SimpleNamespace(
+                id=i + 1,
+                score=1.0 - i * 0.01,
+                payload={"quran_id": i + 1, "surah_id": 1, "ayah_id": i + 1, "juz_id": 1, "surah_type": "Meccan"}
+            )
+            for i in range(top_k)
+        ]
+
+    async def fake_verse_texts(verse_details):
+        await asyncio.sleep(pg_latency)
+        return [
+            {"quran_id": d["quran_id"], "text_ar": "نص", "text_ur": "متن", "text_en": "text"}
+            for d in verse_details
+        ]
+
+    async def fake_llm(query, arabic_texts, urdu_texts, verse_ids):
+        if blocking_llm:
+            time.sleep(llm_latency)  # simulates the old synchronous OpenAI client
+        else:
+            await asyncio.sleep(llm_latency)
+        return LLMExplanation(urdu="وضاحت", verses_used=verse_ids)
+
+    routes.get_embeddings = fake_embeddings
+    corpus_search.search_service = SimpleNamespace(search=fake_search)
+    corpus_search.get_verse_texts = fake_verse_texts
+    routes.get_llm_explanation = fake_llm
+
+
+async def run_load(num_requests):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def one(i):
+            start = time.perf_counter()
+            response = await client.post("/search", json={"text": f"sabr {i}", "top_k": 5})
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one(i) for i in range(num_requests)))
+        wall = time.perf_counter() - start
+    return wall, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrency benchmark for POST /search")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--qdrant-latency", type=float, default=0.02)
+    parser.add_argument("--pg-latency", type=float, default=0.01)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    single = args.embed_latency + args.qdrant_latency + args.pg_latency + args.llm_latency
+
+    for label, blocking in (("async pipeline", False), ("blocking LLM stage", True)):
+        install_stubs(args.embed_latency, args.qdrant_latency, args.pg_latency, args.llm_latency, blocking)
+        wall, latencies = asyncio.run(run_load(args.requests))
+        p50 = latencies[len(latencies) // 2]
+        print(f"{label:>20}: {args.requests} concurrent requests in {wall:.2f}s "
+              f"(single request ≈ {single:.2f}s, p50={p50:.2f}s, max={latencies[-1]:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
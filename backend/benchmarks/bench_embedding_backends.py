@@ -0,0 +1,84 @@
+"""
+Compare the local CPU encoder against the remote Colab /embed path.
+
+Reports sequential per-query latency (p50/p95) and concurrent throughput through each
+backend's micro-batcher. The local encoder needs requirements-local.txt (and, for the
+ONNX runtime, `python -m services.local_embedding export` first). Run from backend/:
+    python -m benchmarks.bench_embedding_backends --remote-url http://127.0.0.1:8001
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from config.settings import (
+    COLAB_API_URL,
+    EMBEDDING_BATCH_WINDOW_MS,
+    EMBEDDING_BATCH_MAX_SIZE,
+    LOCAL_EMBEDDING_BATCH_WINDOW_MS,
+    LOCAL_EMBEDDING_BATCH_MAX_SIZE
+)
+from services import embedding_service
+from services.embedding_service import EmbeddingBatcher
+from services.local_embedding import local_encoder, init_local_encoder
+
+QUERIES = [
+    "roza", "sabr", "namaz ki ahmiyat", "الصبر على البلاء", "patience in hardship",
+    "زکوۃ کے احکام", "charity to orphans", "الصلاة الوسطى", "forgiveness and mercy", "حج کی فرضیت"
+]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def measure(label, embed_single, batcher, sequential, concurrent):
+    latencies = []
+    for i in range(sequential):
+        start = time.perf_counter()
+        await embed_single(f"{QUERIES[i % len(QUERIES)]} {i}")
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(batcher.embed(f"{QUERIES[i % len(QUERIES)]} #{i}") for i in range(concurrent)))
+    throughput = concurrent / (time.perf_counter() - start)
+
+    print(f"{label:>8}: p50={percentile(latencies, 50) * 1000:7.1f} ms  "
+          f"p95={percentile(latencies, 95) * 1000:7.1f} ms  "
+          f"throughput={throughput:7.1f} queries/s ({concurrent} concurrent)")
+
+
+async def main_async(args):
+    if not args.skip_remote:
+        await embedding_service.close_http_client()
+        client = await embedding_service.init_http_client()
+        client.base_url = httpx.URL(args.remote_url)
+        remote_batcher = EmbeddingBatcher(EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_BATCH_MAX_SIZE,
+                                          embedding_service._embed_batch, embedding_service._embed_single)
+        await measure("remote", embedding_service._embed_single, remote_batcher, args.sequential, args.concurrent)
+        await embedding_service.close_http_client()
+
+    if not args.skip_local:
+        start = time.perf_counter()
+        await init_local_encoder()
+        print(f"local encoder load + warm-up: {time.perf_counter() - start:.1f}s")
+        local_batcher = EmbeddingBatcher(LOCAL_EMBEDDING_BATCH_WINDOW_MS, LOCAL_EMBEDDING_BATCH_MAX_SIZE,
+                                         local_encoder.embed_batch)
+        await measure("local", local_encoder.embed_single, local_batcher, args.sequential, args.concurrent)
+        local_encoder.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local vs remote embedding benchmark")
+    parser.add_argument("--remote-url", default=COLAB_API_URL)
+    parser.add_argument("--sequential", type=int, default=50)
+    parser.add_argument("--concurrent", type=int, default=64)
+    parser.add_argument("--skip-remote", action="store_true")
+    parser.add_argument("--skip-local", action="store_true")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Embedding throughput with and without micro-batching, against the local fake /embed server.
+
+The fake server runs one forward pass at a time, charging a fixed cost per request plus a
+small cost per text, like a single GPU encoder. Run from the backend directory:
+    python -m benchmarks.bench_embedding_batching --queries 256 --concurrency 64
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.fake_embed_server import create_app
+from services import embedding_service
+from services.embedding_service import EmbeddingBatcher
+
+
+async def run(queries, concurrency, batcher, base_latency_ms, per_item_latency_ms):
+    app = create_app(base_latency_ms, per_item_latency_ms)
+    await embedding_service.close_http_client()
+    await embedding_service.init_http_client(transport=httpx.ASGITransport(app=app))
+    embedding_service.embedding_batcher = batcher
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            # bypass the query cache: every query is distinct and must reach /embed
+            await embedding_service._compute_embeddings(f"query number {i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(queries)))
+    elapsed = time.perf_counter() - start
+    await embedding_service.close_http_client()
+    return elapsed, app.state.requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding micro-batching benchmark")
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--base-latency-ms", type=float, default=40.0)
+    parser.add_argument("--per-item-latency-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    batcher = EmbeddingBatcher(args.window_ms, args.max_batch,
+                               embedding_service._embed_batch, embedding_service._embed_single)
+    configs = [
+        ("one request per query", None),
+        (f"micro-batched ({args.window_ms:g} ms window)", batcher),
+    ]
+    for label, batcher in configs:
+        elapsed, upstream = asyncio.run(run(args.queries, args.concurrency, batcher,
+                                            args.base_latency_ms, args.per_item_latency_ms))
+        print(f"{label:>32}: {args.queries / elapsed:8.1f} queries/s, "
+              f"{upstream} upstream requests, {elapsed:.2f}s total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Load time and memory of the Qdrant JSONL export vs the binary embedding set.
+
+Each loader runs in a fresh process; RSS is read from /proc (Linux) after loading,
+and peak RSS is VmHWM. Run from the backend directory:
+    python -m benchmarks.bench_embedding_format --points 6236
+    python -m benchmarks.bench_embedding_format --embeddings data/Quran_Embeddings_Qdrant.jsonl
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_local_search import write_jsonl
+from utils.embedding_format import EmbeddingSet, convert_jsonl
+
+
+def memory_mb():
+    """(current RSS, peak RSS) in MB"""
+    values = {}
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, amount, _ = line.split()
+                values[key] = int(amount) / 1024
+    return values.get("VmRSS:", 0.0), values.get("VmHWM:", 0.0)
+
+
+def load_jsonl_lists(path):
+    """What the ingestion script did: every vector as Python lists"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_jsonl_numpy(path):
+    """JSONL parsed straight into a float32 matrix (the best a JSONL reader can do)"""
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                rows.append(np.asarray(json.loads(line)["vector"]["dense"], dtype=np.float32))
+    return np.vstack(rows)
+
+
+def open_binary(path):
+    return EmbeddingSet.open(path)
+
+
+def open_binary_touch(path):
+    """Open and read every dense value (pages the whole matrix in)"""
+    embeddings = EmbeddingSet.open(path)
+    float(np.asarray(embeddings.dense, dtype=np.float32).sum(dtype=np.float64))
+    return embeddings
+
+
+LOADERS = {
+    "jsonl -> python lists": ("jsonl", load_jsonl_lists),
+    "jsonl -> numpy": ("jsonl", load_jsonl_numpy),
+    "binary, mmap open": ("binary", open_binary),
+    "binary, mmap + read all": ("binary", open_binary_touch),
+}
+
+
+def child(name, path, queue):
+    baseline, _ = memory_mb()
+    start = time.perf_counter()
+    data = LOADERS[name][1](path)
+    elapsed = time.perf_counter() - start
+    rss, peak = memory_mb()
+    queue.put((elapsed, rss - baseline, peak - baseline))
+    del data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSONL vs binary embedding set load benchmark")
+    parser.add_argument("--embeddings", help="Qdrant JSONL export (default: synthetic)")
+    parser.add_argument("--points", type=int, default=6236)
+    parser.add_argument("--dtype", default="float16", choices=["float32", "float16"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl_path = args.embeddings or os.path.join(tmp, "embeddings.jsonl")
+        if not args.embeddings:
+            write_jsonl(jsonl_path, args.points)
+        binary_dir = os.path.join(tmp, "embeddings")
+
+        start = time.perf_counter()
+        embeddings = convert_jsonl(jsonl_path, binary_dir, args.dtype)
+        binary_size = sum(os.path.getsize(os.path.join(binary_dir, name)) for name in os.listdir(binary_dir))
+        print(f"Converted {len(embeddings)} records in {time.perf_counter() - start:.2f}s: "
+              f"JSONL {os.path.getsize(jsonl_path) / 1e6:.1f} MB -> binary ({args.dtype}) {binary_size / 1e6:.1f} MB")
+
+        context = multiprocessing.get_context("spawn")
+        for name, (source, _) in LOADERS.items():
+            queue = context.Queue()
+            process = context.Process(target=child, args=(name, jsonl_path if source == "jsonl" else binary_dir, queue))
+            process.start()
+            elapsed, rss, peak = queue.get()
+            process.join()
+            print(f"{name:>25}: {elapsed * 1000:9.1f} ms   RSS +{rss:7.1f} MB   peak +{peak:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Filtered vs unfiltered hybrid search latency (surah / juz / surah_type filters).
+
+Builds an ayah-sized synthetic single collection with the same payload indexes as
+quran_qdrant_ingestion.py (skip them with --no-index to see the difference), then runs
+the same queries unfiltered and with filters of decreasing selectivity through
+HybridQdrantService, checking every hit matches its filter. The in-process engine is
+timed on the same corpus too. Run from the backend directory:
+    python -m benchmarks.bench_filters --queries 300
+    python -m benchmarks.bench_filters --url :memory: --points 2000   # smoke run, no HNSW
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient, models
+
+from benchmarks.bench_local_search import write_jsonl
+from benchmarks.bench_qdrant_layouts import DENSE_DIM, synthetic_points
+from services.local_search import LocalSearchService
+from services.qdrant_service import HybridQdrantService
+
+COLLECTION = "bench_filters"
+
+PAYLOAD_INDEXES = {
+    "surah_id": models.PayloadSchemaType.INTEGER,
+    "juz_id": models.PayloadSchemaType.INTEGER,
+    "surah_type": models.PayloadSchemaType.KEYWORD,
+    "source": models.PayloadSchemaType.KEYWORD
+}
+
+SCENARIOS = [
+    ("unfiltered", None),
+    ("surah_type=Meccan", {"surah_type": ["Meccan"]}),
+    ("juz 30", {"juz_id": [30]}),
+    ("Meccan, juz 30", {"surah_type": ["Meccan"], "juz_id": [30]}),
+    ("surah 2", {"surah_id": [2]}),
+    ("surahs 112-114", {"surah_id": [112, 113, 114]}),
+]
+
+
+def payload(i, count):
+    """Same payload layout as benchmarks.bench_local_search.write_jsonl"""
+    return {
+        "quran_id": i + 1, "juz_id": i * 30 // count + 1, "surah_id": i * 114 // count + 1,
+        "ayah_id": i % 50 + 1, "surah_type": "Meccan" if i % 3 else "Medinan", "source": "Quran"
+    }
+
+
+async def build(client, count, batch_size, indexed):
+    dense, sparse = synthetic_points(count, seed=0)
+    if await client.collection_exists(COLLECTION):
+        await client.delete_collection(COLLECTION)
+    await client.create_collection(
+        COLLECTION,
+        vectors_config={"dense": models.VectorParams(size=DENSE_DIM, distance=models.Distance.COSINE)},
+        sparse_vectors_config={"sparse": models.SparseVectorParams()}
+    )
+    if indexed:
+        for field, schema in PAYLOAD_INDEXES.items():
+            await client.create_payload_index(COLLECTION, field_name=field, field_schema=schema, wait=True)
+    for start in range(0, count, batch_size):
+        await client.upsert(COLLECTION, [
+            models.PointStruct(id=i + 1, vector={"dense": dense[i].tolist(), "sparse": sparse[i]}, payload=payload(i, count))
+            for i in range(start, min(start + batch_size, count))
+        ])
+
+
+def matches(hits, filters):
+    return all(
+        all(hit.payload.get(field) in values for field, values in (filters or {}).items())
+        for hit in hits
+    )
+
+
+async def measure(search, queries, top_k, filters):
+    latencies, ok, full = [], True, True
+    for embeddings in queries:
+        start = time.perf_counter()
+        hits = await search(embeddings, top_k, filters=filters)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ok &= matches(hits, filters)
+        full &= len(hits) == top_k
+    return np.percentile(latencies, 50), np.percentile(latencies, 99), ok, full
+
+
+async def run(args):
+    dense, sparse = synthetic_points(args.queries, seed=1)
+    queries = [
+        {"dense": dense[i].tolist(), "sparse": {"indices": sparse[i].indices, "values": sparse[i].values}}
+        for i in range(args.queries)
+    ]
+
+    client = AsyncQdrantClient(location=args.url, timeout=60)
+    print(f"Building {args.points} points on {args.url} (payload indexes: {'no' if args.no_index else 'yes'})...")
+    await build(client, args.points, args.batch_size, not args.no_index)
+    service = HybridQdrantService()
+    service.client = client
+    service._use_single_collection(COLLECTION)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl = os.path.join(tmp, "embeddings.jsonl")
+        write_jsonl(jsonl, args.points)
+        local = LocalSearchService(os.path.join(tmp, "embeddings"), jsonl, "float32")
+        local.load()
+
+        try:
+            await measure(service.search, queries[:20], args.top_k, None)  # warm-up
+            print(f"\n{'':>18} {'qdrant p50':>11} {'p99':>8} {'local p50':>10} {'p99':>8}  filter respected / full top-k")
+            for label, filters in SCENARIOS:
+                q50, q99, q_ok, q_full = await measure(service.search, queries, args.top_k, filters)
+                l50, l99, l_ok, l_full = await measure(local.search, queries, args.top_k, filters)
+                print(f"{label:>18} {q50:8.2f} ms {q99:5.2f} ms {l50:7.2f} ms {l99:5.2f} ms  "
+                      f"{'yes' if q_ok and l_ok else 'NO'} / {'yes' if q_full and l_full else 'no'}")
+        finally:
+            if not args.keep:
+                await client.delete_collection(COLLECTION)
+            await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filtered vs unfiltered search latency")
+    parser.add_argument("--url", default="http://localhost:6333", help="Qdrant URL (or ':memory:')")
+    parser.add_argument("--points", type=int, default=6236)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--no-index", action="store_true", help="build without payload indexes")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark collection")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
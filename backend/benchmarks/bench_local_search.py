@@ -0,0 +1,140 @@
+"""
+Latency of the in-process exact search engine, one query at a time and in batches
+(one GEMM per batch), optionally next to Qdrant on the same synthetic corpus.
+
+Writes an ayah-sized synthetic Quran_Embeddings_Qdrant.jsonl (or uses --embeddings),
+converts it to the binary embedding set, checks the dense top-k against a plain
+argsort, then times it.
+Run from the backend directory:
+    python -m benchmarks.bench_local_search --queries 1000
+    python -m benchmarks.bench_local_search --qdrant-url http://localhost:6333
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_qdrant_layouts import synthetic_points
+from services.local_search import LocalSearchService
+
+
+def write_jsonl(path, count):
+    dense, sparse = synthetic_points(count, seed=0)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({
+                "id": i + 1,
+                "vector": {
+                    "dense": dense[i].tolist(),
+                    "sparse": {"indices": sparse[i].indices, "values": sparse[i].values}
+                },
+                "payload": {
+                    "quran_id": i + 1, "juz_id": i * 30 // count + 1, "surah_id": i * 114 // count + 1,
+                    "ayah_id": i % 50 + 1, "surah_type": "Meccan" if i % 3 else "Medinan", "source": "Quran"
+                }
+            }) + "\n")
+
+
+def percentiles(latencies):
+    return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def bench_local(service, queries, batch_size, top_k):
+    single = []
+    for embeddings in queries:
+        start = time.perf_counter()
+        service.search_batch_sync([embeddings], top_k)
+        single.append((time.perf_counter() - start) * 1000)
+    p50, p99 = percentiles(single)
+    print(f"  local, single query : p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        service.search_batch_sync(queries[i:i + batch_size], top_k)
+    elapsed = time.perf_counter() - start
+    print(f"  local, batch of {batch_size:<3}: {len(queries) / elapsed:8.0f} queries/s "
+          f"({elapsed / len(queries) * 1000:.3f} ms per query)")
+
+
+async def bench_qdrant(url, jsonl_path, queries, top_k):
+    from qdrant_client import AsyncQdrantClient, models
+    from services.qdrant_service import HybridQdrantService
+
+    collection = "bench_local_search"
+    client = AsyncQdrantClient(location=url, timeout=60)
+    if await client.collection_exists(collection):
+        await client.delete_collection(collection)
+    await client.create_collection(
+        collection,
+        vectors_config={"dense": models.VectorParams(size=len(queries[0]["dense"]), distance=models.Distance.COSINE)},
+        sparse_vectors_config={"sparse": models.SparseVectorParams()}
+    )
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        objs = [json.loads(line) for line in f]
+    for i in range(0, len(objs), 256):
+        await client.upsert(collection, [
+            models.PointStruct(id=o["id"], vector={"dense": o["vector"]["dense"], "sparse": models.SparseVector(**o["vector"]["sparse"])}, payload=o["payload"])
+            for o in objs[i:i + 256]
+        ])
+
+    service = HybridQdrantService()
+    service.client = client
+    service._use_single_collection(collection)
+    latencies = []
+    try:
+        for embeddings in queries:
+            start = time.perf_counter()
+            await service.search(embeddings, top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        await client.delete_collection(collection)
+        await client.close()
+    p50, p99 = percentiles(latencies)
+    print(f"  qdrant, single query: p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process exact search benchmark")
+    parser.add_argument("--embeddings", help="Qdrant JSONL export (default: synthetic)")
+    parser.add_argument("--points", type=int, default=6236)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--qdrant-url", help="also time HybridQdrantService on the same corpus")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl_path = args.embeddings or os.path.join(tmp, "embeddings.jsonl")
+        if not args.embeddings:
+            write_jsonl(jsonl_path, args.points)
+
+        service = LocalSearchService(os.path.join(tmp, "embeddings"), jsonl_path, args.dtype)
+        start = time.perf_counter()
+        service.load()
+        print(f"Convert + load: {time.perf_counter() - start:.2f}s, dense matrix {service.dense.nbytes / 1e6:.1f} MB")
+
+        dense, sparse = synthetic_points(args.queries, seed=1)
+        queries = [
+            {"dense": dense[i].tolist(), "sparse": {"indices": sparse[i].indices, "values": sparse[i].values}}
+            for i in range(args.queries)
+        ]
+
+        # exactness: dense leg must match a full argsort
+        probe = dense[0] / np.linalg.norm(dense[0])
+        scores = (service.dense @ probe) * service.inv_norms
+        expected = service.ids[np.argsort(scores)[::-1][:10]].tolist()
+        got = [p.id for p in service._top(scores, 10)]
+        print(f"Dense top-10 matches brute-force argsort: {got == expected}")
+
+        bench_local(service, queries, args.batch_size, args.top_k)
+        if args.qdrant_url:
+            asyncio.run(bench_qdrant(args.qdrant_url, jsonl_path, queries, args.top_k))
+
+
+if __name__ == "__main__":
+    main()
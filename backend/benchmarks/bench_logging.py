@@ -0,0 +1,81 @@
+"""
+POST /search throughput with the previous logging setup (every detail line at INFO, written
+synchronously on the event loop) vs the queue-based, sampled JSON logging, vs logging disabled.
+
+Uses the instant stubs of benchmarks.bench_metrics, so logging is measured against the pure
+in-process cost of a request (its worst case). Records go to a log file in a temporary
+directory only (no console handler). Run from the backend directory:
+    python -m benchmarks.bench_logging --requests 2000 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks.bench_metrics import install_stubs
+from main import app
+from services.logger import configure_logging, logger, stop_logging
+
+MODES = [
+    ("disabled", None),
+    ("sync, text, all detail", {"level": "DEBUG", "log_format": "text", "use_queue": False}),
+    ("sync, json, sampled 1%", {"log_format": "json", "use_queue": False, "detail_sample_rate": 0.01}),
+    ("queue, json, sampled 1%", {"log_format": "json", "use_queue": True, "detail_sample_rate": 0.01}),
+    ("queue, json, no detail", {"log_format": "json", "use_queue": True, "detail_sample_rate": 0}),
+    ("queue, json, all detail", {"level": "DEBUG", "log_format": "json", "use_queue": True}),
+]
+
+
+async def run(num_requests, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/search", json={"text": f"sabr {i}", "top_k": 5})
+                response.raise_for_status()
+                return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one(i) for i in range(num_requests)))
+        return time.perf_counter() - start, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="POST /search throughput by logging setup")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    install_stubs()
+    print(f"{args.requests} POST /search, concurrency {args.concurrency}\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, options in MODES:
+            log_file = os.path.join(tmp, f"{len(os.listdir(tmp))}.log")
+            if options is None:
+                logger.disabled = True
+            else:
+                logger.disabled = False
+                configure_logging(log_file=log_file, console=False, **options)
+            asyncio.run(run(100, args.concurrency))  # warm-up
+            size = os.path.getsize(log_file) if os.path.exists(log_file) else 0
+            wall, latencies = asyncio.run(run(args.requests, args.concurrency))
+            drain = time.perf_counter()
+            stop_logging()  # flush the queue so the byte count is complete
+            drain_ms = (time.perf_counter() - drain) * 1000
+            written = (os.path.getsize(log_file) if os.path.exists(log_file) else 0) - size
+            print(f"{label:>24}: {args.requests / wall:7.1f} req/s  p50 {np.percentile(latencies, 50):6.2f} ms  "
+                  f"p99 {np.percentile(latencies, 99):6.2f} ms  {written / args.requests:7.0f} B/request  "
+                  f"(queue drained in {drain_ms:.0f} ms)")
+    logger.disabled = False
+    configure_logging()
+
+
+if __name__ == "__main__":
+    main()
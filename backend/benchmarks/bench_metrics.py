@@ -0,0 +1,125 @@
+"""
+Overhead of the Prometheus instrumentation (services.metrics) on POST /search.
+
+The request runs through the real routes, corpus fan-out, HybridQdrantService (batched
+dense + sparse legs, RRF) and get_llm_explanation, with the Qdrant client, verse fetch,
+embedding and LLM client replaced by stubs that answer instantly, so the instrumentation
+is measured against the pure in-process cost of a request (its worst case). Each round
+runs the same requests with metrics on and off; the cost of one observation and of a
+GET /metrics scrape are reported too. Run from the backend directory:
+    python -m benchmarks.bench_metrics --requests 2000
+"""
+import argparse
+import asyncio
+import time
+import timeit
+from types import SimpleNamespace
+
+import httpx
+import numpy as np
+
+from api import routes
+from main import app
+from services import corpus_search, llm_service, metrics
+from services.qdrant_service import HybridQdrantService, VERSE_PAYLOAD_FIELDS
+
+
+class FakeQdrantClient:
+    """query_batch_points answering every request with the same top hits"""
+
+    async def query_batch_points(self, collection_name, requests):
+        return [
+            SimpleNamespace(points=[
+                SimpleNamespace(
+                    id=i + 1, score=1.0 - i * 0.01,
+                    payload={"quran_id": i + 1, "surah_id": 1, "ayah_id": i + 1, "juz_id": 1, "surah_type": "Meccan"}
+                )
+                for i in range(request.limit)
+            ])
+            for request in requests
+        ]
+
+    async def close(self):
+        pass
+
+
+def install_stubs():
+    async def embeddings(text):
+        return {"dense": [0.01] * 1024, "sparse": {"indices": [1, 2, 3], "values": [0.1, 0.2, 0.3]}}, text
+
+    async def verse_texts(verse_details):
+        return [{"quran_id": d["quran_id"], "text_ar": "نص", "text_ur": "متن", "text_en": "text"} for d in verse_details]
+
+    async def create(**kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="وضاحت " * 40))])
+
+    service = HybridQdrantService(layout="single", payload_fields=VERSE_PAYLOAD_FIELDS)
+    service.client = FakeQdrantClient()
+    routes.get_embeddings = embeddings
+    corpus_search.search_service = service
+    corpus_search.get_verse_texts = verse_texts
+    llm_service.llm_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    llm_service.explanation_cache = None
+
+
+async def run(num_requests):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(num_requests):
+            start = time.perf_counter()
+            response = await client.post("/search", json={"text": f"sabr {i}", "top_k": 5})
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1e6)
+    return np.array(latencies)
+
+
+async def scrape_ms(times):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for _ in range(times):
+            response = await client.get("/metrics")
+            response.raise_for_status()
+        return (time.perf_counter() - start) * 1000 / times, len(response.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prometheus instrumentation overhead on POST /search")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    install_stubs()
+    for enabled in (True, False):
+        metrics.METRICS_ENABLED = enabled
+        asyncio.run(run(100))  # warm-up
+
+    print(f"{args.requests} sequential POST /search per round\n")
+    means = {True: [], False: []}
+    for round_ in range(args.rounds):
+        for enabled in (True, False):
+            metrics.METRICS_ENABLED = enabled
+            latencies = asyncio.run(run(args.requests))
+            means[enabled].append(latencies.mean())
+            print(f"  round {round_ + 1} metrics {'on ' if enabled else 'off'}: mean {latencies.mean():7.1f} us  "
+                  f"p50 {np.percentile(latencies, 50):7.1f} us  p99 {np.percentile(latencies, 99):7.1f} us")
+    on, off = np.median(means[True]), np.median(means[False])
+    print(f"\nmedian of rounds: on {on:.1f} us, off {off:.1f} us, overhead {on - off:+.1f} us/request ({(on - off) / off:+.1%})")
+
+    metrics.METRICS_ENABLED = True
+    histogram = metrics.STAGE_SECONDS
+    per_call = timeit.timeit(lambda: metrics.observe(histogram, 0.01, endpoint="bench", stage="bench"), number=100000) * 10
+
+    def block():
+        with metrics.timed(histogram, endpoint="bench", stage="bench"):
+            pass
+
+    with_timer = timeit.timeit(block, number=100000) * 10
+    print(f"one observe(): {per_call:.2f} us, one timed() block: {with_timer:.2f} us (8 observations per /search request)")
+    ms, size = asyncio.run(scrape_ms(50))
+    print(f"GET /metrics: {ms:.2f} ms per scrape ({size / 1024:.1f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
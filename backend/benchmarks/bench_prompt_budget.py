@@ -0,0 +1,94 @@
+"""
+LLM prompt size with and without the token budget of services.prompt_builder.
+
+Verse sets of --top-k verses are drawn at random from the canonical Quran (datasets/quran/
+q_canonical, no database needed), with one of the 50 longest verses in each set so the
+tail shows. For every top_k the benchmark prints prompt tokens (p50/p95/max), how many
+verses were truncated or dropped, the share of the prompt that is the byte-stable system
+prefix (reusable by provider prefix caching), the build time, and the prefill time implied
+by --prefill-ms-per-1k. Tokens come from the model tokenizer when transformers is installed
+and LLM_TOKENIZER loads, otherwise from the UTF-8 estimate. Run from the backend directory:
+    python -m benchmarks.bench_prompt_budget --top-k 5 10 20 --budget 3000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from benchmarks.bench_verse_store import CANONICAL_DIR, canonical_rows
+from config.settings import LLM_INPUT_TOKEN_BUDGET
+from services.metrics import LLM_PROMPT_VERSES
+from services.prompt_builder import SYSTEM_MESSAGE, build_messages, prompt_tokenizer
+
+UNBOUNDED = 10 ** 9
+
+
+def verse_sets(rows, top_k, count, seed):
+    rng = random.Random(seed)
+    longest = sorted(rows, key=lambda row: len(row["text_ar"]) + len(row["text_ur"]))[-50:]
+    for _ in range(count):
+        chosen = rng.sample(rows, top_k - 1)
+        chosen.insert(rng.randrange(top_k), rng.choice(longest))
+        yield chosen
+
+
+def verse_outcomes():
+    return {sample.labels["outcome"]: sample.value for sample in LLM_PROMPT_VERSES.collect()[0].samples
+            if sample.name.endswith("_total")}
+
+
+def run(sets, budget):
+    before = verse_outcomes()
+    tokens, build_us = [], []
+    for verses in sets:
+        start = time.perf_counter()
+        _, used = build_messages(
+            "sabr ki fazilat",
+            [row["text_ar"] for row in verses],
+            [row["text_ur"] for row in verses],
+            [row["quran_id"] for row in verses],
+            budget=budget
+        )
+        build_us.append((time.perf_counter() - start) * 1e6)
+        tokens.append(used)
+    after = verse_outcomes()
+    outcomes = {name: after.get(name, 0) - before.get(name, 0) for name in ("kept", "truncated", "dropped")}
+    return np.array(tokens), np.array(build_us), outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM prompt size with and without the token budget")
+    parser.add_argument("--canonical-dir", default=CANONICAL_DIR)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--budget", type=int, default=LLM_INPUT_TOKEN_BUDGET)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=120.0,
+                        help="provider prefill cost per 1000 uncached prompt tokens (time to first token)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    prompt_tokenizer.load()
+    counter = "model tokenizer" if prompt_tokenizer.tokenizer is not None else "UTF-8 estimate"
+    rows = canonical_rows(args.canonical_dir)
+    prefix = prompt_tokenizer.count(SYSTEM_MESSAGE)
+    print(f"{len(rows)} verses, {args.requests} prompts per setting, tokens by {counter}, "
+          f"system prefix {prefix} tokens\n")
+
+    for top_k in args.top_k:
+        sets = list(verse_sets(rows, top_k, args.requests, args.seed))
+        for label, budget in (("unbounded", UNBOUNDED), (f"budget {args.budget}", args.budget)):
+            tokens, build_us, outcomes = run(sets, budget)
+            offered = sum(outcomes.values()) or 1
+            prefill = np.percentile(tokens, 95) / 1000 * args.prefill_ms_per_1k
+            cached_prefill = (np.percentile(tokens, 95) - prefix) / 1000 * args.prefill_ms_per_1k
+            print(f"top_k {top_k:>2} {label:>12}: tokens p50 {np.percentile(tokens, 50):6.0f}  "
+                  f"p95 {np.percentile(tokens, 95):6.0f}  max {tokens.max():6.0f}  "
+                  f"truncated {outcomes['truncated'] / offered:5.1%}  dropped {outcomes['dropped'] / offered:5.1%}  "
+                  f"prefix {prefix / np.median(tokens):5.1%}  build p50 {np.percentile(build_us, 50):6.1f} us  "
+                  f"p95 prefill {prefill:5.0f} ms ({cached_prefill:5.0f} ms with prefix cached)")
+        print()
+
+
+if __name__ == "__main__":
+    main()
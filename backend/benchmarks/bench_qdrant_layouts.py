@@ -0,0 +1,131 @@
+"""
+Hybrid search latency for the two Qdrant collection layouts:
+
+  split:  separate dense and sparse collections, two concurrent queries per search
+  single: one collection with named dense + sparse vectors, one query_batch_points call
+
+Builds synthetic collections (ayah-sized by default) on the given Qdrant, runs the same
+queries through HybridQdrantService in each layout and prints p50/p99. Run from the
+backend directory against the dev docker-compose Qdrant:
+    python -m benchmarks.bench_qdrant_layouts --queries 500 --concurrency 8
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient, models
+
+from services.qdrant_service import HybridQdrantService
+
+DENSE_DIM = 1024
+VOCAB_SIZE = 250_002
+PREFIX = "bench_layout"
+
+
+def synthetic_points(count, seed):
+    rng = np.random.default_rng(seed)
+    dense = rng.standard_normal((count, DENSE_DIM)).astype(np.float32)
+    sparse = []
+    for _ in range(count):
+        indices = np.unique(rng.integers(0, VOCAB_SIZE, size=rng.integers(8, 40)))
+        sparse.append(models.SparseVector(indices=indices.tolist(), values=rng.random(len(indices)).tolist()))
+    return dense, sparse
+
+
+async def build(client, count, batch_size):
+    dense, sparse = synthetic_points(count, seed=0)
+    names = {"dense": f"{PREFIX}_dense", "sparse": f"{PREFIX}_sparse", "single": f"{PREFIX}_single"}
+    for name in names.values():
+        if await client.collection_exists(name):
+            await client.delete_collection(name)
+
+    await client.create_collection(names["dense"], vectors_config=models.VectorParams(size=DENSE_DIM, distance=models.Distance.COSINE))
+    await client.create_collection(names["sparse"], vectors_config={}, sparse_vectors_config={"sparse": models.SparseVectorParams()})
+    await client.create_collection(
+        names["single"],
+        vectors_config={"dense": models.VectorParams(size=DENSE_DIM, distance=models.Distance.COSINE)},
+        sparse_vectors_config={"sparse": models.SparseVectorParams()}
+    )
+
+    for start in range(0, count, batch_size):
+        ids = range(start, min(start + batch_size, count))
+        payloads = [{"quran_id": i + 1} for i in ids]
+        await client.upsert(names["dense"], [
+            models.PointStruct(id=i, vector=dense[i].tolist(), payload=p) for i, p in zip(ids, payloads)
+        ])
+        await client.upsert(names["sparse"], [
+            models.PointStruct(id=i, vector={"sparse": sparse[i]}, payload=p) for i, p in zip(ids, payloads)
+        ])
+        await client.upsert(names["single"], [
+            models.PointStruct(id=i, vector={"dense": dense[i].tolist(), "sparse": sparse[i]}, payload=p)
+            for i, p in zip(ids, payloads)
+        ])
+    return names
+
+
+def service_for(client, layout, names):
+    service = HybridQdrantService()
+    service.client = client
+    if layout == "single":
+        service._use_single_collection(names["single"])
+    else:
+        service.layout = "split"
+        service.dense_collection = names["dense"]
+        service.sparse_collection = names["sparse"]
+    return service
+
+
+async def measure(service, queries, concurrency, top_k):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(embeddings):
+        async with semaphore:
+            start = time.perf_counter()
+            await service.search(embeddings, top_k, fusion="rrf")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(q) for q in queries))
+    return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+async def run(args):
+    client = AsyncQdrantClient(location=args.url, timeout=60)
+    print(f"Building {args.points} synthetic points per layout on {args.url}...")
+    names = await build(client, args.points, args.batch_size)
+
+    dense, sparse = synthetic_points(args.queries, seed=1)
+    queries = [
+        {"dense": dense[i].tolist(), "sparse": {"indices": sparse[i].indices, "values": sparse[i].values}}
+        for i in range(args.queries)
+    ]
+
+    try:
+        for layout in ("split", "single"):
+            service = service_for(client, layout, names)
+            await measure(service, queries[:20], args.concurrency, args.top_k)  # warm-up
+            p50, p99 = await measure(service, queries, args.concurrency, args.top_k)
+            print(f"{layout:>7}: p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+    finally:
+        if not args.keep:
+            for name in names.values():
+                await client.delete_collection(name)
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Qdrant single vs split collection latency")
+    parser.add_argument("--url", default="http://localhost:6333", help="Qdrant URL (or ':memory:')")
+    parser.add_argument("--points", type=int, default=6236)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark collections")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Per-stage latency of Quran result building: verse texts joined from PostgreSQL (before)
+vs read from the Qdrant payload (VERSE_TEXT_SOURCE = "payload"), and full vs narrowed
+with_payload.
+
+Builds two ayah-sized synthetic collections, one with the usual metadata payload and one
+that also carries display text (as quran_qdrant_ingestion.py --payload-text writes it), and
+runs the same queries through services.corpus_search.search_corpus, reporting its
+search_ms / texts_ms stage timings. The PostgreSQL leg uses POSTGRES_CONFIG (a quran_ayah
+table must be loaded); when it is unreachable a fixed --pg-rtt-ms stub stands in.
+Run from the backend directory:
+    python -m benchmarks.bench_text_source --queries 300
+    python -m benchmarks.bench_text_source --url :memory: --points 2000
+"""
+import argparse
+import asyncio
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient, models
+
+from benchmarks.bench_filters import payload
+from benchmarks.bench_qdrant_layouts import DENSE_DIM, synthetic_points
+from services import corpus_search
+from services.postgres_service import close_pool, init_pool
+from services.qdrant_service import HybridQdrantService, VERSE_PAYLOAD_FIELDS, VERSE_TEXT_FIELDS
+
+PREFIX = "bench_text"
+
+
+def display_text(i):
+    return {
+        "text_ar": "وَاصْبِرْ وَمَا صَبْرُكَ إِلَّا بِاللَّهِ " * 3 + str(i),
+        "text_ur": "اور صبر کرو اور تمہارا صبر اللہ ہی کی توفیق سے ہے " * 4 + str(i),
+        "text_en": "And be patient, and your patience is not but through Allah. " * 3 + str(i),
+        "surah_name_ar": "النحل", "surah_name_ur": "النحل", "surah_name_en": "The Bee", "transliteration": "An-Nahl"
+    }
+
+
+async def build(client, count, batch_size):
+    dense, sparse = synthetic_points(count, seed=0)
+    names = {"meta": f"{PREFIX}_meta", "text": f"{PREFIX}_payload"}
+    for kind, name in names.items():
+        if await client.collection_exists(name):
+            await client.delete_collection(name)
+        await client.create_collection(
+            name,
+            vectors_config={"dense": models.VectorParams(size=DENSE_DIM, distance=models.Distance.COSINE)},
+            sparse_vectors_config={"sparse": models.SparseVectorParams()}
+        )
+        for start in range(0, count, batch_size):
+            await client.upsert(name, [
+                models.PointStruct(
+                    id=i + 1,
+                    vector={"dense": dense[i].tolist(), "sparse": sparse[i]},
+                    payload={**payload(i, count), **(display_text(i) if kind == "text" else {})}
+                )
+                for i in range(start, min(start + batch_size, count))
+            ])
+    return names
+
+
+async def measure(queries, top_k):
+    search, texts, total = [], [], []
+    for embeddings in queries:
+        timings = {}
+        await corpus_search.search_corpus("quran", embeddings, top_k, timings=timings)
+        search.append(timings["search_ms"])
+        texts.append(timings["texts_ms"])
+        total.append(timings["search_ms"] + timings["texts_ms"])
+    return np.percentile(search, 50), np.percentile(texts, 50), np.percentile(total, 50), np.percentile(total, 99)
+
+
+async def run(args):
+    dense, sparse = synthetic_points(args.queries, seed=1)
+    queries = [
+        {"dense": dense[i].tolist(), "sparse": {"indices": sparse[i].indices, "values": sparse[i].values}}
+        for i in range(args.queries)
+    ]
+
+    client = AsyncQdrantClient(location=args.url, timeout=60)
+    print(f"Building {args.points} points x 2 collections on {args.url}...")
+    names = await build(client, args.points, args.batch_size)
+
+    if await init_pool() is None:
+        print(f"PostgreSQL unreachable: a {args.pg_rtt_ms} ms stub stands in for the verse fetch")
+
+        async def verse_texts(verse_details):
+            await asyncio.sleep(args.pg_rtt_ms / 1000)
+            return [{"quran_id": d["quran_id"], **display_text(d["quran_id"])} for d in verse_details]
+
+        corpus_search.get_verse_texts = verse_texts
+
+    scenarios = [
+        ("postgres join, full payload", names["meta"], None, "postgres"),
+        ("postgres join, narrowed", names["meta"], VERSE_PAYLOAD_FIELDS, "postgres"),
+        ("payload text, full payload", names["text"], None, "payload"),
+        ("payload text, narrowed", names["text"], VERSE_PAYLOAD_FIELDS + VERSE_TEXT_FIELDS, "payload"),
+    ]
+    try:
+        print(f"\n{'':>30} {'search p50':>11} {'texts p50':>10} {'total p50':>10} {'p99':>8}")
+        for label, collection, fields, source in scenarios:
+            service = HybridQdrantService(payload_fields=fields)
+            await service.client.close()
+            service.client = client
+            service._use_single_collection(collection)
+            corpus_search.search_service = service
+            corpus_search.VERSE_TEXT_SOURCE = source
+            await measure(queries[:10], args.top_k)  # warm-up
+            search, texts, total, p99 = await measure(queries, args.top_k)
+            print(f"{label:>30} {search:8.2f} ms {texts:7.2f} ms {total:7.2f} ms {p99:5.2f} ms")
+    finally:
+        if not args.keep:
+            for name in names.values():
+                await client.delete_collection(name)
+        await client.close()
+        await close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PostgreSQL join vs Qdrant payload text, per stage")
+    parser.add_argument("--url", default="http://localhost:6333", help="Qdrant URL (or ':memory:')")
+    parser.add_argument("--points", type=int, default=6236)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--pg-rtt-ms", type=float, default=2.0, help="stub latency when PostgreSQL is unreachable")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark collections")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Verse store benchmark: build size, snapshot load time and per-lookup latency.
+
+Rows are assembled from the canonical Quran JSON files in datasets/quran/q_canonical,
+so no PostgreSQL is needed. Run from the backend directory:
+    python -m benchmarks.bench_verse_store
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from services.verse_store import VerseStore
+
+CANONICAL_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "datasets", "quran", "q_canonical")
+
+
+def canonical_rows(canonical_dir):
+    """Assemble quran_ayah-shaped rows from the canonical ar/en/ur JSON files"""
+    surahs = {}
+    for lang in ("ar", "en", "ur"):
+        with open(os.path.join(canonical_dir, f"Quran_{lang}.json"), encoding="utf-8") as f:
+            surahs[lang] = json.load(f)
+
+    rows = []
+    quran_id = 0
+    for ar, en, ur in zip(surahs["ar"], surahs["en"], surahs["ur"]):
+        for v_ar, v_en, v_ur in zip(ar["verses"], en["verses"], ur["verses"]):
+            quran_id += 1
+            rows.append({
+                "quran_id": quran_id,
+                "juz_id": 0,
+                "surah_id": ar["id"],
+                "ayah_id": v_ar["id"],
+                "source": "Quran",
+                "transliteration": ar["transliteration"],
+                "surah_name_ar": ar["name"],
+                "surah_name_ur": ur.get("translation", ""),
+                "surah_name_en": en.get("translation", ""),
+                "surah_type": ar["type"],
+                "text_ar": v_ar["text"],
+                "text_ur": v_ur["translation"],
+                "text_en": v_en["translation"]
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verse store benchmark")
+    parser.add_argument("--canonical-dir", default=CANONICAL_DIR)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rows = canonical_rows(args.canonical_dir)
+
+    start = time.perf_counter()
+    store = VerseStore.from_rows(rows, version=1)
+    build = time.perf_counter() - start
+    print(f"built {len(store)} verses in {build * 1000:.1f} ms, {store.nbytes() / 1e6:.2f} MB in arrays/buffers, "
+          f"{len(store.surah_table)} interned surahs")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "verse_store.pkl")
+        store.save(path)
+        start = time.perf_counter()
+        store = VerseStore.load(path)
+        print(f"snapshot {os.path.getsize(path) / 1e6:.2f} MB loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    ids = [random.randint(1, len(store)) for _ in range(args.lookups)]
+    start = time.perf_counter()
+    for quran_id in ids:
+        store.get(quran_id)
+    per_lookup = (time.perf_counter() - start) / len(ids)
+    print(f"{len(ids)} random lookups: {per_lookup * 1e6:.2f} µs per verse")
+
+
+if __name__ == "__main__":
+    main()
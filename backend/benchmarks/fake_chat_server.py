@@ -0,0 +1,102 @@
+"""
+Local stand-in for the OpenAI-compatible chat endpoint (the Hugging Face router).
+
+POST /v1/chat/completions answers with an Urdu filler explanation of --tokens words,
+plain or streamed as chat.completion.chunk events (stream=true). The time to the first
+token is drawn from a benchmarks.latency distribution, each following token costs
+--token-ms, and --error-rate of the calls fail with a 500, so retries and fallbacks can
+be exercised. Usage reports prompt tokens estimated at 4 characters per token.
+
+Run standalone (then point LLM_BASE_URL at http://127.0.0.1:8002/v1):
+    python -m benchmarks.fake_chat_server --port 8002 --latency lognormal:800,0.5
+or mount in-process: AsyncOpenAI(base_url="http://fake-llm/v1", api_key="bench",
+http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(...)))).
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.latency import latency_sampler
+
+WORDS = ["صبر", "نماز", "اللہ", "رحمت", "ہدایت", "آیت", "زندگی", "ایمان", "شکر", "عمل"]
+
+
+def create_app(latency="800", tokens=300, token_ms=0.0, error_rate=0.0, seed=0):
+    app = FastAPI(title="Fake OpenAI-compatible chat server")
+    app.state.requests = 0
+    app.state.errors = 0
+    first_token = latency_sampler(latency, seed)
+    failures = random.Random(seed + 1)
+
+    def chunk(completion_id, model, delta, finish_reason=None):
+        return {
+            "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        model = body.get("model", "fake")
+        completion_id = f"chatcmpl-{app.state.requests}"
+        count = min(tokens, body.get("max_tokens") or tokens)
+        words = [WORDS[i % len(WORDS)] for i in range(count)]
+        prompt_tokens = sum(len(message.get("content") or "") for message in body.get("messages", [])) // 4
+
+        await asyncio.sleep(first_token())
+        if failures.random() < error_rate:
+            app.state.errors += 1
+            return JSONResponse({"error": {"message": "injected failure", "type": "server_error"}}, status_code=500)
+
+        if body.get("stream"):
+            async def events():
+                yield f"data: {json.dumps(chunk(completion_id, model, {'role': 'assistant', 'content': ''}))}\n\n"
+                for i, word in enumerate(words):
+                    if i and token_ms:
+                        await asyncio.sleep(token_ms / 1000)
+                    content = word if i == 0 else " " + word
+                    yield f"data: {json.dumps(chunk(completion_id, model, {'content': content}), ensure_ascii=False)}\n\n"
+                yield f"data: {json.dumps(chunk(completion_id, model, {}, 'stop'))}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        if token_ms:
+            await asyncio.sleep(token_ms * max(count - 1, 0) / 1000)
+        return JSONResponse({
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": count, "total_tokens": prompt_tokens + count}
+        })
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests, "errors": app.state.errors}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI-compatible chat endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--latency", default="800", help="time to first token, e.g. lognormal:800,0.5")
+    parser.add_argument("--tokens", type=int, default=300, help="words per answer (capped by max_tokens)")
+    parser.add_argument("--token-ms", type=float, default=0.0, help="cost of each token after the first")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.tokens, args.token_ms, args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Local stand-in for the Colab /embed endpoint.
+
+Embeddings are deterministic pseudo-vectors derived from a hash of the text, in the
+same response shape the Colab notebook returns. Latency models a single GPU encoder:
+forward passes run one at a time, each costing a fixed amount (or one drawn from a
+benchmarks.latency distribution) plus a small amount per text, so batching shows up in
+the numbers.
+
+Run standalone (then point COLAB_API_URL at it):
+    python -m benchmarks.fake_embed_server --port 8001 --base-latency-ms 40
+    python -m benchmarks.fake_embed_server --port 8001 --latency lognormal:40,0.4
+or mount in-process with httpx.ASGITransport(app=create_app(...)).
+"""
+import argparse
+import asyncio
+import hashlib
+import re
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from benchmarks.latency import latency_sampler
+
+DENSE_DIM = 1024
+VOCAB_SIZE = 250_002  # BGE-M3 / XLM-R vocabulary size
+
+
+def fake_embedding(text):
+    """Deterministic dense + sparse embedding for text"""
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+    dense = np.random.default_rng(seed).standard_normal(DENSE_DIM).astype(np.float32)
+    dense /= np.linalg.norm(dense)
+
+    weights = {}
+    for token in re.findall(r"\w+", text.lower()):
+        token_id = int.from_bytes(hashlib.md5(token.encode("utf-8")).digest()[:4], "little") % VOCAB_SIZE
+        weights[token_id] = max(weights.get(token_id, 0.0), 0.1 + (len(token) % 7) / 10)
+
+    return {
+        "text": text,
+        "embeddings": {
+            "dense": dense.tolist(),
+            "sparse": {"indices": list(weights.keys()), "values": list(weights.values())}
+        }
+    }
+
+
+def create_app(base_latency_ms=40.0, per_item_latency_ms=1.0, support_batch=True, latency=None, seed=0):
+    """latency: benchmarks.latency spec for the per-pass cost, replacing base_latency_ms"""
+    app = FastAPI(title="Fake Colab embed server")
+    base_latency = latency_sampler(latency if latency is not None else base_latency_ms, seed)
+    app.state.requests = 0
+    app.state.texts = 0
+    gpu = asyncio.Lock()
+
+    @app.post("/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        texts = body.get("texts")
+        if texts is not None and not support_batch:
+            return JSONResponse({"detail": "field 'text' required"}, status_code=422)
+
+        batch = texts if texts is not None else [body.get("text", "")]
+        app.state.requests += 1
+        app.state.texts += len(batch)
+        async with gpu:
+            await asyncio.sleep(base_latency() + per_item_latency_ms * len(batch) / 1000.0)
+
+        if texts is not None:
+            return JSONResponse({"results": [fake_embedding(text) for text in batch]})
+        return JSONResponse(fake_embedding(batch[0]))
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests, "texts": app.state.texts}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the Colab /embed endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--base-latency-ms", type=float, default=40.0)
+    parser.add_argument("--per-item-latency-ms", type=float, default=1.0)
+    parser.add_argument("--latency", default=None, help="per-pass latency distribution, e.g. lognormal:40,0.4")
+    parser.add_argument("--no-batch", action="store_true", help="reject {\"texts\": [...]} requests")
+    args = parser.parse_args()
+
+    app = create_app(args.base_latency_ms, args.per_item_latency_ms, not args.no_batch, args.latency)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+Fault-injection scenarios for the request deadline, the circuit breakers and hedged LLM calls.
+
+The app runs in-process on the load test's stand-ins (benchmarks.load_test), with a fault
+switch in front of each upstream:
+
+  colab     FaultyTransport around the fake embed server (hang, refuse, error)
+  qdrant    FaultyQdrant around the embedded Qdrant client (hang, refuse)
+  postgres  the verse store is unloaded and POSTGRES_CONFIG points at a local port that accepts
+            connections and never answers (hang), or at a closed port (refuse)
+  llm       FaultyTransport around the fake chat server (hang, refuse, error, slow); a second
+            fake chat server is the hedge endpoint of llm_slow_hedged
+
+Stage timeouts, the request deadline and the breaker reset time are scaled down (--stage-timeout,
+--deadline, --reset-seconds) so a scenario takes seconds. Each one sends --requests POST /search
+with the fault on and checks statuses, that no request outlived the deadline, that the last
+requests failed fast, and the metrics (fallbacks, breaker trips and rejections, deadline and
+hedge counters). Then it heals the fault, waits for the breaker to half-open and checks that the
+next requests close it again. Exits with status 1 when a check fails. Run from the backend directory:
+    python -m benchmarks.fault_scenarios
+    python -m benchmarks.fault_scenarios --scenario colab_hang llm_slow_hedged --requests 40
+"""
+import argparse
+import asyncio
+import socket
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+from openai import AsyncOpenAI
+
+from benchmarks import fake_chat_server, fake_embed_server
+from benchmarks.load_test import DEFAULT_WORKLOAD, Recorder, load_workload, setup
+from config.settings import CORPORA
+from main import app
+from services import embedding_service, llm_service, postgres_service, qdrant_service, resilience, verse_store
+from services.logger import stop_logging
+
+# fault: (upstream, mode); breaker: None, or the breaker expected to trip ("qdrant" = the Quran
+# collection's); closed: a breaker that must not trip; fallback: fallback path every request goes through
+SCENARIOS = {
+    "baseline": {"fault": None, "statuses": {200}},
+    "colab_hang": {"fault": ("colab", "hang"), "breaker": "colab", "fallback": "dummy_embedding", "statuses": {200}},
+    "colab_down": {"fault": ("colab", "refuse"), "breaker": "colab", "fallback": "dummy_embedding", "statuses": {200}},
+    "qdrant_hang": {"fault": ("qdrant", "hang"), "breaker": "qdrant", "statuses": {500, 504}},
+    "qdrant_down": {"fault": ("qdrant", "refuse"), "breaker": "qdrant", "statuses": {500}},
+    "postgres_hang": {"fault": ("postgres", "hang"), "breaker": "postgres", "fallback": "postgres", "statuses": {200}},
+    "postgres_down": {"fault": ("postgres", "refuse"), "breaker": "postgres", "fallback": "postgres", "statuses": {200}},
+    "llm_hang": {"fault": ("llm", "hang"), "breaker": "llm", "fallback": "llm", "statuses": {200}},
+    "llm_errors": {"fault": ("llm", "error"), "breaker": "llm", "fallback": "llm", "statuses": {200}},
+    # The LLM answers after 10 deadlines and has no attempt timeout of its own: only the deadline stops
+    # it, and a cut the deadline made is not held against the LLM's circuit
+    "llm_deadline": {
+        "fault": ("llm", "slow"), "fallback": "llm", "statuses": {200}, "deadline_stage": "llm", "closed": "llm"
+    },
+    "llm_slow_hedged": {"fault": ("llm", "slow"), "statuses": {200}, "hedge": True},
+}
+
+
+class FaultyTransport(httpx.AsyncBaseTransport):
+    """httpx transport in front of another: mode None passes through, hang never answers,
+    refuse fails to connect, error answers 503, slow answers after `delay` seconds"""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.mode = None
+        self.delay = 0.0
+
+    async def handle_async_request(self, request):
+        if self.mode == "hang":
+            await asyncio.Event().wait()
+        if self.mode == "refuse":
+            raise httpx.ConnectError("injected: connection refused", request=request)
+        if self.mode == "error":
+            return httpx.Response(503, json={"error": {"message": "injected failure"}}, request=request)
+        if self.mode == "slow":
+            await asyncio.sleep(self.delay)
+        return await self.inner.handle_async_request(request)
+
+
+class FaultyQdrant:
+    """Qdrant client proxy whose searches hang or fail to connect, depending on mode"""
+
+    SEARCHES = ("query_points", "query_batch_points")
+
+    def __init__(self, client):
+        self.client = client
+        self.mode = None
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name not in self.SEARCHES:
+            return attr
+
+        async def search(*args, **kwargs):
+            if self.mode == "hang":
+                await asyncio.Event().wait()
+            if self.mode == "refuse":
+                raise ConnectionRefusedError("injected: connection refused")
+            return await attr(*args, **kwargs)
+
+        return search
+
+
+async def blackhole():
+    """Local TCP server that accepts connections and never answers; returns (server, port)"""
+    held = []
+    server = await asyncio.start_server(lambda reader, writer: held.append(writer), "127.0.0.1", 0)
+    server.held = held
+    return server, server.sockets[0].getsockname()[1]
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def chat_client(transport):
+    return AsyncOpenAI(
+        base_url="http://fake-llm/v1", api_key="bench",
+        http_client=httpx.AsyncClient(transport=transport, timeout=60), max_retries=0
+    )
+
+
+class Faults:
+    """The fault switches and how to turn each one on and off"""
+
+    def __init__(self, args, service):
+        self.args = args
+        self.colab = FaultyTransport(httpx.ASGITransport(app=fake_embed_server.create_app(latency=args.embed_latency)))
+        self.llm = FaultyTransport(httpx.ASGITransport(app=fake_chat_server.create_app(args.llm_latency, args.llm_tokens)))
+        self.hedge = chat_client(httpx.ASGITransport(app=fake_chat_server.create_app(args.llm_latency, args.llm_tokens, seed=1)))
+        self.service = service
+        self.qdrant = None
+        if isinstance(service, qdrant_service.HybridQdrantService):
+            self.qdrant = service.client = FaultyQdrant(service.client)
+        self.postgres_config = dict(postgres_service.POSTGRES_CONFIG)
+        self.store = verse_store.verse_store
+        self.server = None
+        self.port = None
+
+    async def install(self):
+        await embedding_service.close_http_client()
+        await embedding_service.init_http_client(transport=self.colab)
+        llm_service.llm_client = chat_client(self.llm)
+        self.server, self.port = await blackhole()
+
+    def breaker(self, name):
+        if name == "qdrant":
+            return self.service.breaker
+        return resilience.circuit_breaker(name)
+
+    def on(self, scenario):
+        upstream, mode = scenario["fault"]
+        if upstream in ("colab", "llm"):
+            transport = getattr(self, upstream)
+            transport.mode = mode
+            transport.delay = self.args.deadline * 10 if scenario.get("deadline_stage") else self.args.llm_slow
+        elif upstream == "qdrant":
+            self.qdrant.mode = mode
+        else:
+            verse_store.verse_store = None
+            port = self.port if mode == "hang" else closed_port()
+            postgres_service.POSTGRES_CONFIG = {**self.postgres_config, "host": "127.0.0.1", "port": port}
+        if scenario.get("deadline_stage"):
+            llm_service.LLM_ATTEMPT_TIMEOUT = self.args.deadline * 100
+        if scenario.get("hedge"):
+            llm_service.llm_hedge_client = self.hedge
+            llm_service.hedge_breaker = resilience.circuit_breaker("llm_hedge", "llm")
+            llm_service.LLM_HEDGE_MODEL = "fake-hedge"
+            # Slow, not failing: the primary would otherwise time out (and open its circuit) before the hedge answers
+            llm_service.LLM_ATTEMPT_TIMEOUT = self.args.llm_slow * 2
+
+    def off(self):
+        self.colab.mode = self.llm.mode = None
+        if self.qdrant is not None:
+            self.qdrant.mode = None
+        verse_store.verse_store = self.store
+        postgres_service.POSTGRES_CONFIG = dict(self.postgres_config)
+        llm_service.LLM_ATTEMPT_TIMEOUT = self.args.stage_timeout
+        llm_service.llm_hedge_client = None
+        llm_service.hedge_breaker = None
+
+    async def close(self):
+        self.server.close()
+        for writer in self.server.held:
+            writer.close()
+        await self.hedge.close()
+
+
+def scale_timeouts(args):
+    """Stage timeouts, deadline and breaker reset times small enough for a scenario to take seconds"""
+    embedding_service.EMBEDDING_HTTP_TIMEOUT = args.stage_timeout
+    qdrant_service.QDRANT_SEARCH_TIMEOUT = args.stage_timeout
+    for config in CORPORA.values():
+        config["timeout"] = args.stage_timeout * 3.5   # search + pool acquire + query fit inside, as in settings
+    postgres_service.POSTGRES_CONNECT_TIMEOUT = args.stage_timeout
+    postgres_service.POSTGRES_QUERY_TIMEOUT = args.stage_timeout
+    postgres_service.POSTGRES_POOL_ACQUIRE_TIMEOUT = args.stage_timeout
+    llm_service.LLM_ATTEMPT_TIMEOUT = args.stage_timeout
+    llm_service.LLM_RETRY_DELAY = args.stage_timeout / 5
+    llm_service.LLM_HEDGE_DEFAULT_DELAY = llm_service.LLM_HEDGE_MIN_DELAY = args.hedge_delay
+    resilience.REQUEST_DEADLINES = {"default": args.deadline}
+
+
+async def send(client, bodies, concurrency):
+    """POST /search for each body, concurrency at a time, in order; returns [(status, seconds)]"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(body):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/search", json=body)
+            return response.status_code, time.perf_counter() - start
+
+    return await asyncio.gather(*(one(body) for body in bodies))
+
+
+async def run_scenario(name, scenario, args, faults, client, bodies, recorder):
+    """Returns [(check, passed, detail)]"""
+    for breaker in resilience.breakers.values():
+        breaker.reset()
+        breaker.reset_seconds = args.reset_seconds
+    # Breakers count trips since startup; only this scenario's are checked
+    trips = {breaker.name: breaker.trips for breaker in resilience.breakers.values()}
+    recorder.counts.clear()
+    checks = []
+
+    if scenario["fault"]:
+        faults.on(scenario)
+    try:
+        outcomes = await send(client, bodies, args.concurrency)
+    finally:
+        faults.off()
+    counts = dict(recorder.counts)
+    statuses = {status for status, _ in outcomes}
+    latencies = np.array([seconds for _, seconds in outcomes])
+    tail = latencies[-max(1, len(latencies) // 4):]
+
+    checks.append(("statuses", statuses <= scenario["statuses"], f"{sorted(statuses)}"))
+    checks.append((
+        "within deadline", latencies.max() <= args.deadline + args.slack,
+        f"max {latencies.max() * 1000:.0f} ms (deadline {args.deadline * 1000:.0f} ms)"
+    ))
+    if scenario.get("fallback"):
+        fallbacks = counts.get(f"fallback.{scenario['fallback']}", 0)
+        checks.append((f"{scenario['fallback']} fallback", fallbacks >= len(bodies), f"{fallbacks:.0f}/{len(bodies)}"))
+    elif scenario["statuses"] == {200}:
+        fallbacks = {key: value for key, value in counts.items() if key.startswith("fallback.")}
+        checks.append(("no fallback", not fallbacks, f"{fallbacks or 'none'}"))
+    if scenario.get("breaker"):
+        breaker = faults.breaker(scenario["breaker"])
+        rejected = counts.get(f"circuit_rejected.{breaker.name}", 0)
+        tripped = breaker.trips - trips.get(breaker.name, 0)
+        checks.append((f"{breaker.name} circuit opened", tripped >= 1 and rejected > 0, f"trips {tripped}, rejected {rejected:.0f}"))
+        checks.append((
+            "fails fast once open", np.median(tail) <= args.fast_ms / 1000,
+            f"p50 of last {len(tail)} {np.median(tail) * 1000:.0f} ms (limit {args.fast_ms:.0f} ms)"
+        ))
+    if scenario.get("deadline_stage"):
+        exceeded = counts.get(f"deadline_exceeded.{scenario['deadline_stage']}", 0)
+        checks.append(("deadline stopped the stage", exceeded >= 1, f"{exceeded:.0f} stages stopped"))
+    if scenario.get("closed"):
+        breaker = faults.breaker(scenario["closed"])
+        tripped = breaker.trips - trips.get(breaker.name, 0)
+        checks.append((f"{breaker.name} circuit stays closed", tripped == 0, f"trips {tripped}"))
+    if scenario.get("hedge"):
+        won = counts.get("llm_hedge.won", 0)
+        checks.append(("hedge answered", won >= len(bodies), f"{won:.0f}/{len(bodies)} won"))
+        checks.append((
+            "hedged latency", np.percentile(latencies, 95) <= args.llm_slow / 2,
+            f"p95 {np.percentile(latencies, 95) * 1000:.0f} ms (slow primary {args.llm_slow * 1000:.0f} ms)"
+        ))
+
+    if scenario.get("breaker") and scenario["fault"][0] != "postgres":
+        # Healed: after reset_seconds the probe goes through and closes the circuit
+        await asyncio.sleep(args.reset_seconds * 1.1)
+        recorder.counts.clear()
+        recovered = await send(client, bodies[:3], 1)
+        breaker = faults.breaker(scenario["breaker"])
+        fallbacks = {key: value for key, value in recorder.counts.items() if key.startswith("fallback.")}
+        checks.append((
+            "recovers after heal", breaker.state == breaker.CLOSED and not fallbacks and {s for s, _ in recovered} == {200},
+            f"state {breaker.state}, statuses {sorted({s for s, _ in recovered})}, fallbacks {fallbacks or 'none'}"
+        ))
+    return checks, latencies
+
+
+async def run(args):
+    bodies = [entry["body"] for entry in load_workload(args.workload) if entry["endpoint"] == "/search"]
+    bodies = [{**bodies[i % len(bodies)], "corpora": ["quran"]} for i in range(args.requests)]
+    setup_args = argparse.Namespace(
+        engine=args.engine, qdrant_url=":memory:", points=args.points, seed=0,
+        embed_latency=args.embed_latency, embed_per_item_ms=1.0,
+        llm_latency=args.llm_latency, llm_tokens=args.llm_tokens, llm_token_ms=0.0, llm_error_rate=0.0, cache=False
+    )
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Setting up stand-ins ({args.engine} search engine)...")
+        service = await setup(setup_args, tmp)
+        faults = Faults(args, service)
+        await faults.install()
+        scale_timeouts(args)
+        recorder = Recorder()
+        recorder.install()
+
+        names = args.scenario or list(SCENARIOS)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://faults", timeout=120) as client:
+            await send(client, bodies[:5], 1)  # warm-up
+            for name in names:
+                scenario = SCENARIOS[name]
+                if scenario["fault"] and scenario["fault"][0] == "qdrant" and faults.qdrant is None:
+                    print(f"\n{name}: skipped (needs --engine qdrant)")
+                    continue
+                checks, latencies = await run_scenario(name, scenario, args, faults, client, bodies, recorder)
+                print(f"\n{name}: p50 {np.percentile(latencies, 50) * 1000:.0f} ms, "
+                      f"p95 {np.percentile(latencies, 95) * 1000:.0f} ms, max {latencies.max() * 1000:.0f} ms")
+                for check, passed, detail in checks:
+                    print(f"  {'✅' if passed else '❌'} {check}: {detail}")
+                    failed += not passed
+
+        await faults.close()
+        await embedding_service.close_http_client()
+        await service.close()
+        stop_logging()
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fault-injection scenarios for deadlines, circuit breakers and hedging")
+    parser.add_argument("--scenario", nargs="+", choices=list(SCENARIOS), help="default: all")
+    parser.add_argument("--requests", type=int, default=20, help="POST /search per scenario")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workload", default=DEFAULT_WORKLOAD)
+    parser.add_argument("--engine", choices=("local", "qdrant"), default="qdrant", help="qdrant runs embedded (':memory:')")
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--embed-latency", default="20")
+    parser.add_argument("--llm-latency", default="50")
+    parser.add_argument("--llm-tokens", type=int, default=200)
+    parser.add_argument("--llm-slow", type=float, default=2.0, help="seconds the slow primary LLM takes (llm_slow_hedged)")
+    parser.add_argument("--stage-timeout", type=float, default=0.5, help="per-stage timeout (seconds)")
+    parser.add_argument("--deadline", type=float, default=2.0, help="request deadline (seconds)")
+    parser.add_argument("--reset-seconds", type=float, default=1.0, help="circuit breaker open time")
+    parser.add_argument("--hedge-delay", type=float, default=0.3, help="hedge after this long (seconds)")
+    parser.add_argument("--fast-ms", type=float, default=500.0,
+                        help="latency limit once a circuit is open (a hung stage alone takes --stage-timeout)")
+    parser.add_argument("--slack", type=float, default=0.3, help="seconds allowed past the deadline")
+    args = parser.parse_args()
+
+    failed = asyncio.run(run(args))
+    if failed:
+        print(f"\n❌ {failed} checks failed")
+        sys.exit(1)
+    print("\n✅ All checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Latency distributions for the fake servers, from a short spec string (milliseconds):
+
+    40                  fixed 40 ms
+    fixed:40            same
+    uniform:20,60       uniform between 20 and 60 ms
+    normal:40,10        mean 40, standard deviation 10 (clipped at 0)
+    lognormal:40,0.5    median 40, sigma 0.5 (long right tail, like real network/GPU calls)
+
+Samplers are seeded so a run can be repeated exactly.
+"""
+import math
+import random
+
+
+def latency_sampler(spec, seed=0):
+    """Callable returning one latency in seconds drawn from spec"""
+    kind, _, params = str(spec).partition(":")
+    if not params:
+        kind, params = "fixed", kind
+    values = [float(value) for value in params.split(",")]
+    rng = random.Random(seed)
+
+    if kind == "fixed":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: rng.uniform(values[0], values[1]) / 1000
+    if kind == "normal":
+        return lambda: max(0.0, rng.gauss(values[0], values[1])) / 1000
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda: rng.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"Unknown latency distribution: {spec}")
@@ -0,0 +1,344 @@
+"""
+Reproducible load test of the FastAPI app with local stand-ins for every dependency.
+
+  embeddings   benchmarks.fake_embed_server, mounted in-process (latency distribution)
+  LLM          benchmarks.fake_chat_server behind the real AsyncOpenAI client
+  search       the in-process engine on a synthetic ayah-sized corpus (--engine local), or
+               Qdrant (--engine qdrant; --qdrant-url :memory: runs it embedded)
+  verse texts  the verse store built from datasets/quran/q_canonical (no PostgreSQL)
+
+A workload file (one JSON object per line: {"request_id": ..., "endpoint": ..., "body": {...}},
+or a bare /search body; see benchmarks/workloads/queries.jsonl) is replayed in a loop at a
+fixed request rate, open loop: request i is sent at start + i / rps whether or not earlier
+ones finished, and its latency counts from that scheduled time. Reports throughput, errors
+and p50/p95/p99 of the client latency and of every stage recorded by services.metrics.
+Only the quran corpus has a stand-in; hadith corpora in a workload are reported as skipped.
+
+    python -m benchmarks.load_test --rps 20 --duration 30 --save baseline.json
+    python -m benchmarks.load_test --rps 20 --duration 30 --baseline baseline.json
+
+With --baseline the run is a regression gate: it exits with status 1 when a stage's p95
+or p99 grows by more than --tolerance (plus --slack-ms), throughput drops by more than
+--tolerance, or the error rate exceeds the baseline's and --max-error-rate. Stages with
+fewer than --min-samples samples in either run are reported but not gated. The stand-ins
+share the app's process and event loop, so record the baseline on the machine that runs
+the gate.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import httpx
+import numpy as np
+from openai import AsyncOpenAI
+
+from benchmarks import fake_chat_server, fake_embed_server
+from benchmarks.bench_local_search import write_jsonl
+from benchmarks.bench_verse_store import CANONICAL_DIR, canonical_rows
+from config.settings import EMBEDDING_BACKEND, VERSE_STORE_VERSION
+from main import app
+from services import corpus_search, embedding_service, llm_service, metrics, verse_store
+from services.local_search import LocalSearchService
+from services.logger import configure_logging, stop_logging
+from services.qdrant_service import HybridQdrantService, VERSE_PAYLOAD_FIELDS
+
+DEFAULT_WORKLOAD = os.path.join(os.path.dirname(__file__), "workloads", "queries.jsonl")
+
+
+def load_workload(path):
+    """Workload entries as {"request_id", "endpoint", "body"}"""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            body = record.get("body", record)
+            if isinstance(body, str):
+                body = {"text": record.get("title") or body}
+            entries.append({
+                "request_id": str(record.get("request_id", f"line-{line_no}")),
+                "endpoint": record.get("endpoint", "/search/batch" if "queries" in body else "/search"),
+                "body": body
+            })
+    return entries
+
+
+class Recorder:
+    """Tees every services.metrics observation into per-stage samples (and counters)"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.counts = Counter()
+        self._child = metrics._child
+        self._tees = {}
+
+    @staticmethod
+    def key(metric, labels):
+        if metric is metrics.STAGE_SECONDS:
+            return f"{labels['endpoint']}.{labels['stage']}"
+        if metric is metrics.CORPUS_STAGE_SECONDS:
+            return f"corpus.{labels['corpus']}.{labels['stage']}"
+        if metric is metrics.QDRANT_LEG_SECONDS:
+            return f"qdrant.{labels['leg']}"
+        if metric is metrics.LLM_ATTEMPT_SECONDS:
+            return f"llm_attempt.{labels['outcome']}"
+        if metric is metrics.LLM_PROMPT_TOKENS:
+            return f"prompt_tokens.{labels['source']}"
+        if metric is metrics.LLM_PROMPT_VERSES:
+            return f"prompt_verses.{labels['outcome']}"
+        if metric is metrics.FALLBACKS:
+            return f"fallback.{labels['path']}"
+        if metric is metrics.CIRCUIT_STATE:
+            return f"circuit.{labels['breaker']}"
+        if metric is metrics.CIRCUIT_REJECTED:
+            return f"circuit_rejected.{labels['breaker']}"
+        if metric is metrics.DEADLINE_EXCEEDED:
+            return f"deadline_exceeded.{labels['stage']}"
+        if metric is metrics.LLM_HEDGES:
+            return f"llm_hedge.{labels['outcome']}"
+        return f"skipped.{labels['corpus']}.{labels['reason']}"
+
+    def install(self):
+        recorder = self
+
+        class Tee:
+            def __init__(self, real, key):
+                self.real, self.key = real, key
+
+            def observe(self, seconds):
+                if self.key.startswith("prompt_tokens."):
+                    # Not a latency: summed into the counters instead of the stage samples
+                    recorder.counts[self.key] += seconds
+                else:
+                    recorder.samples[self.key].append(seconds * 1000)
+                self.real.observe(seconds)
+
+            def inc(self, amount=1):
+                recorder.counts[self.key] += amount
+                self.real.inc(amount)
+
+            def set(self, value):
+                self.real.set(value)
+
+        def child(metric, labels):
+            tee_key = (metric, tuple(labels.items()))
+            tee = self._tees.get(tee_key)
+            if tee is None:
+                tee = self._tees[tee_key] = Tee(self._child(metric, labels), self.key(metric, labels))
+            return tee
+
+        metrics._child = child
+
+
+async def setup(args, tmp):
+    """Swap every external dependency of the app for its local stand-in"""
+    if EMBEDDING_BACKEND != "colab":
+        sys.exit("The load test stands in for the Colab embedding backend, set EMBEDDING_BACKEND = \"colab\"")
+    configure_logging(console=False, log_file=os.path.join(tmp, "load_test.log"))
+
+    rows = canonical_rows(CANONICAL_DIR)
+    verse_store.verse_store = verse_store.VerseStore.from_rows(rows, VERSE_STORE_VERSION)
+    count = args.points or len(rows)
+
+    if args.engine == "local":
+        jsonl = os.path.join(tmp, "embeddings.jsonl")
+        write_jsonl(jsonl, count)
+        service = LocalSearchService(os.path.join(tmp, "embeddings"), jsonl, "float32")
+        service.load()
+    else:
+        from qdrant_client import AsyncQdrantClient
+        from benchmarks.bench_filters import COLLECTION, build
+
+        client = AsyncQdrantClient(location=args.qdrant_url, timeout=60)
+        await build(client, count, 256, True)
+        service = HybridQdrantService(collection=COLLECTION, layout="single", payload_fields=VERSE_PAYLOAD_FIELDS)
+        await service.client.close()
+        service.client = client
+        service._use_single_collection(COLLECTION)
+    corpus_search.search_service = service
+
+    embed_app = fake_embed_server.create_app(
+        per_item_latency_ms=args.embed_per_item_ms, latency=args.embed_latency, seed=args.seed
+    )
+    await embedding_service.close_http_client()
+    await embedding_service.init_http_client(transport=httpx.ASGITransport(app=embed_app))
+
+    chat_app = fake_chat_server.create_app(
+        args.llm_latency, args.llm_tokens, args.llm_token_ms, args.llm_error_rate, seed=args.seed
+    )
+    llm_service.llm_client = AsyncOpenAI(
+        base_url="http://fake-llm/v1",
+        api_key="bench",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=chat_app), timeout=60),
+        max_retries=0
+    )
+
+    if not args.cache:
+        embedding_service.embedding_cache = None
+        llm_service.explanation_cache = None
+    return service
+
+
+async def replay(workload, rps, total, recorder):
+    """Send total requests at rps (open loop); returns (wall seconds, status counts, dispatch lags)"""
+    statuses = Counter()
+    lags = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=120) as client:
+
+        async def send(i, entry, scheduled):
+            headers = {"X-Request-ID": f"{entry['request_id']}-{i}"}
+            try:
+                response = await client.post(entry["endpoint"], json=entry["body"], headers=headers)
+                statuses[response.status_code] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            recorder.samples[f"client{entry['endpoint']}"].append((time.perf_counter() - scheduled) * 1000)
+
+        start = time.perf_counter()
+        tasks = []
+        for i in range(total):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lags.append(max(0.0, -delay) * 1000)
+            tasks.append(asyncio.create_task(send(i, workload[i % len(workload)], scheduled)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start, statuses, lags
+
+
+def summarize(args, wall, statuses, lags, recorder):
+    total = sum(statuses.values())
+    ok = sum(count for status, count in statuses.items() if status == 200)
+    return {
+        "config": {
+            key: getattr(args, key) for key in (
+                "workload", "rps", "requests", "engine", "points", "seed", "embed_latency", "embed_per_item_ms",
+                "llm_latency", "llm_tokens", "llm_token_ms", "llm_error_rate", "cache"
+            )
+        },
+        "requests": total,
+        "ok": ok,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "error_rate": (total - ok) / total if total else 0.0,
+        "throughput_rps": ok / wall,
+        "dispatch_lag_p99_ms": float(np.percentile(lags, 99)) if lags else 0.0,
+        "stages": {
+            key: {
+                "count": len(values),
+                "p50_ms": float(np.percentile(values, 50)),
+                "p95_ms": float(np.percentile(values, 95)),
+                "p99_ms": float(np.percentile(values, 99))
+            }
+            for key, values in sorted(recorder.samples.items())
+        },
+        "counters": dict(recorder.counts)
+    }
+
+
+def report(result):
+    print(f"\n{result['requests']} requests, {result['ok']} ok, statuses {result['statuses']}")
+    print(f"throughput {result['throughput_rps']:.1f} req/s, error rate {result['error_rate']:.2%}, "
+          f"dispatch lag p99 {result['dispatch_lag_p99_ms']:.1f} ms")
+    print(f"\n{'stage':>28} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for key, stage in result["stages"].items():
+        print(f"{key:>28} {stage['count']:7d} {stage['p50_ms']:9.2f} {stage['p95_ms']:9.2f} {stage['p99_ms']:9.2f}")
+    if result["counters"]:
+        print(f"\ncounters: {result['counters']}")
+
+
+def regressions(result, baseline, tolerance, slack_ms, max_error_rate, min_samples):
+    """Reasons result is worse than baseline (empty when the gate passes)"""
+    failures = []
+    if result["config"] != baseline["config"]:
+        changed = [key for key in result["config"] if result["config"][key] != baseline["config"].get(key)]
+        print(f"⚠️ Baseline was recorded with a different configuration ({', '.join(changed)})")
+    for key, base in baseline["stages"].items():
+        current = result["stages"].get(key)
+        if current is None or min(current["count"], base["count"]) < min_samples:
+            continue
+        for quantile in ("p95_ms", "p99_ms"):
+            limit = base[quantile] * (1 + tolerance) + slack_ms
+            if current[quantile] > limit:
+                failures.append(f"{key} {quantile[:3]} {current[quantile]:.1f} ms > {limit:.1f} ms (baseline {base[quantile]:.1f} ms)")
+    floor = baseline["throughput_rps"] * (1 - tolerance)
+    if result["throughput_rps"] < floor:
+        failures.append(f"throughput {result['throughput_rps']:.1f} req/s < {floor:.1f} req/s (baseline {baseline['throughput_rps']:.1f})")
+    if result["error_rate"] > max(baseline["error_rate"], max_error_rate):
+        failures.append(f"error rate {result['error_rate']:.2%} > {max(baseline['error_rate'], max_error_rate):.2%}")
+    return failures
+
+
+async def run(args):
+    workload = load_workload(args.workload)
+    total = args.requests or int(args.rps * args.duration)
+    args.requests = total
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Setting up stand-ins ({args.engine} search engine)...")
+        service = await setup(args, tmp)
+        recorder = Recorder()
+        recorder.install()
+        await replay(workload, args.rps, min(args.warmup, total), Recorder())  # warm-up, not recorded
+        recorder.samples.clear()
+        recorder.counts.clear()
+
+        print(f"Replaying {len(workload)} workload entries: {total} requests at {args.rps} req/s...")
+        wall, statuses, lags = await replay(workload, args.rps, total, recorder)
+        await embedding_service.close_http_client()
+        await service.close()
+        stop_logging()
+    return summarize(args, wall, statuses, lags, recorder)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixed-rate load test of the app with local stand-ins")
+    parser.add_argument("--workload", default=DEFAULT_WORKLOAD, help="JSONL workload file")
+    parser.add_argument("--rps", type=float, default=20.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds (ignored with --requests)")
+    parser.add_argument("--requests", type=int, default=None)
+    parser.add_argument("--warmup", type=int, default=20, help="unrecorded requests sent first")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", choices=("local", "qdrant"), default="local")
+    parser.add_argument("--qdrant-url", default=":memory:", help="Qdrant for --engine qdrant (':memory:' runs embedded)")
+    parser.add_argument("--points", type=int, default=None, help="corpus size (default: one point per verse)")
+    parser.add_argument("--embed-latency", default="lognormal:40,0.3", help="per-pass embed latency distribution")
+    parser.add_argument("--embed-per-item-ms", type=float, default=1.0)
+    parser.add_argument("--llm-latency", default="lognormal:800,0.4", help="LLM time-to-first-token distribution")
+    parser.add_argument("--llm-tokens", type=int, default=300)
+    parser.add_argument("--llm-token-ms", type=float, default=0.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--cache", action="store_true", help="keep the embedding and explanation caches on")
+    parser.add_argument("--save", help="write the results as JSON (e.g. a new baseline)")
+    parser.add_argument("--baseline", help="results JSON to gate against; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--slack-ms", type=float, default=25.0, help="absolute latency slack per stage")
+    parser.add_argument("--min-samples", type=int, default=100, help="stages with fewer samples are not gated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    report(result)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.save}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures = regressions(result, json.load(f), args.tolerance, args.slack_ms, args.max_error_rate, args.min_samples)
+        if failures:
+            print("\n❌ Regression against baseline:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print("\n✅ No regression against baseline")
+
+
+if __name__ == "__main__":
+    main()
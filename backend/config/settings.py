@@ -2,6 +2,57 @@
 QDRANT_URL = "http://localhost:6333"
 QDRANT_DENSE_COLLECTION = "quran_dense"
 QDRANT_SPARSE_COLLECTION = "quran_sparse"
+# Single collection with named "dense" + "sparse" vectors (as built by quran_qdrant_ingestion.py)
+QDRANT_COLLECTION = "quran_ayahs"
+QDRANT_COLLECTION_LAYOUT = "auto"  # "auto" (detect at startup), "single" or "split"
+QDRANT_ALIAS_REFRESH_SECONDS = 30  # re-resolve QDRANT_COLLECTION when it is an alias (0 disables polling)
+# Admin endpoints (POST /admin/...) are disabled (404) unless a token is set; callers send it as X-Admin-Token
+ADMIN_TOKEN = None
+# Dense query parameters (quantization settings are ignored by collections built without quantization)
+QDRANT_HNSW_EF = None                 # None = server default (ef_construct)
+QDRANT_QUANTIZATION_RESCORE = True    # re-rank quantized candidates with the original vectors
+QDRANT_QUANTIZATION_OVERSAMPLING = 2.0  # fetch limit * oversampling quantized candidates before rescoring
+# Per search call, inside the Qdrant circuit breaker: keep them below the corpus timeouts (CORPORA,
+# SEARCH_BATCH_TIMEOUT) so a hung Qdrant counts against its circuit instead of just being cut off
+QDRANT_SEARCH_TIMEOUT = 4.5
+QDRANT_BATCH_SEARCH_TIMEOUT = 55.0
+
+# Hybrid fusion defaults (overridable per request)
+SEARCH_FUSION = "rrf"            # "rrf", "weighted" or "server" (Qdrant prefetch + RRF, one round trip)
+FUSION_DENSE_WEIGHT = 0.7
+FUSION_SPARSE_WEIGHT = 0.3
+RRF_K = 60
+SEARCH_CANDIDATE_MULTIPLIER = 2  # each leg fetches top_k * multiplier candidates
+
+# Search engine for the Quran corpus: "qdrant" or "local" (in-process exact search)
+SEARCH_ENGINE = "qdrant"
+LOCAL_SEARCH_EMBEDDINGS_DIR = "data/Quran_Embeddings"                # binary embedding set (utils/embedding_format)
+LOCAL_SEARCH_EMBEDDINGS_PATH = "data/Quran_Embeddings_Qdrant.jsonl"   # converted into the dir above when it is missing
+LOCAL_SEARCH_DENSE_DTYPE = "float32"   # dtype used for that conversion; float16 halves the file but is upcast at load (no fp16 BLAS on CPU)
+
+# Corpora searchable through /search (Query.corpora), searched concurrently and merged.
+# "quran" goes through SEARCH_ENGINE and the verse store; "hadith" corpora query their own
+# Qdrant collection (named dense + sparse vectors, may be an alias) and PostgreSQL table.
+# A corpus timeout covers the search (QDRANT_SEARCH_TIMEOUT) and the PostgreSQL text fetch
+# (POSTGRES_POOL_ACQUIRE_TIMEOUT + POSTGRES_QUERY_TIMEOUT): 4.5 + 2.5 + 2.5 < 10, so a slow
+# upstream surfaces as its own error (and fallback) instead of a corpus timeout.
+CORPORA = {
+    "quran": {"kind": "quran", "collection": QDRANT_COLLECTION, "table": "quran_ayah", "timeout": 10.0, "weight": 1.0},
+    "bukhari": {"kind": "hadith", "collection": "bukhari_hadith", "table": "bukhari_hadith", "timeout": 10.0, "weight": 1.0},
+}
+DEFAULT_CORPORA = ["quran"]
+CORPUS_SCORE_CALIBRATION = "max"   # "max" (score / corpus best), "rank" (1 / (RRF_K + rank)) or "none"; times the corpus weight
+
+# POST /search/batch: one embedding call, one batched search per corpus, one text fetch
+SEARCH_BATCH_MAX_QUERIES = 256
+SEARCH_BATCH_TIMEOUT = 60.0          # per corpus, for the whole batch
+SEARCH_BATCH_LLM_CONCURRENCY = 4     # explanations generated at once when explain=true
+
+# Where Quran verse texts for search results come from: "postgres" (verse store / PostgreSQL,
+# by quran_id) or "payload" (stored in the Qdrant points by quran_qdrant_ingestion.py
+# --payload-text; PostgreSQL is then not needed for Quran search, and verses whose point
+# has no text still fall back to it)
+VERSE_TEXT_SOURCE = "postgres"
 
 # PostgreSQL Configuration
 POSTGRES_CONFIG = {
@@ -11,15 +62,123 @@ POSTGRES_CONFIG = {
     "user": "abdul",
     "password": ""
 }
+POSTGRES_POOL_MIN_SIZE = 2
+POSTGRES_POOL_MAX_SIZE = 10
+POSTGRES_POOL_ACQUIRE_TIMEOUT = 2.5   # seconds to wait for a free connection (inside the corpus timeout)
+POSTGRES_STATEMENT_CACHE_SIZE = 100   # per-connection prepared statement cache
+POSTGRES_CONNECT_TIMEOUT = 5.0        # seconds to open a pool connection
+POSTGRES_QUERY_TIMEOUT = 2.5          # per query, capped by the request deadline (inside the corpus timeout)
+
+# In-process verse store (read-only copy of quran_ayah, refreshed from PostgreSQL on version bump)
+VERSE_STORE_ENABLED = True
+VERSE_STORE_PATH = "data/verse_store.pkl"
+VERSE_STORE_VERSION = 1   # bump after re-running the PostgreSQL ingestion
 
 # LLM Configuration (HuggingFace)
 HF_TOKEN = ""  # Your working token
 LLM_MODEL = "moonshotai/Kimi-K2-Instruct-0905"     # The working model
 LLM_BASE_URL = "https://router.huggingface.co/v1" 
+# Prompt budget (services.prompt_builder): system + user prompt tokens, counted with the model's
+# tokenizer (transformers, requirements-local.txt) or estimated from UTF-8 length without it.
+# Verses are added in rank order; the first one that does not fit is truncated, the rest dropped.
+LLM_TOKENIZER = LLM_MODEL                  # None always estimates
+# Kimi's tokenizer ships as custom code from its Hub repo; running it is opt-in, and only with
+# LLM_TOKENIZER_REVISION pinned to a commit hash. Left off, prompt tokens are estimated.
+LLM_TOKENIZER_TRUST_REMOTE_CODE = False
+LLM_TOKENIZER_REVISION = None              # Hub commit hash of LLM_TOKENIZER
+# Without the tokenizer (the default deployment) tokens are estimated from UTF-8 length, with the
+# bytes per token fitted to the provider's usage.prompt_tokens as answers come back; the mode in
+# use is logged at startup and shown under "prompt_tokenizer" on /health
+LLM_TOKEN_ESTIMATE_MARGIN = 0.1            # estimates stay this share above the provider's counts
+LLM_INPUT_TOKEN_BUDGET = 3000
+LLM_MIN_VERSE_TOKENS = 80                  # a verse that would be cut below this is dropped instead
+LLM_MAX_QUERY_TOKENS = 200
+LLM_ATTEMPT_TIMEOUT = 45.0                 # per LLM call, capped by the request deadline
+LLM_RETRY_DELAY = 3.0
+# Hedged explanations (POST /search, batch): when the primary call has not answered after the
+# recent p95 of successful calls, the same prompt also goes to this endpoint and the first
+# answer wins. None disables hedging. The hedge endpoint is also used while the primary's
+# circuit is open.
+LLM_HEDGE_MODEL = None                     # e.g. "meta-llama/Llama-3.3-70B-Instruct"
+LLM_HEDGE_BASE_URL = None                  # None = LLM_BASE_URL
+LLM_HEDGE_MIN_DELAY = 2.0                  # never hedge earlier than this (seconds)
+LLM_HEDGE_DEFAULT_DELAY = 20.0             # until LLM_HEDGE_MIN_SAMPLES calls have been timed
+LLM_HEDGE_MIN_SAMPLES = 20
+
+# Explanation cache: generated explanations keyed on normalized query + ordered verse ids
+EXPLANATION_CACHE_ENABLED = True
+EXPLANATION_CACHE_MAX_ENTRIES = 2000                        # in-memory LRU size
+EXPLANATION_CACHE_TTL = 7 * 24 * 3600                       # seconds, both tiers
+EXPLANATION_CACHE_DB_PATH = "data/explanation_cache.sqlite3"  # None keeps the cache in memory only
+EXPLANATION_CACHE_DB_MAX_ENTRIES = 50000
+
+# Embedding backend: "colab" (remote BGE-M3 behind COLAB_API_URL) or "local" (in-process CPU encoder)
+EMBEDDING_BACKEND = "colab"
 
 # Embedding Service (Google Colab)
 COLAB_API_URL = "https://pseudoclerically-nonlisting-kimberley.ngrok-free.dev"
+EMBEDDING_HTTP_TIMEOUT = 60.0
+EMBEDDING_HTTP2 = True                 # used when the h2 package is installed and the server supports it
+EMBEDDING_MAX_CONNECTIONS = 20
+EMBEDDING_KEEPALIVE_EXPIRY = 60.0      # seconds an idle keep-alive connection is kept
+
+# Micro-batching: concurrent queries gathered for a few ms are sent to /embed as
+# one {"texts": [...]} request, answered with {"results": [...]} in the same order
+EMBEDDING_BATCH_ENABLED = True
+EMBEDDING_BATCH_WINDOW_MS = 5
+EMBEDDING_BATCH_MAX_SIZE = 32
+
+# Local CPU encoder (EMBEDDING_BACKEND = "local"), extra deps in requirements-local.txt
+LOCAL_EMBEDDING_MODEL = "BAAI/bge-m3"
+LOCAL_EMBEDDING_RUNTIME = "onnx"            # "onnx" (exported graph) or "torch"
+LOCAL_EMBEDDING_ONNX_DIR = "data/bge-m3-onnx"  # python -m services.local_embedding export
+LOCAL_EMBEDDING_QUANTIZE = True             # int8 weights (model_quantized.onnx / dynamic torch quantization)
+LOCAL_EMBEDDING_THREADS = 2                 # inference thread-pool workers
+LOCAL_EMBEDDING_MAX_LENGTH = 512
+LOCAL_EMBEDDING_BATCH_WINDOW_MS = 3
+LOCAL_EMBEDDING_BATCH_MAX_SIZE = 16
+
+# Query-embedding cache (in-memory LRU + optional SQLite tier that survives restarts)
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_MAX_ENTRIES = 10000
+EMBEDDING_CACHE_TTL = 24 * 3600                          # seconds, in-memory tier
+EMBEDDING_CACHE_DTYPE = "float16"                       # float16 or float32
+EMBEDDING_CACHE_DISK_PATH = "data/embedding_cache.sqlite3"  # None disables the disk tier
+EMBEDDING_CACHE_DISK_TTL = 30 * 24 * 3600               # seconds, disk tier
+
+# Prometheus metrics on GET /metrics (stage latency histograms, fallback counters)
+METRICS_ENABLED = True
+# Histogram buckets in seconds, from sub-ms Qdrant legs up to slow LLM attempts
+METRICS_LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+# Request deadlines: every stage (embedding, search, texts, LLM) gets min(its own timeout, the
+# time left before the request's deadline), so one dead upstream cannot hold a request (and its
+# worker) longer than this. Seconds per path, "default" for the rest. A stage cut short by the
+# deadline does not count against its circuit breaker, so "default" leaves room for the stages of
+# POST /search back to back: embedding (EMBEDDING_HTTP_TIMEOUT 60), corpus search with its texts
+# (CORPORA timeout 10) and one LLM attempt (LLM_ATTEMPT_TIMEOUT 45).
+REQUEST_DEADLINES = {"default": 120.0, "/search/batch": 240.0}
+DEADLINE_MIN_STAGE_SECONDS = 0.05   # a stage with less time left than this is not started
+
+# Circuit breakers around the upstreams: after `failures` consecutive failures (errors, timeouts,
+# 5xx) calls fail fast into the existing fallbacks for `reset_seconds`, then one probe call is let
+# through; its success closes the circuit again
+CIRCUIT_BREAKERS_ENABLED = True
+CIRCUIT_BREAKERS = {
+    "colab": {"failures": 5, "reset_seconds": 30.0},
+    "qdrant": {"failures": 5, "reset_seconds": 10.0},
+    "postgres": {"failures": 5, "reset_seconds": 15.0},
+    "llm": {"failures": 3, "reset_seconds": 30.0},
+}
 
 # Logging
 LOG_LEVEL = "INFO"
-LOG_FILE = "logs/quran_search.log"
\ No newline at end of file
+LOG_FILE = "logs/quran_search.log"
+LOG_FORMAT = "json"                        # "json" (one object per line, with request_id) or "text"
+LOG_QUEUE = True                           # write records from a background thread, not the event loop
+LOG_ROTATE_MAX_BYTES = 50 * 1024 * 1024    # size-based rotation of LOG_FILE
+LOG_ROTATE_WHEN = None                     # time-based rotation instead, e.g. "midnight"
+LOG_ROTATE_BACKUPS = 7
+# Per-request DEBUG detail (per-hit lines, LLM calls and samples) is logged for this fraction of
+# requests; LOG_LEVEL = "DEBUG" logs it for all of them
+LOG_DETAIL_SAMPLE_RATE = 0.01
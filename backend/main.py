@@ -1,6 +1,17 @@
 from fastapi import FastAPI
 from api.routes import router
-from services.logger import logger
+from api.middleware import RequestContextMiddleware
+from services.qdrant_service import qdrant_service
+from services.search_service import search_service
+from services.corpus_search import initialize_corpora, close_corpora
+from services.postgres_service import init_pool, close_pool
+from services.verse_store import load_verse_store
+from services.embedding_cache import embedding_cache
+from services.explanation_cache import explanation_cache
+from services.embedding_service import init_embedding_backend, close_embedding_backend
+from services.prompt_builder import init_prompt_tokenizer
+from services.logger import configure_logging, logger, stop_logging
+from config.settings import CORPORA, VERSE_TEXT_SOURCE
 import uvicorn
 
 app = FastAPI(
@@ -12,15 +23,45 @@ app = FastAPI(
 )
 
 app.include_router(router)
+app.add_middleware(RequestContextMiddleware)
 
 @app.on_event("startup")
 async def startup():
+    configure_logging()
     logger.info("🚀 Quran Search API Starting...")
     logger.info("✅ Hybrid Search Enabled")
     logger.info("✅ LLM Explanations Enabled")
     logger.info("✅ PostgreSQL Integration Ready")
+    await init_embedding_backend()
+    await init_prompt_tokenizer()
+    await search_service.initialize()
+    await initialize_corpora()
+    if VERSE_TEXT_SOURCE == "payload":
+        # Verse texts come with the Qdrant hits; hadith texts still come from PostgreSQL
+        logger.info("✅ Verse texts served from Qdrant payloads, PostgreSQL not needed for Quran search")
+        if any(config["kind"] == "hadith" for config in CORPORA.values()):
+            await init_pool()
+    else:
+        await init_pool()
+        await load_verse_store()
+
+@app.on_event("shutdown")
+async def shutdown():
+    logger.info("🛑 Quran Search API Shutting down...")
+    await close_embedding_backend()
+    await search_service.close()
+    if search_service is not qdrant_service:
+        await qdrant_service.close()
+    await close_corpora()
+    await close_pool()
+    if embedding_cache is not None:
+        embedding_cache.close()
+    if explanation_cache is not None:
+        explanation_cache.close()
+    stop_logging()
 
 if __name__ == "__main__":
+    configure_logging()
     logger.info("Starting server on http://0.0.0.0:8000")
     uvicorn.run(
         app,
@@ -0,0 +1,282 @@
+from config.settings import CORPORA, CORPUS_SCORE_CALIBRATION, RRF_K, SEARCH_BATCH_TIMEOUT, VERSE_TEXT_SOURCE
+from services.qdrant_service import HybridQdrantService, HADITH_PAYLOAD_FIELDS
+from services.search_service import search_service
+from services.verse_store import get_verse_texts
+from services.postgres_service import get_hadith_texts_from_db
+from services.metrics import CORPUS_STAGE_SECONDS, observe, count_skipped
+from services.resilience import CircuitOpenError, DeadlineExceeded, within_deadline
+from services.logger import logger
+from typing import List, Dict, Any, Optional
+import asyncio
+import time
+
+# Qdrant services of the hadith corpora (the Quran goes through search_service)
+corpus_services = {
+    name: HybridQdrantService(collection=config["collection"], layout="single", payload_fields=HADITH_PAYLOAD_FIELDS)
+    for name, config in CORPORA.items() if config["kind"] == "hadith"
+}
+
+async def initialize_corpora():
+    """Verify the hadith collections (called at app startup, after search_service.initialize)"""
+    for service in corpus_services.values():
+        await service.initialize()
+
+async def close_corpora():
+    for service in corpus_services.values():
+        await service.close()
+
+def result_ref(result: Dict[str, Any]):
+    """Id passed to the LLM: quran_id for verses, "<corpus>:<hadith_id>" for hadith"""
+    if result["corpus"] == "quran" or result.get("hadith_id") is None:
+        return result.get("quran_id")
+    return f"{result['corpus']}:{result['hadith_id']}"
+
+def _verse_details(hits) -> List[Dict[str, Any]]:
+    verse_details = []
+    for i, hit in enumerate(hits):
+        try:
+            payload = hit.payload or {}
+            verse_details.append({
+                "quran_id": payload.get("quran_id"),
+                "surah_id": payload.get("surah_id"),
+                "ayah_id": payload.get("ayah_id"),
+                "juz_id": payload.get("juz_id"),
+                "surah_type": payload.get("surah_type"),
+                "hit_id": hit.id,
+                "score": float(hit.score) if hasattr(hit, 'score') else 0.0
+            })
+            logger.debug(f"  Verse {i+1}: ID={hit.id}, Quran_ID={payload.get('quran_id')}")
+        except Exception as e:
+            logger.error(f"Error processing hit {i}: {e}")
+            continue
+    return verse_details
+
+def _verse_results(corpus: str, verse_details, texts_by_id) -> List[Dict[str, Any]]:
+    formatted_results = []
+    for i, detail in enumerate(verse_details):
+        try:
+            matched_text = texts_by_id.get(detail["quran_id"], {})
+
+            formatted_results.append({
+                "id": detail["hit_id"],
+                "score": detail["score"],
+                "corpus": corpus,
+                "quran_id": detail["quran_id"],
+                "surah_id": detail["surah_id"],
+                "ayah_id": detail["ayah_id"],
+                "juz_id": detail["juz_id"],
+                "surah_type": detail["surah_type"],
+                "arabic_text": matched_text.get("text_ar", f"Verse {detail['quran_id']}"),
+                "english_text": matched_text.get("text_en", f"Verse {detail['quran_id']}"),
+                "urdu_text": matched_text.get("text_ur", f"آیت {detail['quran_id']}"),
+                "surah_name_ar": matched_text.get("surah_name_ar", ""),
+                "surah_name_ur": matched_text.get("surah_name_ur", ""),
+                "surah_name_en": matched_text.get("surah_name_en", ""),
+                "transliteration": matched_text.get("transliteration", "")
+            })
+
+            logger.debug(f"  Formatted result {i+1}: Surah {detail['surah_id']}:{detail['ayah_id']}")
+
+        except Exception as e:
+            logger.error(f"Error formatting result {i}: {e}")
+            continue
+    return formatted_results
+
+def _hadith_results(corpus: str, hits, texts_by_id) -> List[Dict[str, Any]]:
+    formatted_results = []
+    for hit in hits:
+        payload = hit.payload or {}
+        hadith_id = payload.get("hadith_id", hit.id)
+        text = texts_by_id.get(hadith_id, {})
+        formatted_results.append({
+            "id": hit.id,
+            "score": float(hit.score) if hasattr(hit, 'score') else 0.0,
+            "corpus": corpus,
+            "hadith_id": hadith_id,
+            "book_id": text.get("book_id", payload.get("book_id")),
+            "chapter_id": text.get("chapter_id", payload.get("chapter_id")),
+            "book": text.get("book", payload.get("book")),
+            "chapter_name_ar": text.get("chapter_name_ar"),
+            "chapter_name_ur": text.get("chapter_name_ur"),
+            "chapter_name_en": text.get("chapter_name_en"),
+            "narrator": text.get("narrator"),
+            "status": text.get("status", payload.get("status")),
+            "arabic_text": text.get("text_ar") or f"Hadith {hadith_id}",
+            "english_text": text.get("text_en") or f"Hadith {hadith_id}",
+            "urdu_text": text.get("text_ur") or f"حدیث {hadith_id}"
+        })
+    return formatted_results
+
+def _service(corpus: str, options: Dict[str, Any]):
+    """Search service of corpus, and the options it accepts (metadata filters are Quran-only)"""
+    if CORPORA[corpus]["kind"] == "quran":
+        return search_service, options
+    if options.get("filters"):
+        logger.debug(f"  [{corpus}] Quran filters do not apply, searching unfiltered")
+    return corpus_services[corpus], {key: value for key, value in options.items() if key != "filters"}
+
+async def _verse_texts(hits, verse_details) -> Dict[int, Dict[str, Any]]:
+    """
+    quran_id -> verse text row. With VERSE_TEXT_SOURCE = "payload" the texts stored in the
+    Qdrant points are used as they are; verses without them (or every verse, with
+    "postgres") come from the verse store / PostgreSQL in one fetch.
+    """
+    texts_by_id = {}
+    if VERSE_TEXT_SOURCE == "payload":
+        for hit in hits:
+            payload = hit.payload or {}
+            if payload.get("text_ar") is not None:
+                texts_by_id[payload.get("quran_id")] = payload
+
+    missing = list({
+        detail["quran_id"]: detail for detail in verse_details
+        if detail["quran_id"] and detail["quran_id"] not in texts_by_id
+    }.values())
+    if missing:
+        if VERSE_TEXT_SOURCE == "payload":
+            logger.warning(f"{len(missing)} verses have no text in the Qdrant payload, fetching from PostgreSQL")
+        try:
+            verse_texts = await get_verse_texts(missing)
+            logger.debug(f"✅ Retrieved {len(verse_texts)} verse texts")
+            texts_by_id.update((text["quran_id"], text) for text in verse_texts)
+        except Exception as pg_error:
+            logger.error(f"❌ PostgreSQL error: {pg_error}")
+    return texts_by_id
+
+async def search_corpus(corpus: str, embeddings, top_k: int, timings: Optional[Dict[str, float]] = None, **options) -> List[Dict[str, Any]]:
+    """
+    Hybrid search one corpus and attach its texts; results carry the corpus tag.
+    timings, when given, receives the search_ms and texts_ms stage latencies.
+    """
+    config = CORPORA[corpus]
+    service, options = _service(corpus, options)
+    start = time.perf_counter()
+    hits = await service.search(embeddings, top_k, **options)
+    searched = time.perf_counter()
+    logger.debug(f"✅ [{corpus}] Search returned {len(hits) if hits else 0} hits")
+    if not hits:
+        results = []
+    elif config["kind"] == "quran":
+        verse_details = _verse_details(hits)
+        results = _verse_results(corpus, verse_details, await _verse_texts(hits, verse_details))
+    else:
+        hadith_ids = [(hit.payload or {}).get("hadith_id", hit.id) for hit in hits]
+        hadith_texts = await get_hadith_texts_from_db(config["table"], hadith_ids)
+        results = _hadith_results(corpus, hits, {text["hadith_id"]: text for text in hadith_texts})
+
+    texts_done = time.perf_counter()
+    observe(CORPUS_STAGE_SECONDS, searched - start, corpus=corpus, stage="search")
+    observe(CORPUS_STAGE_SECONDS, texts_done - searched, corpus=corpus, stage="texts")
+    if timings is not None:
+        timings["search_ms"] = (searched - start) * 1000
+        timings["texts_ms"] = (texts_done - searched) * 1000
+    return results
+
+async def search_corpus_batch(corpus: str, embeddings_list, top_k: int, **options) -> List[List[Dict[str, Any]]]:
+    """search_corpus for several queries: one batched search and one text fetch for the union of ids"""
+    config = CORPORA[corpus]
+    service, options = _service(corpus, options)
+    hits_list = await service.search_batch(embeddings_list, top_k, **options)
+    logger.debug(f"✅ [{corpus}] Batch search returned {sum(len(hits) for hits in hits_list)} hits for {len(hits_list)} queries")
+
+    if config["kind"] == "quran":
+        details_list = [_verse_details(hits) for hits in hits_list]
+        texts_by_id = await _verse_texts(
+            [hit for hits in hits_list for hit in hits],
+            [detail for details in details_list for detail in details]
+        )
+        return [_verse_results(corpus, details, texts_by_id) for details in details_list]
+
+    hadith_ids = dict.fromkeys((hit.payload or {}).get("hadith_id", hit.id) for hits in hits_list for hit in hits)
+    hadith_texts = await get_hadith_texts_from_db(config["table"], list(hadith_ids))
+    texts_by_id = {text["hadith_id"]: text for text in hadith_texts}
+    return [_hadith_results(corpus, hits, texts_by_id) for hits in hits_list]
+
+def calibrate(results: List[Dict[str, Any]], weight: float, method: str = CORPUS_SCORE_CALIBRATION):
+    """
+    Put one corpus's scores on a shared scale before merging: fusion scores of two
+    collections are not comparable (RRF depends on candidate counts, dense fallback is cosine)
+    """
+    if method == "max":
+        best = max((result["score"] for result in results), default=0.0) or 1.0
+        for result in results:
+            result["score"] = weight * result["score"] / best
+    elif method == "rank":
+        for rank, result in enumerate(results):
+            result["score"] = weight / (RRF_K + rank + 1)
+    else:
+        for result in results:
+            result["score"] = weight * result["score"]
+    return results
+
+async def search_corpora(embeddings, corpora: List[str], top_k: int, **options):
+    """
+    Search every corpus concurrently, each under its own timeout (capped by the request
+    deadline), and merge the results on calibrated scores (a single corpus keeps its raw scores).
+    Returns (results, timed_out, failed); corpora that timed out or failed are left out.
+    """
+    async def run(corpus):
+        start = time.perf_counter()
+        timings = {}
+        results = await within_deadline(
+            search_corpus(corpus, embeddings, top_k, timings=timings, **options), CORPORA[corpus]["timeout"], "search"
+        )
+        logger.info(
+            f"⏱️ [{corpus}] {len(results)} results in {(time.perf_counter() - start) * 1000:.1f}ms "
+            f"(search {timings['search_ms']:.1f}ms, texts {timings['texts_ms']:.1f}ms, {VERSE_TEXT_SOURCE})"
+        )
+        return results
+
+    outcomes = await asyncio.gather(*(run(corpus) for corpus in corpora), return_exceptions=True)
+    answered, timed_out, failed = _sort_outcomes(corpora, outcomes, {corpus: CORPORA[corpus]["timeout"] for corpus in corpora})
+    return _merge([results for _, results in answered], answered, top_k), timed_out, failed
+
+async def search_corpora_batch(embeddings_list, corpora: List[str], top_k: int, **options):
+    """
+    search_corpora for several queries: each corpus answers the whole batch with one
+    batched call, under SEARCH_BATCH_TIMEOUT. Returns (results per query, timed_out, failed).
+    """
+    async def run(corpus):
+        start = time.perf_counter()
+        results = await within_deadline(search_corpus_batch(corpus, embeddings_list, top_k, **options), SEARCH_BATCH_TIMEOUT, "search")
+        logger.info(f"  [{corpus}] {len(results)} queries answered in {(time.perf_counter() - start) * 1000:.0f}ms")
+        return results
+
+    outcomes = await asyncio.gather(*(run(corpus) for corpus in corpora), return_exceptions=True)
+    answered, timed_out, failed = _sort_outcomes(corpora, outcomes, {corpus: SEARCH_BATCH_TIMEOUT for corpus in corpora})
+    merged = [
+        _merge([results_per_query[i] for _, results_per_query in answered], answered, top_k)
+        for i in range(len(embeddings_list))
+    ]
+    return merged, timed_out, failed
+
+def _sort_outcomes(corpora, outcomes, timeouts):
+    """Split gathered per-corpus outcomes into (corpus, result) pairs, timed-out and failed corpora"""
+    answered, timed_out, failed = [], [], []
+    for corpus, outcome in zip(corpora, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            reason = "the request deadline" if isinstance(outcome, DeadlineExceeded) else f"{timeouts[corpus]}s"
+            logger.warning(f"⏱️ [{corpus}] Timed out after {reason}, skipped")
+            timed_out.append(corpus)
+            count_skipped(corpus, "timeout")
+        elif isinstance(outcome, CircuitOpenError):
+            logger.warning(f"⚡ [{corpus}] {outcome}, skipped")
+            failed.append(corpus)
+            count_skipped(corpus, "circuit_open")
+        elif isinstance(outcome, BaseException):
+            logger.error(f"❌ [{corpus}] Search failed: {outcome}")
+            failed.append(corpus)
+            count_skipped(corpus, "error")
+        else:
+            answered.append((corpus, outcome))
+    return answered, timed_out, failed
+
+def _merge(result_lists, answered, top_k):
+    """Merge one query's per-corpus results (calibrated when there are several corpora)"""
+    merged = []
+    for (corpus, _), results in zip(answered, result_lists):
+        if len(answered) > 1:
+            results = calibrate(results, CORPORA[corpus].get("weight", 1.0))
+        merged.extend(results)
+    merged.sort(key=lambda result: result["score"], reverse=True)
+    return merged[:top_k]
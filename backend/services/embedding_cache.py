@@ -0,0 +1,216 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from config.settings import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_TTL,
+    EMBEDDING_CACHE_DTYPE,
+    EMBEDDING_CACHE_DISK_PATH,
+    EMBEDDING_CACHE_DISK_TTL
+)
+from services.logger import logger
+from utils.helpers import TTLCache, SingleFlight, normalize_query
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+class CachedEmbedding:
+    """Query embeddings stored compactly: dense as a float16/float32 array, sparse as typed arrays"""
+    __slots__ = ("dense", "sparse_indices", "sparse_values", "processed_text")
+
+    def __init__(self, dense, sparse_indices, sparse_values, processed_text):
+        self.dense = dense
+        self.sparse_indices = sparse_indices
+        self.sparse_values = sparse_values
+        self.processed_text = processed_text
+
+    @classmethod
+    def from_embeddings(cls, embeddings: Dict[str, Any], processed_text: str, dtype: str) -> "CachedEmbedding":
+        sparse = embeddings.get("sparse") or {}
+        return cls(
+            np.asarray(embeddings["dense"], dtype=dtype),
+            np.asarray(sparse.get("indices", []), dtype=np.int32),
+            np.asarray(sparse.get("values", []), dtype=np.float32),
+            processed_text
+        )
+
+    def to_embeddings(self) -> Tuple[Dict[str, Any], str]:
+        """Rebuild the (embeddings, processed_text) tuple returned by the embedding service"""
+        embeddings = {
+            "dense": self.dense.astype(np.float32),
+            "sparse": {
+                "indices": self.sparse_indices.tolist(),
+                "values": self.sparse_values.tolist()
+            }
+        }
+        return embeddings, self.processed_text
+
+class DiskEmbeddingStore:
+    """SQLite-backed tier so cached query embeddings survive restarts"""
+
+    def __init__(self, path: str, ttl: Optional[float]):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS query_embeddings (
+                key            TEXT PRIMARY KEY,
+                created_at     REAL NOT NULL,
+                processed_text TEXT,
+                dense_dtype    TEXT NOT NULL,
+                dense          BLOB NOT NULL,
+                sparse_indices BLOB NOT NULL,
+                sparse_values  BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[CachedEmbedding]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, processed_text, dense_dtype, dense, sparse_indices, sparse_values "
+                "FROM query_embeddings WHERE key = ?",
+                (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        created_at, processed_text, dense_dtype, dense, indices, values = row
+        if self.ttl and created_at + self.ttl < time.time():
+            return None
+        return CachedEmbedding(
+            np.frombuffer(dense, dtype=dense_dtype),
+            np.frombuffer(indices, dtype=np.int32),
+            np.frombuffer(values, dtype=np.float32),
+            processed_text
+        )
+
+    def set(self, key: str, entry: CachedEmbedding):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    time.time(),
+                    entry.processed_text,
+                    entry.dense.dtype.name,
+                    entry.dense.tobytes(),
+                    entry.sparse_indices.tobytes(),
+                    entry.sparse_values.tobytes()
+                )
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class EmbeddingCache:
+    """
+    Two-tier cache of query embeddings keyed on the backend name plus the normalized
+    query text (so vectors from different encoders are never mixed):
+    an in-memory LRU with TTL in front of an optional SQLite tier. Concurrent
+    misses for the same key share a single upstream call.
+    """
+
+    def __init__(self, max_entries: int, ttl: Optional[float], dtype: str, disk_path: Optional[str], disk_ttl: Optional[float], namespace: str = ""):
+        self.dtype = dtype
+        self.namespace = namespace
+        self.memory = TTLCache(max_entries, ttl)
+        self.disk = None
+        if disk_path:
+            try:
+                self.disk = DiskEmbeddingStore(disk_path, disk_ttl)
+            except Exception as e:
+                logger.error(f"Embedding disk cache unavailable: {e}")
+        self.single_flight = SingleFlight()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    async def get_or_compute(self, query: str, compute: Callable[[str], Awaitable[Tuple[Dict[str, Any], str]]]):
+        """Return cached embeddings for query, calling compute(query) once on a miss"""
+        key = f"{self.namespace}:{normalize_query(query)}"
+
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.hits_memory += 1
+            return entry.to_embeddings()
+
+        async def load():
+            if self.disk is not None:
+                cached = await asyncio.to_thread(self.disk.get, key)
+                if cached is not None:
+                    self.hits_disk += 1
+                    self.memory.set(key, cached)
+                    return cached
+
+            self.misses += 1
+            embeddings, processed_text = await compute(query)
+            fresh = CachedEmbedding.from_embeddings(embeddings, processed_text, self.dtype)
+            self.memory.set(key, fresh)
+            if self.disk is not None:
+                try:
+                    await asyncio.to_thread(self.disk.set, key, fresh)
+                except Exception as e:
+                    logger.warning(f"Embedding disk cache write failed: {e}")
+            return fresh
+
+        entry = await self.single_flight.do(key, load)
+        return entry.to_embeddings()
+
+    async def lookup(self, query: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """Cached embeddings for query (memory, then disk), or None; used by batch callers"""
+        key = f"{self.namespace}:{normalize_query(query)}"
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.hits_memory += 1
+            return entry.to_embeddings()
+        if self.disk is not None:
+            entry = await asyncio.to_thread(self.disk.get, key)
+            if entry is not None:
+                self.hits_disk += 1
+                self.memory.set(key, entry)
+                return entry.to_embeddings()
+        self.misses += 1
+        return None
+
+    async def store(self, query: str, embeddings: Dict[str, Any], processed_text: str):
+        key = f"{self.namespace}:{normalize_query(query)}"
+        entry = CachedEmbedding.from_embeddings(embeddings, processed_text, self.dtype)
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.set, key, entry)
+            except Exception as e:
+                logger.warning(f"Embedding disk cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "entries": len(self.memory),
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "coalesced": self.single_flight.coalesced,
+            "hit_rate": round((self.hits_memory + self.hits_disk) / lookups, 4) if lookups else 0.0
+        }
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+embedding_cache = EmbeddingCache(
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_TTL,
+    EMBEDDING_CACHE_DTYPE,
+    EMBEDDING_CACHE_DISK_PATH,
+    EMBEDDING_CACHE_DISK_TTL,
+    namespace=EMBEDDING_BACKEND
+) if EMBEDDING_CACHE_ENABLED else None
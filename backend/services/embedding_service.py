@@ -1,106 +1,354 @@
+import asyncio
 import httpx
-from config.settings import COLAB_API_URL
+from config.settings import (
+    EMBEDDING_BACKEND,
+    COLAB_API_URL,
+    EMBEDDING_HTTP_TIMEOUT,
+    EMBEDDING_HTTP2,
+    EMBEDDING_MAX_CONNECTIONS,
+    EMBEDDING_KEEPALIVE_EXPIRY,
+    EMBEDDING_BATCH_ENABLED,
+    EMBEDDING_BATCH_WINDOW_MS,
+    EMBEDDING_BATCH_MAX_SIZE,
+    LOCAL_EMBEDDING_BATCH_WINDOW_MS,
+    LOCAL_EMBEDDING_BATCH_MAX_SIZE
+)
+from services.embedding_cache import embedding_cache
+from services.local_embedding import local_encoder, init_local_encoder
 from services.logger import logger
+from services.metrics import count_fallback
+from services.resilience import CircuitOpenError, circuit_breaker, within_deadline
+from typing import Any, Dict, List, Optional, Tuple
 import traceback
 
-async def get_embeddings_from_colab(query: str):
+# App-lifetime HTTP client for the Colab backend (keep-alive, HTTP/2 when available)
+_http_client: Optional[httpx.AsyncClient] = None
+
+async def init_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """Create the shared embedding HTTP client (called at app startup)"""
+    global _http_client
+    if _http_client is not None:
+        return _http_client
+
+    http2 = EMBEDDING_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("h2 package not installed, embedding client falls back to HTTP/1.1")
+            http2 = False
+
+    _http_client = httpx.AsyncClient(
+        base_url=COLAB_API_URL,
+        timeout=EMBEDDING_HTTP_TIMEOUT,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=EMBEDDING_MAX_CONNECTIONS,
+            max_keepalive_connections=EMBEDDING_MAX_CONNECTIONS,
+            keepalive_expiry=EMBEDDING_KEEPALIVE_EXPIRY
+        ),
+        headers={"Content-Type": "application/json"},
+        transport=transport
+    )
+    logger.info(f"✅ Embedding HTTP client ready ({COLAB_API_URL}, http2={http2})")
+    return _http_client
+
+async def close_http_client():
+    """Close the shared embedding HTTP client (called at app shutdown)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+def _parse_embedding_result(result: Dict[str, Any], query: str) -> Tuple[Dict[str, Any], str]:
+    """Turn one /embed result object into (embeddings, processed_text)"""
+    # Extract embeddings from the correct structure
+    if "embeddings" in result:
+        embeddings_data = result["embeddings"]
+
+        # Get dense vector
+        dense_vector = embeddings_data.get("dense_vector", [])
+        if not dense_vector:
+            dense_vector = embeddings_data.get("dense", [])
+
+        # Get sparse vectors
+        sparse_data = embeddings_data.get("sparse", {})
+        if isinstance(sparse_data, dict):
+            sparse_indices = sparse_data.get("indices", [])
+            sparse_values = sparse_data.get("values", [])
+        else:
+            sparse_indices = []
+            sparse_values = []
+
+        embeddings = {
+            "dense": dense_vector if isinstance(dense_vector, list) else [],
+            "sparse": {
+                "indices": sparse_indices if isinstance(sparse_indices, list) else [],
+                "values": sparse_values if isinstance(sparse_values, list) else []
+            }
+        }
+
+        processed_text = result.get("text", query)
+
+    else:
+        # Fallback: maybe embeddings are at root level
+        logger.warning("No 'embeddings' key found, checking root level")
+        dense_vector = result.get("dense_vector", result.get("dense", []))
+
+        embeddings = {
+            "dense": dense_vector if isinstance(dense_vector, list) else [],
+            "sparse": {
+                "indices": result.get("sparse_indices", result.get("indices", [])),
+                "values": result.get("sparse_values", result.get("values", []))
+            }
+        }
+        processed_text = result.get("text", result.get("processed_text", query))
+
+    # Validate embeddings
+    if len(embeddings["dense"]) != 1024:
+        logger.warning(f"Dense vector length is {len(embeddings['dense'])} (expected 1024)")
+        # If not 1024, pad or truncate
+        if len(embeddings["dense"]) < 1024:
+            # Pad with zeros
+            embeddings["dense"] = embeddings["dense"] + [0.0] * (1024 - len(embeddings["dense"]))
+            logger.info(f"Padded dense vector to 1024 dimensions")
+        elif len(embeddings["dense"]) > 1024:
+            # Truncate
+            embeddings["dense"] = embeddings["dense"][:1024]
+            logger.info(f"Truncated dense vector to 1024 dimensions")
+
+    return embeddings, processed_text
+
+class EmbeddingAPIError(Exception):
+    """Non-200 response from the Colab /embed endpoint"""
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+colab_breaker = circuit_breaker("colab")
+
+def _colab_failure(error: BaseException) -> bool:
+    """Whether an error counts against the Colab circuit (answers to a bad request come from a live server)"""
+    return not isinstance(error, EmbeddingAPIError) or error.status_code not in (400, 405, 413, 422)
+
+async def _post_embed(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Get both dense and sparse embeddings from Colab backend
+    POST to /embed on the shared client; raises on non-200 responses, and fails fast
+    (CircuitOpenError) while the Colab circuit is open
     """
-    try:
-        logger.info(f"📡 Calling Colab API: {COLAB_API_URL}/embed")
-        logger.info(f"Query: '{query}'")
-        
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{COLAB_API_URL}/embed",
-                json={"text": query},
-                headers={"Content-Type": "application/json"}
-            )
-            
-            logger.info(f"Colab response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"✅ Colab API successful")
-                
-                # Extract embeddings from the correct structure
-                if "embeddings" in result:
-                    embeddings_data = result["embeddings"]
-                    logger.info(f"Embeddings keys: {list(embeddings_data.keys())}")
-                    
-                    # Get dense vector
-                    dense_vector = embeddings_data.get("dense_vector", [])
-                    if not dense_vector:
-                        dense_vector = embeddings_data.get("dense", [])
-                    
-                    # Get sparse vectors
-                    sparse_data = embeddings_data.get("sparse", {})
-                    if isinstance(sparse_data, dict):
-                        sparse_indices = sparse_data.get("indices", [])
-                        sparse_values = sparse_data.get("values", [])
-                    else:
-                        sparse_indices = []
-                        sparse_values = []
-                    
-                    embeddings = {
-                        "dense": dense_vector if isinstance(dense_vector, list) else [],
-                        "sparse": {
-                            "indices": sparse_indices if isinstance(sparse_indices, list) else [],
-                            "values": sparse_values if isinstance(sparse_values, list) else []
-                        }
-                    }
-                    
-                    processed_text = result.get("text", query)
-                    
-                else:
-                    # Fallback: maybe embeddings are at root level
-                    logger.warning("No 'embeddings' key found, checking root level")
-                    dense_vector = result.get("dense_vector", result.get("dense", []))
-                    
-                    embeddings = {
-                        "dense": dense_vector if isinstance(dense_vector, list) else [],
-                        "sparse": {
-                            "indices": result.get("sparse_indices", result.get("indices", [])),
-                            "values": result.get("sparse_values", result.get("values", []))
-                        }
-                    }
-                    processed_text = result.get("text", result.get("processed_text", query))
-                
-                # Validate embeddings
-                if len(embeddings["dense"]) != 1024:
-                    logger.warning(f"Dense vector length is {len(embeddings['dense'])} (expected 1024)")
-                    # If not 1024, pad or truncate
-                    if len(embeddings["dense"]) < 1024:
-                        # Pad with zeros
-                        embeddings["dense"] = embeddings["dense"] + [0.0] * (1024 - len(embeddings["dense"]))
-                        logger.info(f"Padded dense vector to 1024 dimensions")
-                    elif len(embeddings["dense"]) > 1024:
-                        # Truncate
-                        embeddings["dense"] = embeddings["dense"][:1024]
-                        logger.info(f"Truncated dense vector to 1024 dimensions")
-                
-                logger.info(f"✅ Dense vector: {len(embeddings['dense'])} dim")
-                logger.info(f"✅ Sparse indices: {len(embeddings['sparse']['indices'])}")
-                logger.info(f"✅ Sparse values: {len(embeddings['sparse']['values'])}")
-                logger.info(f"✅ Processed text: '{processed_text}'")
-                
-                return embeddings, processed_text
-                
+    client = _http_client or await init_http_client()
+    with colab_breaker.guard(is_failure=_colab_failure):
+        # Bounded inside the guard, so a hung backend counts against the circuit
+        response = await within_deadline(client.post("/embed", json=payload), EMBEDDING_HTTP_TIMEOUT, "embed")
+
+        if response.status_code != 200:
+            error_msg = f"Colab API error {response.status_code}: {response.text[:200]}"
+            logger.error(error_msg)
+            raise EmbeddingAPIError(response.status_code, error_msg)
+
+    return response.json()
+
+async def _embed_single(query: str) -> Tuple[Dict[str, Any], str]:
+    logger.debug(f"📡 Calling Colab API: {COLAB_API_URL}/embed")
+    logger.debug(f"Query: '{query}'")
+
+    result = await _post_embed({"text": query})
+    embeddings, processed_text = _parse_embedding_result(result, query)
+
+    logger.debug(f"✅ Colab API successful")
+    logger.debug(f"✅ Dense vector: {len(embeddings['dense'])} dim")
+    logger.debug(f"✅ Sparse indices: {len(embeddings['sparse']['indices'])}")
+    logger.debug(f"✅ Processed text: '{processed_text}'")
+    return embeddings, processed_text
+
+async def _embed_batch(queries: List[str]) -> List[Tuple[Dict[str, Any], str]]:
+    """One /embed call for several queries; results come back in request order"""
+    logger.debug(f"📡 Calling Colab API: {COLAB_API_URL}/embed (batch of {len(queries)})")
+
+    result = await _post_embed({"texts": queries})
+    items = result.get("results")
+    if not isinstance(items, list) or len(items) != len(queries):
+        raise ValueError(f"Batch /embed returned {len(items) if isinstance(items, list) else 'no'} results for {len(queries)} queries")
+
+    return [_parse_embedding_result(item, query) for item, query in zip(items, queries)]
+
+class EmbeddingBatcher:
+    """
+    Micro-batcher: queries arriving within a short window are encoded together
+    with one embed_batch call (one /embed request for the Colab backend, one
+    forward pass for the local encoder). embed_single, when given, is used for
+    lone queries and as the fallback when the backend rejects batches.
+    """
+
+    def __init__(self, window_ms: float, max_size: int, embed_batch, embed_single=None):
+        self.window = window_ms / 1000.0
+        self.embed_batch = embed_batch
+        self.embed_single = embed_single
+        self.max_size = max_size
+        self.batch_supported = True
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.batches_sent = 0
+        self.queries_batched = 0
+
+    async def embed(self, query: str) -> Tuple[Dict[str, Any], str]:
+        if not self.batch_supported:
+            return await self.embed_single(query)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, future))
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.ensure_future(self._send(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, pending: List[Tuple[str, asyncio.Future]]):
+        queries = [query for query, _ in pending]
+        try:
+            if len(queries) == 1 and self.embed_single is not None:
+                results = [await self.embed_single(queries[0])]
+            else:
+                self.batches_sent += 1
+                self.queries_batched += len(queries)
+                results = await self.embed_batch(queries)
+        except EmbeddingAPIError as e:
+            if len(queries) > 1 and self.embed_single is not None and e.status_code in (400, 404, 405, 422):
+                # Server does not understand {"texts": [...]}: stop batching and retry one by one
+                logger.warning(f"Colab /embed does not support batches ({e.status_code}), disabling micro-batching")
+                self.batch_supported = False
+                results = await asyncio.gather(*(self.embed_single(q) for q in queries), return_exceptions=True)
+            else:
+                results = [e] * len(queries)
+        except Exception as e:
+            results = [e] * len(queries)
+
+        for (_, future), result in zip(pending, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
             else:
-                error_msg = f"Colab API error {response.status_code}: {response.text[:200]}"
-                logger.error(error_msg)
-                raise Exception(error_msg)
-                
-                
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batch_supported": self.batch_supported,
+            "batches_sent": self.batches_sent,
+            "queries_batched": self.queries_batched
+        }
+
+if EMBEDDING_BACKEND == "local":
+    embedding_batcher = EmbeddingBatcher(
+        LOCAL_EMBEDDING_BATCH_WINDOW_MS, LOCAL_EMBEDDING_BATCH_MAX_SIZE, local_encoder.embed_batch
+    )
+elif EMBEDDING_BATCH_ENABLED:
+    embedding_batcher = EmbeddingBatcher(
+        EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_BATCH_MAX_SIZE, _embed_batch, _embed_single
+    )
+else:
+    embedding_batcher = None
+
+async def init_embedding_backend():
+    """Prepare the configured embedding backend (called at app startup)"""
+    if EMBEDDING_BACKEND == "local":
+        logger.info("Loading local BGE-M3 encoder...")
+        await init_local_encoder()
+    else:
+        await init_http_client()
+
+async def close_embedding_backend():
+    """Release the embedding backend (called at app shutdown)"""
+    if EMBEDDING_BACKEND == "local":
+        local_encoder.close()
+    else:
+        await close_http_client()
+
+async def _compute_embeddings(query: str):
+    """
+    Encode query with the configured backend; raises on any failure so errors are never cached
+    """
+    if embedding_batcher is not None:
+        return await embedding_batcher.embed(query)
+    return await _embed_single(query)
+
+async def get_embeddings(query: str):
+    """
+    Get both dense and sparse embeddings from the configured backend (Colab or local)
+    (served from the query-embedding cache when possible)
+    """
+    try:
+        if embedding_cache is not None:
+            return await embedding_cache.get_or_compute(query, _compute_embeddings)
+        return await _compute_embeddings(query)
+
     except Exception as e:
-        logger.error(f"🚨 Embedding service error: {str(e)}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        
+        if isinstance(e, (CircuitOpenError, asyncio.TimeoutError)):
+            logger.warning(f"🚨 Embedding service unavailable: {e!r}")
+        else:
+            logger.error(f"🚨 Embedding service error: {str(e)}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
+
         # Fallback: Return dummy embeddings
         dummy_embeddings = {
             "dense": [0.01] * 1024,
             "sparse": {"indices": [1, 2, 3, 4, 5], "values": [0.1, 0.2, 0.15, 0.1, 0.05]}
         }
         logger.info("Using fallback dummy embeddings")
-        return dummy_embeddings, query
\ No newline at end of file
+        count_fallback("dummy_embedding")
+        return dummy_embeddings, query
+
+async def _embed_many(queries: List[str]) -> List[Tuple[Dict[str, Any], str]]:
+    """
+    Encode queries with as few backend calls as possible: one /embed request for the
+    Colab backend, forward passes of LOCAL_EMBEDDING_BATCH_MAX_SIZE for the local encoder
+    """
+    if EMBEDDING_BACKEND == "local":
+        results = []
+        for start in range(0, len(queries), LOCAL_EMBEDDING_BATCH_MAX_SIZE):
+            results.extend(await local_encoder.embed_batch(queries[start:start + LOCAL_EMBEDDING_BATCH_MAX_SIZE]))
+        return results
+    if embedding_batcher is not None and not embedding_batcher.batch_supported:
+        return await asyncio.gather(*(_embed_single(query) for query in queries))
+    return await _embed_batch(queries)
+
+async def get_embeddings_batch(queries: List[str]) -> List[Tuple[Dict[str, Any], str]]:
+    """
+    get_embeddings for several queries, in order: cache hits are served from the cache
+    and all misses are encoded together. Falls back to per-query get_embeddings on error.
+    """
+    unique = list(dict.fromkeys(queries))
+    found: Dict[str, Tuple[Dict[str, Any], str]] = {}
+    if embedding_cache is not None:
+        cached = await asyncio.gather(*(embedding_cache.lookup(query) for query in unique))
+        found = {query: hit for query, hit in zip(unique, cached) if hit is not None}
+
+    misses = [query for query in unique if query not in found]
+    if misses:
+        try:
+            logger.info(f"📡 Embedding {len(misses)} queries in one batch ({len(found)} cached)")
+            fresh = await _embed_many(misses)
+            for query, (embeddings, processed_text) in zip(misses, fresh):
+                found[query] = (embeddings, processed_text)
+                if embedding_cache is not None:
+                    await embedding_cache.store(query, embeddings, processed_text)
+        except Exception as e:
+            logger.error(f"🚨 Batch embedding failed ({e}), embedding queries one by one")
+            singles = await asyncio.gather(*(get_embeddings(query) for query in misses))
+            found.update(zip(misses, singles))
+
+    return [found[query] for query in queries]
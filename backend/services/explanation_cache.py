@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from config.settings import (
+    LLM_MODEL,
+    EXPLANATION_CACHE_ENABLED,
+    EXPLANATION_CACHE_MAX_ENTRIES,
+    EXPLANATION_CACHE_TTL,
+    EXPLANATION_CACHE_DB_PATH,
+    EXPLANATION_CACHE_DB_MAX_ENTRIES
+)
+from api.models import LLMExplanation
+from services.logger import logger
+from services.prompt_builder import PROMPT_VERSION
+from utils.helpers import TTLCache, SingleFlight, normalize_query
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+def explanation_key(query: str, verse_ids: List[int]) -> str:
+    """Cache key: prompt version + model + normalized query + the ordered verse ids given to the LLM"""
+    raw = f"{PROMPT_VERSION}\x1f{LLM_MODEL}\x1f{normalize_query(query)}\x1f{','.join(str(v) for v in verse_ids)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class SQLiteExplanationStore:
+    """Persistent tier: one row per cached explanation, pruned to max_entries oldest-first"""
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, ttl: Optional[float], max_entries: int):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_explanations (
+                key         TEXT PRIMARY KEY,
+                created_at  REAL NOT NULL,
+                query       TEXT,
+                verses_used TEXT NOT NULL,
+                urdu        TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_explanations_created ON llm_explanations (created_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[LLMExplanation]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, verses_used, urdu FROM llm_explanations WHERE key = ?",
+                (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        created_at, verses_used, urdu = row
+        if self.ttl and created_at + self.ttl < time.time():
+            return None
+        return LLMExplanation(urdu=urdu, verses_used=json.loads(verses_used))
+
+    def set(self, key: str, query: str, explanation: LLMExplanation):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_explanations VALUES (?, ?, ?, ?, ?)",
+                (key, time.time(), query, json.dumps(explanation.verses_used), explanation.urdu)
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune()
+            self._conn.commit()
+
+    def _prune(self):
+        if self.ttl:
+            self._conn.execute("DELETE FROM llm_explanations WHERE created_at < ?", (time.time() - self.ttl,))
+        self._conn.execute(
+            """
+            DELETE FROM llm_explanations WHERE key IN (
+                SELECT key FROM llm_explanations ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,)
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ExplanationCache:
+    """
+    Cache of generated LLMExplanation objects: an in-memory LRU with TTL in front of
+    an optional SQLite tier. Concurrent identical questions share one completion.
+    """
+
+    def __init__(self, max_entries: int, ttl: Optional[float], db_path: Optional[str], db_max_entries: int):
+        self.memory = TTLCache(max_entries, ttl)
+        self.store = None
+        if db_path:
+            try:
+                self.store = SQLiteExplanationStore(db_path, ttl, db_max_entries)
+            except Exception as e:
+                logger.error(f"Explanation cache database unavailable: {e}")
+        self.single_flight = SingleFlight()
+        self.hits_memory = 0
+        self.hits_store = 0
+        self.misses = 0
+
+    async def get(self, query: str, verse_ids: List[int]) -> Optional[LLMExplanation]:
+        """Cached explanation for this query + verse set, or None"""
+        key = explanation_key(query, verse_ids)
+        explanation = self.memory.get(key)
+        if explanation is not None:
+            self.hits_memory += 1
+            return explanation
+        if self.store is not None:
+            explanation = await asyncio.to_thread(self.store.get, key)
+            if explanation is not None:
+                self.hits_store += 1
+                self.memory.set(key, explanation)
+                return explanation
+        return None
+
+    async def put(self, query: str, verse_ids: List[int], explanation: LLMExplanation):
+        key = explanation_key(query, verse_ids)
+        self.memory.set(key, explanation)
+        if self.store is not None:
+            try:
+                await asyncio.to_thread(self.store.set, key, query, explanation)
+            except Exception as e:
+                logger.warning(f"Explanation cache write failed: {e}")
+
+    async def get_or_generate(
+        self, query: str, verse_ids: List[int], generate: Callable[[], Awaitable[Tuple[LLMExplanation, str]]]
+    ) -> LLMExplanation:
+        """
+        Return the cached explanation, or run generate() once for all concurrent callers.
+        generate returns (explanation, model that answered); only LLM_MODEL answers are cached.
+        """
+        key = explanation_key(query, verse_ids)
+        explanation = self.memory.get(key)
+        if explanation is not None:
+            self.hits_memory += 1
+            return explanation
+
+        async def load():
+            cached = await self.get(query, verse_ids)
+            if cached is not None:
+                return cached
+            self.misses += 1
+            fresh, model = await generate()
+            if model == LLM_MODEL:
+                await self.put(query, verse_ids, fresh)
+            else:
+                logger.debug(f"Explanation from {model} not cached")
+            return fresh
+
+        return await self.single_flight.do(key, load)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits_memory + self.hits_store + self.misses
+        return {
+            "entries": len(self.memory),
+            "hits_memory": self.hits_memory,
+            "hits_store": self.hits_store,
+            "misses": self.misses,
+            "coalesced": self.single_flight.coalesced,
+            "hit_rate": round((self.hits_memory + self.hits_store) / lookups, 4) if lookups else 0.0
+        }
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+explanation_cache = ExplanationCache(
+    EXPLANATION_CACHE_MAX_ENTRIES,
+    EXPLANATION_CACHE_TTL,
+    EXPLANATION_CACHE_DB_PATH,
+    EXPLANATION_CACHE_DB_MAX_ENTRIES
+) if EXPLANATION_CACHE_ENABLED else None
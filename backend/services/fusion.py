@@ -0,0 +1,53 @@
+from typing import Dict, List, Optional, Sequence
+
+FUSION_STRATEGIES = ("rrf", "weighted", "server")
+
+def _min_max(points) -> Dict[object, float]:
+    """Min-max normalize one result list's scores to [0, 1] (all 1.0 when scores are equal)"""
+    if not points:
+        return {}
+    scores = [float(p.score) for p in points]
+    low, high = min(scores), max(scores)
+    span = high - low
+    return {p.id: (float(p.score) - low) / span if span > 0 else 1.0 for p in points}
+
+def _collect(result_lists: Sequence[List]) -> Dict[object, object]:
+    """First occurrence of every point id across the result lists"""
+    points = {}
+    for results in result_lists:
+        for point in results or []:
+            points.setdefault(point.id, point)
+    return points
+
+def _ranked(points: Dict[object, object], fused: Dict[object, float], top_k: int) -> List:
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    results = []
+    for point_id, score in ranked:
+        point = points[point_id]
+        point.score = score
+        results.append(point)
+    return results
+
+def reciprocal_rank_fusion(result_lists: Sequence[List], weights: Optional[Sequence[float]] = None, top_k: int = 5, k: int = 60) -> List:
+    """
+    Weighted reciprocal rank fusion: score(d) = sum_i w_i / (k + rank_i(d)).
+    Only ranks are used, so legs with incomparable score scales fuse cleanly.
+    """
+    weights = weights or [1.0] * len(result_lists)
+    fused: Dict[object, float] = {}
+    for results, weight in zip(result_lists, weights):
+        for rank, point in enumerate(results or [], start=1):
+            fused[point.id] = fused.get(point.id, 0.0) + weight / (k + rank)
+    return _ranked(_collect(result_lists), fused, top_k)
+
+def weighted_score_fusion(result_lists: Sequence[List], weights: Optional[Sequence[float]] = None, top_k: int = 5) -> List:
+    """
+    Convex combination of per-list min-max normalized scores; a point missing
+    from a list contributes 0 for that list.
+    """
+    weights = weights or [1.0 / len(result_lists)] * len(result_lists)
+    fused: Dict[object, float] = {}
+    for results, weight in zip(result_lists, weights):
+        for point_id, score in _min_max(results).items():
+            fused[point_id] = fused.get(point_id, 0.0) + weight * score
+    return _ranked(_collect(result_lists), fused, top_k)
@@ -1,158 +1,109 @@
-from openai import OpenAI
-from config.settings import HF_TOKEN, LLM_MODEL, LLM_BASE_URL
+from openai import AsyncOpenAI
+from config.settings import (
+    HF_TOKEN,
+    LLM_MODEL,
+    LLM_BASE_URL,
+    LLM_ATTEMPT_TIMEOUT,
+    LLM_RETRY_DELAY,
+    LLM_HEDGE_MODEL,
+    LLM_HEDGE_BASE_URL,
+    LLM_HEDGE_MIN_DELAY,
+    LLM_HEDGE_DEFAULT_DELAY,
+    LLM_HEDGE_MIN_SAMPLES
+)
 from services.logger import logger
-from typing import List
+from typing import AsyncIterator, List, Tuple
 from api.models import LLMExplanation
+from services.explanation_cache import explanation_cache
+from services.metrics import LLM_ATTEMPT_SECONDS, LLM_PROMPT_TOKENS, LLM_HEDGES, observe, count, count_fallback
+from services.prompt_builder import build_messages, prompt_tokenizer
+from services.resilience import (
+    CircuitOpenError,
+    DeadlineExceeded,
+    RollingPercentile,
+    circuit_breaker,
+    stage_timeout,
+    within_deadline
+)
+import asyncio
 import time
 
 # Initialize OpenAI-compatible client for Hugging Face router
-llm_client = OpenAI(
+# (no client-side retries: _generate_explanation retries within the request deadline)
+llm_client = AsyncOpenAI(
     base_url=LLM_BASE_URL,
     api_key=HF_TOKEN,
-    timeout=60
+    timeout=60,
+    max_retries=0
 )
+llm_breaker = circuit_breaker("llm")
 
-# System prompt optimized for Urdu explanations
-SYSTEM_PROMPT = """آپ ایک اسلامی عالم ہیں جو قرآنی آیات کی مفصل وضاحت کرتے ہیں۔ آپ کو قرآنی آیات کا حوالہ دیا جائے گا اور صارف کا سوال۔
-
-آپ کو ہر آیت کی تفصیلی وضاحت اردو میں پیش کرنی ہے۔ وضاحت میں شامل ہونا چاہیے:
-1. آیت کا سیاق و سباق
-2. لفظی ترجمہ اور معنی
-3. تفصیلی تشریح
-4. عملی مشورے
-5. فرد اور معاشرے پر اثرات
-
-ہدایات:
-- صرف اردو زبان استعمال کریں
-- سادہ اور واضح زبان استعمال کریں
-- کم از کم 300 الفاظ کی وضاحت دیں
-- عملی مشورے اور مثالوں سے سمجھائیں"""
-
-def get_llm_explanation(query: str, arabic_texts: List[str], urdu_texts: List[str], verse_ids: List[int]) -> LLMExplanation:
-    """Get detailed Urdu explanation from LLM using moonshotai model"""
-    logger.info(f"🤖 Getting LLM explanation for query: '{query}'")
-    
-    try:
-        # Prepare context with verses
-        context_parts = []
-        for i, (arabic, urdu) in enumerate(zip(arabic_texts, urdu_texts)):
-            context_parts.append(f"آیت {i+1} (آیت ID: {verse_ids[i]}):")
-            context_parts.append(f"عربی متن: {arabic}")
-            context_parts.append(f"اردو ترجمہ: {urdu}")
-            context_parts.append("")  # Empty line
-        
-        context = "\n".join(context_parts)
-        
-        # Create user prompt
-        user_prompt = f"""
-سوال: {query}
+# Alternate endpoint for hedged calls, and for all calls while the primary's circuit is open
+if LLM_HEDGE_MODEL:
+    llm_hedge_client = AsyncOpenAI(
+        base_url=LLM_HEDGE_BASE_URL or LLM_BASE_URL,
+        api_key=HF_TOKEN,
+        timeout=60,
+        max_retries=0
+    )
+    hedge_breaker = circuit_breaker("llm_hedge", "llm")
+else:
+    llm_hedge_client = None
+    hedge_breaker = None
 
-متعلقہ قرآنی آیات:
-{context}
+# Latency of recent primary calls; the hedge is sent once a call runs past their p95
+call_latency = RollingPercentile()
 
-براہ کرم ان آیات کی اردو میں تفصیلی وضاحت کریں۔ وضاحت کم از کم 300 الفاظ کی ہونی چاہیے اور درج ذیل پہلوؤں کا احاطہ کرنی چاہیے:
-1. ہر آیت کا سیاق و سباق
-2. ہر آیت کا لفظی معنی
-3. تفصیلی تشریح
-4. عملی مشورے برائے روزمرہ زندگی
-5. ان آیات سے ملنے والی کلیدی تعلیمات
+# Errors retrying cannot fix: the circuit is open or the request is out of time
+NOT_RETRIED = (CircuitOpenError, DeadlineExceeded)
 
-وضاحت:"""
-        
-        logger.info(f"📝 Calling {LLM_MODEL} with {len(arabic_texts)} verses...")
-        
-        # Make API call with retry logic
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                logger.info(f"🔄 Attempt {attempt + 1}/{max_retries}")
-                
-                completion = llm_client.chat.completions.create(
-                    model=LLM_MODEL,
-                    messages=[
-                        {"role": "system", "content": SYSTEM_PROMPT},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=1200,
-                    timeout=45
-                )
-                
-                urdu_explanation = completion.choices[0].message.content
-                
-                # Validate response length
-                if len(urdu_explanation) < 100:
-                    logger.warning(f"Response too short ({len(urdu_explanation)} chars)")
-                    if attempt < max_retries - 1:
-                        time.sleep(2)
-                        continue
-                    else:
-                        raise ValueError("LLM response too short")
-                
-                logger.info(f"✅ LLM explanation generated ({len(urdu_explanation)} characters)")
-                logger.info(f"📄 Sample: {urdu_explanation[:200]}...")
-                
-                return LLMExplanation(
-                    urdu=urdu_explanation,
-                    verses_used=verse_ids
-                )
-                
-            except Exception as llm_error:
-                logger.error(f"LLM attempt {attempt + 1} failed: {llm_error}")
-                if attempt < max_retries - 1:
-                    time.sleep(3)
-                    continue
-                else:
-                    raise
-        
-    except Exception as e:
-        logger.error(f"🤖 LLM service error: {str(e)}")
-        
-        # DYNAMIC FALLBACK - NOT HARDCODED
-        query_lower = query.lower()
-        
-        # Detect topic from query
-        if any(word in query_lower for word in ['roza', 'صوم', 'صيام', 'fasting']):
-            topic = "روزہ"
-            key_benefits = [
-                "تزکیہ نفس اور روحانی پاکیزگی",
-                "صبر و استقامت میں اضافہ",
-                "اللہ کی خوشنودی اور قربت",
-                "جسمانی و روحانی صحت",
-                "غریبوں اور مسکینوں کی مدد"
-            ]
-        elif any(word in query_lower for word in ['namaz', 'صلوۃ', 'صلاة', 'prayer']):
-            topic = "نماز"
-            key_benefits = [
-                "اللہ سے براہ راست تعلق",
-                "نفس کی تربیت اور اخلاقی بلندی",
-                "برائیوں سے حفاظت",
-                "روحانی سکون اور ذہنی اطمینان",
-                "روز مرہ کی پریشانیوں سے نجات"
-            ]
-        elif any(word in query_lower for word in ['sabr', 'صبر', 'patience']):
-            topic = "صبر"
-            key_benefits = [
-                "مشکلات میں ثابت قدمی",
-                "اللہ کی رضا و خوشنودی",
-                "اندرونی طاقت و ہمت",
-                "کامیابی کی کنجی",
-                "دنیا و آخرت کی کامیابی"
-            ]
-        else:
-            topic = "اسلامی تعلیمات"
-            key_benefits = [
-                "روحانی ترقی و کمال",
-                "اخلاقی تربیت و سنوار",
-                "معاشرتی انصاف و بہتری",
-                "دنیاوی سکون و اطمینان",
-                "آخرت کی دائمی کامیابی"
-            ]
-        
-        # Generate dynamic fallback explanation
-        verses_str = ", ".join([f"آیت {vid}" for vid in verse_ids])
-        
-        dynamic_fallback = f"""
+def _build_fallback_explanation(query: str, verse_ids: List[int]) -> str:
+    """Topic-aware Urdu explanation used when the LLM is unavailable"""
+    # DYNAMIC FALLBACK - NOT HARDCODED
+    query_lower = query.lower()
+    
+    # Detect topic from query
+    if any(word in query_lower for word in ['roza', 'صوم', 'صيام', 'fasting']):
+        topic = "روزہ"
+        key_benefits = [
+            "تزکیہ نفس اور روحانی پاکیزگی",
+            "صبر و استقامت میں اضافہ",
+            "اللہ کی خوشنودی اور قربت",
+            "جسمانی و روحانی صحت",
+            "غریبوں اور مسکینوں کی مدد"
+        ]
+    elif any(word in query_lower for word in ['namaz', 'صلوۃ', 'صلاة', 'prayer']):
+        topic = "نماز"
+        key_benefits = [
+            "اللہ سے براہ راست تعلق",
+            "نفس کی تربیت اور اخلاقی بلندی",
+            "برائیوں سے حفاظت",
+            "روحانی سکون اور ذہنی اطمینان",
+            "روز مرہ کی پریشانیوں سے نجات"
+        ]
+    elif any(word in query_lower for word in ['sabr', 'صبر', 'patience']):
+        topic = "صبر"
+        key_benefits = [
+            "مشکلات میں ثابت قدمی",
+            "اللہ کی رضا و خوشنودی",
+            "اندرونی طاقت و ہمت",
+            "کامیابی کی کنجی",
+            "دنیا و آخرت کی کامیابی"
+        ]
+    else:
+        topic = "اسلامی تعلیمات"
+        key_benefits = [
+            "روحانی ترقی و کمال",
+            "اخلاقی تربیت و سنوار",
+            "معاشرتی انصاف و بہتری",
+            "دنیاوی سکون و اطمینان",
+            "آخرت کی دائمی کامیابی"
+        ]
+    
+    # Generate dynamic fallback explanation
+    verses_str = ", ".join([f"آیت {vid}" for vid in verse_ids])
+    
+    dynamic_fallback = f"""
 **سوال: "{query}" کے بارے میں قرآنی رہنمائی**
 
 **متعلقہ آیات:** {verses_str}
@@ -178,9 +129,235 @@ def get_llm_explanation(query: str, arabic_texts: List[str], urdu_texts: List[st
 
 **نتیجہ:** {topic} مومن کی زندگی کا اہم ستون ہے جو دنیا و آخرت دونوں میں کامیابی کا ذریعہ بنتا ہے۔
 """
+    
+    logger.info(f"📝 Using dynamic fallback for topic: {topic}")
+    return dynamic_fallback
+
+async def _complete(client, model: str, breaker, messages, **options):
+    """
+    One chat completion through breaker, bounded by LLM_ATTEMPT_TIMEOUT and the request
+    deadline (for a stream: until the response starts; options are passed to create).
+    Returns (completion, model).
+    """
+    with breaker.guard():
+        completion = await within_deadline(
+            client.chat.completions.create(model=model, messages=messages, temperature=0.7, max_tokens=1200, **options),
+            LLM_ATTEMPT_TIMEOUT,
+            "llm"
+        )
+    return completion, model
+
+def _hedge_delay() -> float:
+    """How long the primary call runs before the hedge is sent: the recent p95"""
+    if len(call_latency) < LLM_HEDGE_MIN_SAMPLES:
+        return LLM_HEDGE_DEFAULT_DELAY
+    return max(LLM_HEDGE_MIN_DELAY, call_latency.percentile(95))
+
+async def _hedged_completion(messages):
+    """
+    Completion from the primary endpoint. With a hedge endpoint configured, a call still
+    running after _hedge_delay() gets a second one on the hedge endpoint and the first
+    answer wins (the other call is cancelled); while the primary's circuit is open the
+    hedge endpoint answers alone. Returns (completion, model that answered).
+    """
+    if llm_hedge_client is None:
+        return await _complete(llm_client, LLM_MODEL, llm_breaker, messages)
+
+    start = time.perf_counter()
+    primary = asyncio.ensure_future(_complete(llm_client, LLM_MODEL, llm_breaker, messages))
+    pending = {primary}
+    try:
+        await asyncio.wait(pending, timeout=_hedge_delay())
+        if primary.done():
+            error = primary.exception()
+            if error is None:
+                call_latency.add(time.perf_counter() - start)
+                return primary.result()
+            if not isinstance(error, CircuitOpenError):
+                raise error
+            logger.warning("LLM circuit open, using the hedge endpoint")
+            return await _complete(llm_hedge_client, LLM_HEDGE_MODEL, hedge_breaker, messages)
+
+        logger.info(f"🪁 LLM call slower than {_hedge_delay():.1f}s, hedging with {LLM_HEDGE_MODEL}")
+        count(LLM_HEDGES, outcome="sent")
+        hedge = asyncio.ensure_future(_complete(llm_hedge_client, LLM_HEDGE_MODEL, hedge_breaker, messages))
+        pending.add(hedge)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        count(LLM_HEDGES, outcome="won")
+                    # After a hedge win the primary took at least this long, so the p95 does not drift down
+                    call_latency.add(time.perf_counter() - start)
+                    return task.result()
+        raise primary.exception()
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def _open_stream(messages):
+    """
+    Streaming completion from the primary endpoint, or the hedge endpoint while the primary's
+    circuit is open. Returns (stream, model).
+    """
+    # timeout also bounds each wait for the next chunk once the stream has started
+    options = {"stream": True, "timeout": stage_timeout(LLM_ATTEMPT_TIMEOUT, "llm")}
+    try:
+        return await _complete(llm_client, LLM_MODEL, llm_breaker, messages, **options)
+    except CircuitOpenError:
+        if llm_hedge_client is None:
+            raise
+        logger.warning("LLM circuit open, streaming from the hedge endpoint")
+        return await _complete(llm_hedge_client, LLM_HEDGE_MODEL, hedge_breaker, messages, **options)
+
+async def _generate_explanation(
+    query: str, arabic_texts: List[str], urdu_texts: List[str], verse_ids: List[int]
+) -> Tuple[LLMExplanation, str]:
+    """
+    Call the LLM with retries; returns (explanation, model that answered) and raises when
+    no acceptable explanation was produced
+    """
+    messages, prompt_tokens = build_messages(query, arabic_texts, urdu_texts, verse_ids)
+    
+    logger.debug(f"📝 Calling {LLM_MODEL} with {len(arabic_texts)} verses ({prompt_tokens} prompt tokens)...")
+    
+    # Make API call with retry logic
+    max_retries = 3
+    for attempt in range(max_retries):
+        attempt_start = time.perf_counter()
+        called = None
+        try:
+            logger.debug(f"🔄 Attempt {attempt + 1}/{max_retries}")
+            
+            completion, model = await _hedged_completion(messages)
+            called = time.perf_counter() - attempt_start
+            if completion.usage is not None and completion.usage.prompt_tokens:
+                observe(LLM_PROMPT_TOKENS, completion.usage.prompt_tokens, source="provider")
+                if model == LLM_MODEL:
+                    prompt_tokenizer.calibrate(messages, completion.usage.prompt_tokens)
+            
+            urdu_explanation = completion.choices[0].message.content
+            
+            # Validate response length
+            if len(urdu_explanation) < 100:
+                logger.warning(f"Response too short ({len(urdu_explanation)} chars)")
+                observe(LLM_ATTEMPT_SECONDS, called, attempt=str(attempt + 1), outcome="short")
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(stage_timeout(2, "llm"))
+                    continue
+                else:
+                    raise ValueError("LLM response too short")
+            
+            observe(LLM_ATTEMPT_SECONDS, called, attempt=str(attempt + 1), outcome="ok")
+            logger.debug(f"✅ LLM explanation generated ({len(urdu_explanation)} characters)")
+            logger.debug(f"📄 Sample: {urdu_explanation[:200]}...")
+            
+            return LLMExplanation(
+                urdu=urdu_explanation,
+                verses_used=verse_ids
+            ), model
+            
+        except Exception as llm_error:
+            if called is None and not isinstance(llm_error, CircuitOpenError):
+                observe(LLM_ATTEMPT_SECONDS, time.perf_counter() - attempt_start, attempt=str(attempt + 1), outcome="error")
+            if isinstance(llm_error, NOT_RETRIED):
+                logger.warning(f"LLM attempt {attempt + 1} not retried: {llm_error}")
+                raise
+            logger.error(f"LLM attempt {attempt + 1} failed: {llm_error!r}")
+            if attempt < max_retries - 1:
+                await asyncio.sleep(stage_timeout(LLM_RETRY_DELAY, "llm"))
+                continue
+            else:
+                raise
+
+async def get_llm_explanation(query: str, arabic_texts: List[str], urdu_texts: List[str], verse_ids: List[int]) -> LLMExplanation:
+    """Get detailed Urdu explanation from LLM using moonshotai model (cached per query + verse set)"""
+    logger.debug(f"🤖 Getting LLM explanation for query: '{query}'")
+    
+    try:
+        if explanation_cache is not None:
+            return await explanation_cache.get_or_generate(
+                query,
+                verse_ids,
+                lambda: _generate_explanation(query, arabic_texts, urdu_texts, verse_ids)
+            )
+        explanation, _ = await _generate_explanation(query, arabic_texts, urdu_texts, verse_ids)
+        return explanation
+        
+    except Exception as e:
+        logger.error(f"🤖 LLM service error: {str(e)}")
+        count_fallback("llm")
         
-        logger.info(f"📝 Using dynamic fallback for topic: {topic}")
         return LLMExplanation(
-            urdu=dynamic_fallback,
+            urdu=_build_fallback_explanation(query, verse_ids),
             verses_used=verse_ids
-        )
\ No newline at end of file
+        )
+
+async def stream_llm_explanation(query: str, arabic_texts: List[str], urdu_texts: List[str], verse_ids: List[int]) -> AsyncIterator[str]:
+    """
+    Stream the Urdu explanation as text chunks. Retries only happen before the first
+    chunk is sent; if nothing could be streamed, the fallback explanation is yielded
+    as a single chunk.
+    """
+    logger.debug(f"🤖 Streaming LLM explanation for query: '{query}'")
+    
+    if explanation_cache is not None:
+        cached = await explanation_cache.get(query, verse_ids)
+        if cached is not None:
+            logger.debug("✅ Explanation served from cache")
+            yield cached.urdu
+            return
+    
+    messages, _ = build_messages(query, arabic_texts, urdu_texts, verse_ids)
+    
+    max_retries = 3
+    for attempt in range(max_retries):
+        sent_any = False
+        chunks = []
+        attempt_start = time.perf_counter()
+        try:
+            logger.debug(f"🔄 Stream attempt {attempt + 1}/{max_retries}")
+            
+            stream, model = await _open_stream(messages)
+            
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    sent_any = True
+                    chunks.append(delta)
+                    yield delta
+            
+            if sent_any:
+                observe(LLM_ATTEMPT_SECONDS, time.perf_counter() - attempt_start, attempt=str(attempt + 1), outcome="ok")
+                logger.debug("✅ LLM stream finished")
+                # Answers from the hedge endpoint are not cached under LLM_MODEL's key
+                if explanation_cache is not None and model == LLM_MODEL:
+                    await explanation_cache.put(query, verse_ids, LLMExplanation(urdu="".join(chunks), verses_used=verse_ids))
+                return
+            raise ValueError("LLM stream returned no content")
+            
+        except Exception as llm_error:
+            if not isinstance(llm_error, CircuitOpenError):
+                observe(
+                    LLM_ATTEMPT_SECONDS, time.perf_counter() - attempt_start,
+                    attempt=str(attempt + 1), outcome="interrupted" if sent_any else "error"
+                )
+            if sent_any:
+                # Tokens already reached the client; nothing sensible to retry
+                logger.error(f"LLM stream interrupted: {llm_error}")
+                return
+            if isinstance(llm_error, NOT_RETRIED):
+                logger.warning(f"LLM stream attempt {attempt + 1} not retried: {llm_error}")
+                break
+            logger.error(f"LLM stream attempt {attempt + 1} failed: {llm_error!r}")
+            if attempt < max_retries - 1:
+                try:
+                    await asyncio.sleep(stage_timeout(LLM_RETRY_DELAY, "llm"))
+                except DeadlineExceeded:
+                    break
+    
+    count_fallback("llm")
+    yield _build_fallback_explanation(query, verse_ids)
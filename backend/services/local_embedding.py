@@ -0,0 +1,210 @@
+import asyncio
+import os
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import (
+    LOCAL_EMBEDDING_MODEL,
+    LOCAL_EMBEDDING_RUNTIME,
+    LOCAL_EMBEDDING_ONNX_DIR,
+    LOCAL_EMBEDDING_QUANTIZE,
+    LOCAL_EMBEDDING_THREADS,
+    LOCAL_EMBEDDING_MAX_LENGTH
+)
+from services.logger import logger
+from typing import Any, Dict, List, Tuple
+
+WARMUP_TEXTS = ["الصبر", "roza ki fazilat", "patience in hardship"]
+
+class LocalBGEM3Encoder:
+    """
+    In-process CPU encoder producing the same dense + sparse outputs as BGE-M3 on Colab.
+
+    Dense is the L2-normalized CLS vector; sparse is relu(sparse_linear(hidden)) max-pooled
+    per token id with special tokens dropped (as in FlagEmbedding). The transformer runs
+    either in PyTorch (optionally dynamic int8) or in ONNX Runtime on an exported, int8
+    quantized graph; the tiny sparse head always runs in NumPy.
+    """
+
+    def __init__(self, model_name: str, runtime: str, onnx_dir: str, quantize: bool, max_length: int, threads: int):
+        self.model_name = model_name
+        self.runtime = runtime
+        self.onnx_dir = onnx_dir
+        self.quantize = quantize
+        self.max_length = max_length
+        self.threads = threads
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="bge-m3")
+        self.tokenizer = None
+        self.model = None
+        self.session = None
+        self.sparse_weight = None
+        self.sparse_bias = None
+        self.special_ids = set()
+
+    def load(self):
+        """Load tokenizer, transformer and sparse head (blocking; run off the event loop)"""
+        try:
+            from transformers import AutoTokenizer
+            from huggingface_hub import hf_hub_download
+            import torch
+        except ImportError as e:
+            raise RuntimeError(f"Local embedding backend needs requirements-local.txt installed: {e}")
+
+        start = time.perf_counter()
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.special_ids = {
+            self.tokenizer.convert_tokens_to_ids(self.tokenizer.special_tokens_map[name])
+            for name in ("cls_token", "eos_token", "pad_token", "unk_token")
+            if name in self.tokenizer.special_tokens_map
+        }
+
+        sparse_path = os.path.join(self.model_name, "sparse_linear.pt")
+        if not os.path.exists(sparse_path):
+            sparse_path = hf_hub_download(self.model_name, "sparse_linear.pt")
+        sparse_state = torch.load(sparse_path, map_location="cpu")
+        self.sparse_weight = sparse_state["weight"].float().numpy().reshape(-1)
+        self.sparse_bias = float(sparse_state["bias"].float().numpy().reshape(-1)[0])
+
+        if self.runtime == "onnx":
+            self._load_onnx()
+        else:
+            self._load_torch()
+
+        logger.info(f"✅ Local BGE-M3 loaded ({self.runtime}, int8={self.quantize}) in {time.perf_counter() - start:.1f}s")
+
+    def _load_torch(self):
+        import torch
+        from transformers import AutoModel
+
+        torch.set_num_threads(max(1, (os.cpu_count() or 2) // self.threads))
+        model = AutoModel.from_pretrained(self.model_name).eval()
+        if self.quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+
+    def _load_onnx(self):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError(f"ONNX runtime requested but onnxruntime is not installed: {e}")
+
+        filename = "model_quantized.onnx" if self.quantize else "model.onnx"
+        path = os.path.join(self.onnx_dir, filename)
+        if not os.path.exists(path):
+            raise RuntimeError(f"{path} not found, run: python -m services.local_embedding export")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = max(1, (os.cpu_count() or 2) // self.threads)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def _hidden_states(self, encoded: Dict[str, np.ndarray]) -> np.ndarray:
+        if self.session is not None:
+            feed = {i.name: encoded[i.name] for i in self.session.get_inputs() if i.name in encoded}
+            return self.session.run(None, feed)[0]
+
+        import torch
+        with torch.inference_mode():
+            output = self.model(
+                input_ids=torch.from_numpy(encoded["input_ids"]),
+                attention_mask=torch.from_numpy(encoded["attention_mask"])
+            )
+        return output.last_hidden_state.float().numpy()
+
+    def encode_batch(self, texts: List[str]) -> List[Tuple[Dict[str, Any], str]]:
+        """Encode texts in one forward pass (blocking)"""
+        encoded = dict(self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        ))
+        encoded = {k: v.astype(np.int64) for k, v in encoded.items()}
+        hidden = self._hidden_states(encoded)
+
+        dense = hidden[:, 0]
+        dense = dense / np.linalg.norm(dense, axis=1, keepdims=True)
+        token_weights = np.maximum(hidden @ self.sparse_weight + self.sparse_bias, 0.0)
+
+        results = []
+        for row, text in enumerate(texts):
+            weights: Dict[int, float] = {}
+            for token_id, weight, mask in zip(encoded["input_ids"][row], token_weights[row], encoded["attention_mask"][row]):
+                token_id = int(token_id)
+                if not mask or weight <= 0 or token_id in self.special_ids:
+                    continue
+                if weight > weights.get(token_id, 0.0):
+                    weights[token_id] = float(weight)
+
+            embeddings = {
+                "dense": dense[row].astype(np.float32),
+                "sparse": {"indices": list(weights.keys()), "values": list(weights.values())}
+            }
+            results.append((embeddings, text))
+        return results
+
+    async def embed_batch(self, texts: List[str]) -> List[Tuple[Dict[str, Any], str]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.encode_batch, texts)
+
+    async def embed_single(self, text: str) -> Tuple[Dict[str, Any], str]:
+        return (await self.embed_batch([text]))[0]
+
+    def warmup(self):
+        """Run a few encodes so first real queries don't pay for lazy init / graph compilation"""
+        start = time.perf_counter()
+        self.encode_batch(WARMUP_TEXTS)
+        for text in WARMUP_TEXTS:
+            self.encode_batch([text])
+        logger.info(f"✅ Local BGE-M3 warm-up done in {time.perf_counter() - start:.2f}s")
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True):
+    """Export BGE-M3 to ONNX (last_hidden_state output) and optionally int8-quantize it"""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from transformers import AutoTokenizer
+
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+    print(f"Exported {model_name} to {output_dir}/model.onnx")
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(
+            os.path.join(output_dir, "model.onnx"),
+            os.path.join(output_dir, "model_quantized.onnx"),
+            weight_type=QuantType.QInt8
+        )
+        print(f"Quantized model written to {output_dir}/model_quantized.onnx")
+
+local_encoder = LocalBGEM3Encoder(
+    LOCAL_EMBEDDING_MODEL,
+    LOCAL_EMBEDDING_RUNTIME,
+    LOCAL_EMBEDDING_ONNX_DIR,
+    LOCAL_EMBEDDING_QUANTIZE,
+    LOCAL_EMBEDDING_MAX_LENGTH,
+    LOCAL_EMBEDDING_THREADS
+)
+
+async def init_local_encoder():
+    """Load and warm up the local encoder without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(local_encoder.executor, local_encoder.load)
+    await loop.run_in_executor(local_encoder.executor, local_encoder.warmup)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local BGE-M3 encoder utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="export BGE-M3 to ONNX for LOCAL_EMBEDDING_RUNTIME='onnx'")
+    export.add_argument("--model", default=LOCAL_EMBEDDING_MODEL)
+    export.add_argument("--output-dir", default=LOCAL_EMBEDDING_ONNX_DIR)
+    export.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args()
+
+    export_onnx(args.model, args.output_dir, quantize=not args.no_quantize)
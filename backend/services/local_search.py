@@ -0,0 +1,196 @@
+import asyncio
+import os
+import time
+import numpy as np
+from config.settings import (
+    LOCAL_SEARCH_EMBEDDINGS_DIR,
+    LOCAL_SEARCH_EMBEDDINGS_PATH,
+    LOCAL_SEARCH_DENSE_DTYPE,
+    SEARCH_FUSION,
+    FUSION_DENSE_WEIGHT,
+    FUSION_SPARSE_WEIGHT,
+    RRF_K,
+    SEARCH_CANDIDATE_MULTIPLIER
+)
+from services.fusion import reciprocal_rank_fusion, weighted_score_fusion
+from services.logger import logger
+from services.search_filters import FILTER_FIELDS
+from utils.embedding_format import EmbeddingSet, convert_jsonl
+from typing import Any, Dict, List, Optional
+
+class LocalPoint:
+    """Search hit shaped like a Qdrant ScoredPoint (id, score, payload)"""
+    __slots__ = ("id", "score", "payload")
+
+    def __init__(self, id, score, payload):
+        self.id = id
+        self.score = score
+        self.payload = payload
+
+class LocalSearchService:
+    """
+    Exact in-process hybrid search over the Quran embeddings, with the same
+    search(embeddings, top_k, **options) interface as HybridQdrantService.
+
+    Vectors come from a binary embedding set (utils/embedding_format). Dense vectors
+    are one (n_verses x 1024) memory-mapped matrix scaled by precomputed inverse
+    norms, so cosine scores are a single matrix-vector product (a GEMM for a batch).
+    Sparse vectors are kept as a term-major CSR matrix (the transpose of the
+    verse x vocabulary matrix, i.e. an inverted index), so a query only touches the
+    postings of its own tokens. Both legs are fused with services.fusion.
+    """
+
+    def __init__(self, embeddings_dir: str, embeddings_path: str, dense_dtype: str):
+        self.embeddings_dir = embeddings_dir
+        self.embeddings_path = embeddings_path
+        self.dense_dtype = dense_dtype
+        self.dense: Optional[np.ndarray] = None
+        self.inv_norms: Optional[np.ndarray] = None
+        self.sparse_indptr: Optional[np.ndarray] = None
+        self.sparse_docs: Optional[np.ndarray] = None
+        self.sparse_values: Optional[np.ndarray] = None
+        self.ids: Optional[np.ndarray] = None
+        self.payloads: List[Dict[str, Any]] = []
+        self.payload_columns: Dict[str, np.ndarray] = {}   # filterable payload field -> value per row
+        self.layout = "local"
+
+    async def initialize(self):
+        """Load (building on first run) the index off the event loop (called at app startup)"""
+        await asyncio.to_thread(self.load)
+
+    async def close(self):
+        """Nothing to release; kept for interface parity with HybridQdrantService"""
+
+    def _open_embeddings(self) -> EmbeddingSet:
+        """Open the embedding set, converting the JSONL export when the set is missing or older"""
+        stale = (
+            os.path.exists(self.embeddings_path)
+            and (not EmbeddingSet.exists(self.embeddings_dir)
+                 or os.path.getmtime(self.embeddings_path) > os.path.getmtime(os.path.join(self.embeddings_dir, "manifest.json")))
+        )
+        if stale:
+            logger.info(f"Converting {self.embeddings_path} to {self.embeddings_dir}...")
+            return convert_jsonl(self.embeddings_path, self.embeddings_dir, self.dense_dtype)
+        return EmbeddingSet.open(self.embeddings_dir)
+
+    def load(self):
+        """Memory-map the embedding set and build the sparse inverted index"""
+        start = time.perf_counter()
+        embeddings = self._open_embeddings()
+
+        # NumPy has no fp16 BLAS: a float16 matrix is upcast once rather than on every query
+        dense = embeddings.dense
+        self.dense = dense if dense.dtype == np.float32 else np.asarray(dense, dtype=np.float32)
+        norms = np.linalg.norm(self.dense, axis=1)
+        self.inv_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0).astype(np.float32)
+        self.sparse_indptr, self.sparse_docs, self.sparse_values = embeddings.term_major()
+        self.ids = np.asarray(embeddings.ids)
+        self.payloads = embeddings.payloads
+        self.payload_columns = {
+            field: np.asarray([payload.get(field) for payload in self.payloads], dtype=object)
+            for field in FILTER_FIELDS.values()
+        }
+
+        logger.info(
+            f"✅ Local search index loaded: {len(self.ids)} verses, "
+            f"{len(self.sparse_docs)} sparse postings in {time.perf_counter() - start:.2f}s"
+        )
+
+    def _points(self, rows: np.ndarray, scores: np.ndarray) -> List[LocalPoint]:
+        return [LocalPoint(self.ids[row].item(), float(scores[row]), self.payloads[row]) for row in rows]
+
+    def _top(self, scores: np.ndarray, limit: int, candidates: Optional[np.ndarray] = None) -> List[LocalPoint]:
+        """Best `limit` rows by score (restricted to candidates when given), highest first"""
+        rows = np.arange(len(scores)) if candidates is None else candidates
+        if len(rows) > limit:
+            rows = rows[np.argpartition(scores[rows], -limit)[-limit:]]
+        rows = rows[np.argsort(scores[rows])[::-1]]
+        return self._points(rows, scores)
+
+    def _sparse_scores(self, indices, values) -> np.ndarray:
+        """Dot product of the query's sparse vector with every verse, via the inverted CSR"""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        terms = np.asarray(indices, dtype=np.int64)
+        weights = np.asarray(values, dtype=np.float32)
+        known = (terms >= 0) & (terms < len(self.sparse_indptr) - 1)
+        terms, weights = terms[known], weights[known]
+        if not len(terms):
+            return scores
+
+        starts = self.sparse_indptr[terms]
+        lengths = self.sparse_indptr[terms + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return scores
+        # positions of every posting of every query term, without a Python loop
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        contributions = self.sparse_values[offsets] * np.repeat(weights, lengths)
+        scores += np.bincount(self.sparse_docs[offsets], weights=contributions, minlength=len(scores)).astype(np.float32)
+        return scores
+
+    def _allowed_rows(self, filters) -> Optional[np.ndarray]:
+        """Rows whose payload matches every filter field (None when unfiltered)"""
+        if not filters:
+            return None
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field, values in filters.items():
+            mask &= np.isin(self.payload_columns[field], values)
+        return np.flatnonzero(mask)
+
+    def _fuse(self, dense_scores, embeddings, top_k, fusion, weights, candidates, allowed=None) -> List[LocalPoint]:
+        dense_results = self._top(dense_scores, candidates, allowed)
+        sparse = embeddings.get("sparse") or {}
+        sparse_results = []
+        if sparse.get("indices"):
+            sparse_scores = self._sparse_scores(sparse["indices"], sparse["values"])
+            matched = np.flatnonzero(sparse_scores)
+            if allowed is not None:
+                matched = np.intersect1d(matched, allowed, assume_unique=True)
+            sparse_results = self._top(sparse_scores, candidates, matched)
+
+        if fusion == "weighted":
+            return weighted_score_fusion([dense_results, sparse_results], weights, top_k)
+        return reciprocal_rank_fusion([dense_results, sparse_results], weights, top_k, RRF_K)
+
+    def _options(self, top_k, fusion, dense_weight, sparse_weight):
+        fusion = fusion or SEARCH_FUSION
+        if fusion == "server":
+            fusion = "rrf"  # no server here; RRF is what Qdrant would run
+        weights = [
+            FUSION_DENSE_WEIGHT if dense_weight is None else dense_weight,
+            FUSION_SPARSE_WEIGHT if sparse_weight is None else sparse_weight
+        ]
+        return fusion, weights, min(top_k * SEARCH_CANDIDATE_MULTIPLIER, len(self.ids))
+
+    def search_batch_sync(self, embeddings_list, top_k=5, fusion=None, dense_weight=None, sparse_weight=None, filters=None):
+        """Hybrid search for several queries; dense scoring is one GEMM for the whole batch"""
+        if self.dense is None:
+            raise RuntimeError("Local search index not loaded")
+        fusion, weights, candidates = self._options(top_k, fusion, dense_weight, sparse_weight)
+        allowed = self._allowed_rows(filters)
+
+        queries = np.asarray([e["dense"] for e in embeddings_list], dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries /= np.where(norms > 0, norms, 1.0)
+        dense_scores = (queries @ self.dense.T) * self.inv_norms
+
+        return [
+            self._fuse(dense_scores[i], embeddings, top_k, fusion, weights, candidates, allowed)
+            for i, embeddings in enumerate(embeddings_list)
+        ]
+
+    async def search_batch(self, embeddings_list, top_k=5, **options):
+        return await asyncio.to_thread(self.search_batch_sync, embeddings_list, top_k, **options)
+
+    async def search(self, embeddings, top_k=5, **options):
+        """Main search method (options: fusion, dense_weight, sparse_weight, filters)"""
+        # NumPy releases the GIL: off the event loop, a large corpus does not stall other requests
+        results = (await self.search_batch([embeddings], top_k, **options))[0]
+        logger.debug(f"✅ Local search found {len(results)} combined results")
+        return results
+
+local_search_service = LocalSearchService(
+    LOCAL_SEARCH_EMBEDDINGS_DIR,
+    LOCAL_SEARCH_EMBEDDINGS_PATH,
+    LOCAL_SEARCH_DENSE_DTYPE
+)
@@ -1,33 +1,151 @@
+import atexit
+import json
 import logging
-import sys
+import logging.handlers
 import os
-from config.settings import LOG_LEVEL, LOG_FILE
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from config.settings import (
+    LOG_LEVEL,
+    LOG_FILE,
+    LOG_FORMAT,
+    LOG_QUEUE,
+    LOG_ROTATE_MAX_BYTES,
+    LOG_ROTATE_WHEN,
+    LOG_ROTATE_BACKUPS,
+    LOG_DETAIL_SAMPLE_RATE
+)
+
+# Request context, set once per HTTP request by api.middleware.RequestContextMiddleware
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+detail_sampled_var: ContextVar[bool] = ContextVar("detail_sampled", default=False)
 
-# Create logs directory
-os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+class RequestLogger(logging.Logger):
+    """
+    Records below threshold (LOG_LEVEL) are dropped, except DEBUG inside sampled requests;
+    unsampled detail lines never build a LogRecord
+    """
+    threshold = logging.INFO
 
-# Configure logger
+    def isEnabledFor(self, level):
+        if level < self.threshold and not (level <= logging.DEBUG and detail_sampled_var.get()):
+            return False
+        return super().isEnabledFor(level)
+
+logging.setLoggerClass(RequestLogger)
 logger = logging.getLogger("QuranSearch")
-logger.setLevel(getattr(logging, LOG_LEVEL))
+logging.setLoggerClass(logging.Logger)
+logger.propagate = False
 
-# Handlers
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(getattr(logging, LOG_LEVEL))
+_listener = None
+_detail_sample_rate = LOG_DETAIL_SAMPLE_RATE
 
-file_handler = logging.FileHandler(LOG_FILE)
-file_handler.setLevel(getattr(logging, LOG_LEVEL))
+def start_request(request_id: str = None):
+    """Set the request id (a new one when None) and decide whether this request's DEBUG detail is logged"""
+    request_id = request_id or uuid.uuid4().hex[:16]
+    tokens = (
+        request_id_var.set(request_id),
+        detail_sampled_var.set(random.random() < _detail_sample_rate)
+    )
+    return request_id, tokens
 
-# Formatter
-formatter = logging.Formatter(
-    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+def end_request(tokens):
+    request_id_var.reset(tokens[0])
+    detail_sampled_var.reset(tokens[1])
 
-console_handler.setFormatter(formatter)
-file_handler.setFormatter(formatter)
+class RequestContextFilter(logging.Filter):
+    """Stamps the current request id on every record"""
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
 
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
-logger.propagate = False
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, request_id, message (+ exc_info)"""
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def _file_handler(log_file: str) -> logging.Handler:
+    if LOG_ROTATE_WHEN:
+        return logging.handlers.TimedRotatingFileHandler(
+            log_file, when=LOG_ROTATE_WHEN, backupCount=LOG_ROTATE_BACKUPS, encoding="utf-8"
+        )
+    return logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=LOG_ROTATE_MAX_BYTES, backupCount=LOG_ROTATE_BACKUPS, encoding="utf-8"
+    )
+
+def configure_logging(
+    level: str = LOG_LEVEL,
+    log_format: str = LOG_FORMAT,
+    log_file: str = LOG_FILE,
+    use_queue: bool = LOG_QUEUE,
+    detail_sample_rate: float = LOG_DETAIL_SAMPLE_RATE,
+    console: bool = True
+):
+    """
+    (Re)build the QuranSearch logger's handlers; called at app startup (main.startup), not on
+    import. With use_queue the logger only puts records on a queue (QueueHandler) and a
+    QueueListener thread formats and writes them, so the event loop never blocks on stdout or
+    the log file.
+    """
+    global _listener, _detail_sample_rate
+    stop_logging()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    for log_filter in list(logger.filters):
+        logger.removeFilter(log_filter)
+
+    _detail_sample_rate = detail_sample_rate
+    logger.threshold = getattr(logging, level)
+    # DEBUG stays open at the logger level; RequestLogger.isEnabledFor applies LOG_LEVEL and
+    # lets sampled requests' DEBUG through
+    logger.setLevel(logging.DEBUG if detail_sample_rate > 0 else logger.threshold)
+    logger.addFilter(RequestContextFilter())
+
+    if log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+
+    handlers = []
+    if console:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    if log_file:
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+        handlers.append(_file_handler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    if use_queue:
+        records = queue.SimpleQueue()
+        logger.addHandler(logging.handlers.QueueHandler(records))
+        _listener = logging.handlers.QueueListener(records, *handlers)
+        _listener.start()
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
+
+def stop_logging():
+    """Flush queued records and stop the listener thread (app shutdown, exit)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
 
-logger.info("Logger initialized")
\ No newline at end of file
+atexit.register(stop_logging)
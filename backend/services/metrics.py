@@ -0,0 +1,90 @@
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from config.settings import METRICS_ENABLED, METRICS_LATENCY_BUCKETS
+from contextlib import contextmanager
+import time
+
+# Request stages: embed, retrieve (all corpora, texts included), llm, first_token (stream), total
+STAGE_SECONDS = Histogram(
+    "quran_search_stage_seconds", "Latency of each request stage",
+    ["endpoint", "stage"], buckets=METRICS_LATENCY_BUCKETS
+)
+# Per corpus: search (Qdrant or local engine) and texts (verse store / PostgreSQL / payload)
+CORPUS_STAGE_SECONDS = Histogram(
+    "quran_search_corpus_stage_seconds", "Latency of the search and text stages per corpus",
+    ["corpus", "stage"], buckets=METRICS_LATENCY_BUCKETS
+)
+# Qdrant round trips: dense, sparse, batched (both legs in one query_batch_points) or server fusion
+QDRANT_LEG_SECONDS = Histogram(
+    "quran_search_qdrant_leg_seconds", "Latency of Qdrant search round trips",
+    ["collection", "leg"], buckets=METRICS_LATENCY_BUCKETS
+)
+# One LLM call; outcome is ok, short (rejected, retried), error or interrupted (stream broke after tokens)
+LLM_ATTEMPT_SECONDS = Histogram(
+    "quran_search_llm_attempt_seconds", "Latency of each LLM attempt",
+    ["attempt", "outcome"], buckets=METRICS_LATENCY_BUCKETS
+)
+# Prompt size of each LLM request: counted (services.prompt_builder, before the call) or provider (usage)
+LLM_PROMPT_TOKENS = Histogram(
+    "quran_search_llm_prompt_tokens", "Prompt tokens sent to the LLM",
+    ["source"], buckets=(250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 12000)
+)
+# Verses offered to the prompt builder: kept, truncated (cut to fit the budget) or dropped
+LLM_PROMPT_VERSES = Counter("quran_search_llm_prompt_verses_total", "Verses offered to the LLM prompt", ["outcome"])
+# dummy_embedding, dense_only, postgres, hadith_texts, llm
+FALLBACKS = Counter("quran_search_fallbacks_total", "Requests served through a fallback path", ["path"])
+# Corpora left out of a response: timeout, error or circuit_open
+CORPUS_SKIPPED = Counter("quran_search_corpus_skipped_total", "Corpora skipped in a response", ["corpus", "reason"])
+# Circuit breakers (services.resilience): state 0 closed, 1 half open, 2 open; calls refused while open
+CIRCUIT_STATE = Gauge("quran_search_circuit_state", "Circuit breaker state (0 closed, 1 half open, 2 open)", ["breaker"])
+CIRCUIT_REJECTED = Counter("quran_search_circuit_rejected_total", "Calls failed fast by an open circuit", ["breaker"])
+# Stages not started or cut short because the request deadline ran out
+DEADLINE_EXCEEDED = Counter("quran_search_deadline_exceeded_total", "Stages stopped by the request deadline", ["stage"])
+# Hedged LLM calls: sent (second call started), won (the hedge answered first)
+LLM_HEDGES = Counter("quran_search_llm_hedges_total", "Hedged LLM calls", ["outcome"])
+
+# Labelled children by (metric, labels); labels() is a locked dict lookup, about as slow as observe() itself
+_children = {}
+
+def _child(metric, labels):
+    key = (metric, tuple(labels.items()))
+    child = _children.get(key)
+    if child is None:
+        child = _children[key] = metric.labels(**labels)
+    return child
+
+def observe(histogram, value: float, **labels):
+    if METRICS_ENABLED:
+        _child(histogram, labels).observe(value)
+
+@contextmanager
+def timed(histogram, **labels):
+    """Observe the duration of the block (also when it raises)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(histogram, time.perf_counter() - start, **labels)
+
+def count_fallback(path: str):
+    if METRICS_ENABLED:
+        _child(FALLBACKS, {"path": path}).inc()
+
+def count_skipped(corpus: str, reason: str):
+    if METRICS_ENABLED:
+        _child(CORPUS_SKIPPED, {"corpus": corpus, "reason": reason}).inc()
+
+def count(counter, **labels):
+    if METRICS_ENABLED:
+        _child(counter, labels).inc()
+
+def set_gauge(gauge, value: float, **labels):
+    if METRICS_ENABLED:
+        _child(gauge, labels).set(value)
+
+def count_prompt_verses(outcome: str, amount: int = 1):
+    if METRICS_ENABLED and amount:
+        _child(LLM_PROMPT_VERSES, {"outcome": outcome}).inc(amount)
+
+def render():
+    """(body, content type) for GET /metrics"""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,10 +1,188 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from config.settings import POSTGRES_CONFIG
+import asyncio
+import asyncpg
+import time
+from contextlib import asynccontextmanager
+from config.settings import (
+    POSTGRES_CONFIG,
+    POSTGRES_POOL_MIN_SIZE,
+    POSTGRES_POOL_MAX_SIZE,
+    POSTGRES_POOL_ACQUIRE_TIMEOUT,
+    POSTGRES_STATEMENT_CACHE_SIZE,
+    POSTGRES_CONNECT_TIMEOUT,
+    POSTGRES_QUERY_TIMEOUT
+)
 from services.logger import logger
-from typing import List, Dict, Any
+from services.metrics import count_fallback
+from services.resilience import circuit_breaker, stage_timeout
+from utils.helpers import SingleFlight
+from typing import List, Dict, Any, Optional
 
-def get_verse_texts_from_db(verse_details: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+VERSE_SELECT = """
+SELECT 
+    quran_id,
+    juz_id,
+    surah_id,
+    ayah_id,
+    source,
+    transliteration,
+    surah_name_ar,
+    surah_name_ur,
+    surah_name_en,
+    surah_type,
+    text_ar,
+    text_ur,
+    text_en
+FROM quran_ayah 
+"""
+
+# Verse-fetch query. asyncpg keeps it as a server-side prepared statement in each
+# connection's statement cache, so repeated searches skip the Parse/Plan step.
+VERSE_QUERY = VERSE_SELECT + """WHERE quran_id = ANY($1::int[])
+ORDER BY array_position($1::int[], quran_id)
+"""
+
+ALL_VERSES_QUERY = VERSE_SELECT + "ORDER BY quran_id\n"
+
+HADITH_QUERY = """
+SELECT
+    hadith_id,
+    book_id,
+    chapter_id,
+    source,
+    book,
+    chapter_name_ar,
+    chapter_name_ur,
+    chapter_name_en,
+    narrator,
+    status,
+    text_ar,
+    text_ur,
+    text_en
+FROM {table}
+WHERE hadith_id = ANY($1::int[])
+"""
+
+class PoolMetrics:
+    """Running statistics for pool waits (time to acquire) and checkouts (time held)"""
+    
+    def __init__(self):
+        self.acquisitions = 0
+        self.acquire_timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.checkout_total = 0.0
+        self.checkout_max = 0.0
+    
+    def record_wait(self, seconds: float):
+        self.acquisitions += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+    
+    def record_checkout(self, seconds: float):
+        self.checkout_total += seconds
+        self.checkout_max = max(self.checkout_max, seconds)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        count = self.acquisitions or 1
+        return {
+            "acquisitions": self.acquisitions,
+            "acquire_timeouts": self.acquire_timeouts,
+            "wait_avg_ms": round(self.wait_total / count * 1000, 3),
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "checkout_avg_ms": round(self.checkout_total / count * 1000, 3),
+            "checkout_max_ms": round(self.checkout_max * 1000, 3)
+        }
+
+pool_metrics = PoolMetrics()
+_pool: Optional[asyncpg.Pool] = None
+_pool_creation = SingleFlight()
+postgres_breaker = circuit_breaker("postgres")
+
+def _postgres_failure(error: BaseException) -> bool:
+    """Whether an error counts against the PostgreSQL circuit (an error in a statement comes from a live server)"""
+    return not isinstance(error, asyncpg.PostgresError) or isinstance(error, asyncpg.PostgresConnectionError)
+
+async def _prepare_connection(conn):
+    """
+    Warm the verse-fetch prepared statement on every new pooled connection. Best effort: without
+    a quran_ayah table (hadith-only or payload deployments) the statement is prepared on first use
+    """
+    try:
+        await conn.fetch(VERSE_QUERY, [])
+    except asyncpg.PostgresError as e:
+        logger.debug(f"Verse statement not prepared on the new connection: {e}")
+
+async def init_pool():
+    """Create the application-wide connection pool (called at app startup, or on first use)"""
+    if _pool is not None:
+        return _pool
+    # Concurrent first uses share one attempt; each creating its own would leak all but the last pool
+    return await _pool_creation.do("pool", _create_pool)
+
+async def _create_pool():
+    global _pool
+    try:
+        _pool = await asyncpg.create_pool(
+            **POSTGRES_CONFIG,
+            min_size=POSTGRES_POOL_MIN_SIZE,
+            max_size=POSTGRES_POOL_MAX_SIZE,
+            statement_cache_size=POSTGRES_STATEMENT_CACHE_SIZE,
+            timeout=POSTGRES_CONNECT_TIMEOUT,
+            init=_prepare_connection
+        )
+        logger.info(f"✅ PostgreSQL pool ready (min={POSTGRES_POOL_MIN_SIZE}, max={POSTGRES_POOL_MAX_SIZE})")
+    except Exception as e:
+        logger.error(f"PostgreSQL pool creation failed: {e}")
+        _pool = None
+    return _pool
+
+async def close_pool():
+    """Close the connection pool (called at app shutdown)"""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+        logger.info("PostgreSQL pool closed")
+
+@asynccontextmanager
+async def acquire_connection():
+    """
+    Check a connection out of the pool, recording wait and checkout times. The checkout
+    (queries included) goes through the PostgreSQL circuit breaker: while it is open this
+    fails fast with CircuitOpenError instead of waiting on a dead server.
+    """
+    with postgres_breaker.guard(is_failure=_postgres_failure):
+        pool = _pool or await init_pool()
+        if pool is None:
+            raise RuntimeError("PostgreSQL pool is not available")
+        
+        start = time.perf_counter()
+        try:
+            conn = await pool.acquire(timeout=stage_timeout(POSTGRES_POOL_ACQUIRE_TIMEOUT, "texts"))
+        except asyncio.TimeoutError:
+            pool_metrics.acquire_timeouts += 1
+            raise
+        acquired = time.perf_counter()
+        pool_metrics.record_wait(acquired - start)
+        
+        try:
+            yield conn
+        finally:
+            pool_metrics.record_checkout(time.perf_counter() - acquired)
+            await pool.release(conn)
+
+def get_pool_metrics() -> Dict[str, Any]:
+    """Pool size and wait/checkout statistics for monitoring"""
+    stats = pool_metrics.snapshot()
+    if _pool is not None:
+        stats["size"] = _pool.get_size()
+        stats["idle"] = _pool.get_idle_size()
+        stats["max_size"] = _pool.get_max_size()
+    else:
+        stats["size"] = 0
+    return stats
+
+async def get_verse_texts_from_db(verse_details: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Fetch verse texts from PostgreSQL using quran_id
     """
@@ -19,39 +197,13 @@ def get_verse_texts_from_db(verse_details: List[Dict[str, Any]]) -> List[Dict[st
         logger.warning("No valid quran_ids found")
         return []
     
-    logger.info(f"Fetching {len(quran_ids)} verses from PostgreSQL")
+    logger.debug(f"Fetching {len(quran_ids)} verses from PostgreSQL")
     
     try:
-        conn = psycopg2.connect(**POSTGRES_CONFIG)
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        query = """
-        SELECT 
-            quran_id,
-            juz_id,
-            surah_id,
-            ayah_id,
-            source,
-            transliteration,
-            surah_name_ar,
-            surah_name_ur,
-            surah_name_en,
-            surah_type,
-            text_ar,
-            text_ur,
-            text_en
-        FROM quran_ayah 
-        WHERE quran_id = ANY(%s)
-        ORDER BY array_position(%s, quran_id)
-        """
-        
-        cursor.execute(query, (quran_ids, quran_ids))
-        results = cursor.fetchall()
+        async with acquire_connection() as conn:
+            results = await conn.fetch(VERSE_QUERY, quran_ids, timeout=stage_timeout(POSTGRES_QUERY_TIMEOUT, "texts"))
         
-        cursor.close()
-        conn.close()
-        
-        logger.info(f"✅ Retrieved {len(results)} verses from PostgreSQL")
+        logger.debug(f"✅ Retrieved {len(results)} verses from PostgreSQL")
         
         # Convert to list of dicts
         verse_texts = []
@@ -62,6 +214,7 @@ def get_verse_texts_from_db(verse_details: List[Dict[str, Any]]) -> List[Dict[st
         
     except Exception as e:
         logger.error(f"PostgreSQL error: {str(e)}")
+        count_fallback("postgres")
         
         # Fallback data
         fallback_data = []
@@ -77,4 +230,33 @@ def get_verse_texts_from_db(verse_details: List[Dict[str, Any]]) -> List[Dict[st
                 "transliteration": ""
             })
         
-        return fallback_data
\ No newline at end of file
+        return fallback_data
+
+async def fetch_all_verses() -> List[Dict[str, Any]]:
+    """
+    Fetch the whole quran_ayah table ordered by quran_id (used to (re)build the verse store)
+    """
+    async with acquire_connection() as conn:
+        rows = await conn.fetch(ALL_VERSES_QUERY)
+    logger.info(f"✅ Fetched {len(rows)} verses from PostgreSQL")
+    return [dict(row) for row in rows]
+
+async def get_hadith_texts_from_db(table: str, hadith_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Fetch hadith texts from a hadith table (e.g. bukhari_hadith) by hadith_id
+    """
+    hadith_ids = [hadith_id for hadith_id in hadith_ids if hadith_id]
+    if not hadith_ids:
+        return []
+    
+    try:
+        async with acquire_connection() as conn:
+            results = await conn.fetch(
+                HADITH_QUERY.format(table=table), hadith_ids, timeout=stage_timeout(POSTGRES_QUERY_TIMEOUT, "texts")
+            )
+        logger.debug(f"✅ Retrieved {len(results)} hadith from {table}")
+        return [dict(row) for row in results]
+    except Exception as e:
+        logger.error(f"PostgreSQL error ({table}): {str(e)}")
+        count_fallback("hadith_texts")
+        return []
@@ -0,0 +1,228 @@
+import asyncio
+import math
+import time
+from functools import lru_cache
+from config.settings import (
+    HF_TOKEN,
+    LLM_TOKENIZER,
+    LLM_TOKENIZER_TRUST_REMOTE_CODE,
+    LLM_TOKENIZER_REVISION,
+    LLM_INPUT_TOKEN_BUDGET,
+    LLM_MIN_VERSE_TOKENS,
+    LLM_MAX_QUERY_TOKENS,
+    LLM_TOKEN_ESTIMATE_MARGIN
+)
+from services.logger import logger
+from services.metrics import LLM_PROMPT_TOKENS, observe, count_prompt_verses
+from typing import Any, Dict, List, Optional, Tuple
+
+# System prompt optimized for Urdu explanations
+SYSTEM_PROMPT = """آپ ایک اسلامی عالم ہیں جو قرآنی آیات کی مفصل وضاحت کرتے ہیں۔ آپ کو قرآنی آیات کا حوالہ دیا جائے گا اور صارف کا سوال۔
+
+آپ کو ہر آیت کی تفصیلی وضاحت اردو میں پیش کرنی ہے۔ وضاحت میں شامل ہونا چاہیے:
+1. آیت کا سیاق و سباق
+2. لفظی ترجمہ اور معنی
+3. تفصیلی تشریح
+4. عملی مشورے
+5. فرد اور معاشرے پر اثرات
+
+ہدایات:
+- صرف اردو زبان استعمال کریں
+- سادہ اور واضح زبان استعمال کریں
+- کم از کم 300 الفاظ کی وضاحت دیں
+- عملی مشورے اور مثالوں سے سمجھائیں"""
+
+# Answer instructions, previously at the end of the user message
+ANSWER_INSTRUCTIONS = """براہ کرم دی گئی آیات کی اردو میں تفصیلی وضاحت کریں۔ وضاحت کم از کم 300 الفاظ کی ہونی چاہیے اور درج ذیل پہلوؤں کا احاطہ کرنی چاہیے:
+1. ہر آیت کا سیاق و سباق
+2. ہر آیت کا لفظی معنی
+3. تفصیلی تشریح
+4. عملی مشورے برائے روزمرہ زندگی
+5. ان آیات سے ملنے والی کلیدی تعلیمات"""
+
+# Part of the explanation cache key: bump it whenever the prompt changes (instructions, verse
+# blocks, budget rules) so explanations from the old prompt stop being served
+PROMPT_VERSION = 2
+
+# Everything that does not depend on the request, built once: byte-identical on every call, so a
+# provider-side prefix cache can reuse it. Only the user message (question + verses) varies.
+SYSTEM_MESSAGE = f"{SYSTEM_PROMPT}\n\n{ANSWER_INSTRUCTIONS}"
+
+# Chat template tokens around each message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Without the tokenizer: UTF-8 bytes per token until the provider's counts calibrate it, on the
+# low side so estimates stay under the budget
+ESTIMATE_BYTES_PER_TOKEN = 3.0
+# Weight of each new provider count in the calibrated bytes per token (moving average)
+CALIBRATION_WEIGHT = 0.1
+ELLIPSIS = " …"
+
+class PromptTokenizer:
+    """
+    Counts and truncates text in the LLM's tokens. Uses the model's Hugging Face tokenizer when
+    transformers is installed and it loads; otherwise estimates from the UTF-8 length, at a
+    bytes per token calibrated against the provider's usage.prompt_tokens (see calibrate).
+    """
+
+    def __init__(self, name: str, trust_remote_code: bool, revision: Optional[str] = None):
+        self.name = name
+        self.trust_remote_code = trust_remote_code
+        self.revision = revision
+        self.tokenizer = None
+        self.measured_bytes_per_token = None
+        self.bytes_per_token = ESTIMATE_BYTES_PER_TOKEN
+        self.calibrations = 0
+
+    @property
+    def mode(self) -> str:
+        if self.tokenizer is not None:
+            return "tokenizer"
+        return "calibrated_estimate" if self.calibrations else "estimate"
+
+    def load(self):
+        """Load the tokenizer (blocking; run off the event loop). Failures leave the estimate in place."""
+        if not self.name:
+            logger.info("Prompt tokens are estimated from text length (no LLM_TOKENIZER)")
+            return
+        if self.trust_remote_code and not self.revision:
+            logger.warning("⚠️ Not running remote tokenizer code without a pinned LLM_TOKENIZER_REVISION, "
+                           "prompt tokens are estimated from text length")
+            return
+        try:
+            from transformers import AutoTokenizer
+        except ImportError:
+            logger.warning("⚠️ transformers not installed, prompt tokens are estimated from text length")
+            return
+        try:
+            start = time.perf_counter()
+            self.tokenizer = AutoTokenizer.from_pretrained(
+                self.name, trust_remote_code=self.trust_remote_code, revision=self.revision, token=HF_TOKEN or None
+            )
+            _count.cache_clear()
+            logger.info(f"✅ Prompt tokenizer {self.name} loaded in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load prompt tokenizer {self.name}, estimating from text length: {e}")
+
+    def encode(self, text: str) -> List[int]:
+        return self.tokenizer.encode(text, add_special_tokens=False)
+
+    def count(self, text: str) -> int:
+        if self.tokenizer is not None:
+            return _count(text)
+        return math.ceil(len(text.encode("utf-8")) / self.bytes_per_token)
+
+    def calibrate(self, messages: List[Dict[str, str]], provider_tokens: int):
+        """Fit the estimate's bytes per token to a prompt's token count as reported by the provider"""
+        text_tokens = provider_tokens - len(messages) * MESSAGE_OVERHEAD_TOKENS
+        if self.tokenizer is not None or text_tokens <= 0:
+            return
+        measured = sum(len(message["content"].encode("utf-8")) for message in messages) / text_tokens
+        if self.measured_bytes_per_token is None:
+            self.measured_bytes_per_token = measured
+            logger.info(f"📏 Prompt token estimate calibrated from provider usage: {measured:.2f} bytes per token")
+        else:
+            self.measured_bytes_per_token += CALIBRATION_WEIGHT * (measured - self.measured_bytes_per_token)
+        self.calibrations += 1
+        self.bytes_per_token = self.measured_bytes_per_token * (1 - LLM_TOKEN_ESTIMATE_MARGIN)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "tokenizer": self.name if self.tokenizer is not None else None,
+            "bytes_per_token": None if self.tokenizer is not None else round(self.bytes_per_token, 3),
+            "calibrations": self.calibrations
+        }
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most max_tokens (at a word boundary when possible), marked with an ellipsis"""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        budget = max(max_tokens - self.count(ELLIPSIS), 1)
+        if self.tokenizer is not None:
+            cut = self.tokenizer.decode(self.encode(text)[:budget])
+        else:
+            cut = text.encode("utf-8")[:int(budget * self.bytes_per_token)].decode("utf-8", errors="ignore")
+        space = cut.rfind(" ")
+        if space > len(cut) // 2:
+            cut = cut[:space]
+        return cut.rstrip() + ELLIPSIS
+
+@lru_cache(maxsize=16384)
+def _count(text: str) -> int:
+    # Verse texts repeat across requests, so tokenizer counts are cached
+    return len(prompt_tokenizer.encode(text))
+
+prompt_tokenizer = PromptTokenizer(LLM_TOKENIZER, LLM_TOKENIZER_TRUST_REMOTE_CODE, LLM_TOKENIZER_REVISION)
+
+async def init_prompt_tokenizer():
+    """Load the LLM tokenizer (called at app startup)"""
+    await asyncio.to_thread(prompt_tokenizer.load)
+
+def _verse_block(rank: int, verse_id, arabic: str, urdu: str) -> str:
+    return f"آیت {rank} (آیت ID: {verse_id}):\nعربی متن: {arabic}\nاردو ترجمہ: {urdu}\n"
+
+def build_messages(
+    query: str,
+    arabic_texts: List[str],
+    urdu_texts: List[str],
+    verse_ids: List[int],
+    budget: int = LLM_INPUT_TOKEN_BUDGET
+) -> Tuple[List[Dict[str, str]], int]:
+    """
+    Chat messages for an explanation within budget prompt tokens, plus their token count.
+
+    Verses come in rank order and are added while they fit. The first one that does not fit is
+    truncated (Arabic and Urdu cut evenly) if at least LLM_MIN_VERSE_TOKENS of it fits, otherwise
+    dropped; every lower-ranked verse is dropped. The top verse is always kept, truncated if needed.
+    """
+    query = prompt_tokenizer.truncate(query, LLM_MAX_QUERY_TOKENS)
+    head = f"سوال: {query}\n\nمتعلقہ قرآنی آیات:\n"
+    tail = "\nوضاحت:"
+    used = (
+        prompt_tokenizer.count(SYSTEM_MESSAGE) + prompt_tokenizer.count(head) + prompt_tokenizer.count(tail)
+        + 2 * MESSAGE_OVERHEAD_TOKENS
+    )
+
+    blocks = []
+    kept = truncated = 0
+    verses = list(zip(arabic_texts, urdu_texts))
+    for i, (arabic, urdu) in enumerate(verses):
+        block = _verse_block(i + 1, verse_ids[i], arabic, urdu)
+        cost = prompt_tokenizer.count(block)
+        remaining = budget - used
+        if cost <= remaining:
+            blocks.append(block)
+            used += cost
+            kept += 1
+            continue
+
+        # Room for verse text once the block's own frame (rank, id, labels) is paid for
+        room = remaining - prompt_tokenizer.count(_verse_block(i + 1, verse_ids[i], "", ""))
+        if room >= LLM_MIN_VERSE_TOKENS or not blocks:
+            share = (room if blocks else max(room, 2 * LLM_MIN_VERSE_TOKENS)) // 2
+            block = _verse_block(
+                i + 1, verse_ids[i], prompt_tokenizer.truncate(arabic, share), prompt_tokenizer.truncate(urdu, share)
+            )
+            cost = prompt_tokenizer.count(block)
+            # Only the top verse may go over the budget
+            if cost <= remaining or not blocks:
+                blocks.append(block)
+                used += cost
+                truncated += 1
+        break
+
+    dropped = len(verses) - kept - truncated
+    count_prompt_verses("kept", kept)
+    count_prompt_verses("truncated", truncated)
+    count_prompt_verses("dropped", dropped)
+    observe(LLM_PROMPT_TOKENS, used, source="counted")
+    if truncated or dropped:
+        logger.debug(f"✂️ Prompt budget {budget}: {kept} verses kept, {truncated} truncated, {dropped} dropped")
+
+    messages = [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": head + "\n".join(blocks) + tail}
+    ]
+    return messages, used
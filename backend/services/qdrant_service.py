@@ -1,56 +1,197 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import SparseVector
-from config.settings import QDRANT_URL, QDRANT_DENSE_COLLECTION, QDRANT_SPARSE_COLLECTION
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import SparseVector, Prefetch, FusionQuery, Fusion, QueryRequest, SearchParams, QuantizationSearchParams
+from config.settings import (
+    QDRANT_URL,
+    QDRANT_DENSE_COLLECTION,
+    QDRANT_SPARSE_COLLECTION,
+    QDRANT_COLLECTION,
+    QDRANT_COLLECTION_LAYOUT,
+    QDRANT_ALIAS_REFRESH_SECONDS,
+    QDRANT_HNSW_EF,
+    QDRANT_QUANTIZATION_RESCORE,
+    QDRANT_QUANTIZATION_OVERSAMPLING,
+    QDRANT_SEARCH_TIMEOUT,
+    QDRANT_BATCH_SEARCH_TIMEOUT,
+    SEARCH_FUSION,
+    FUSION_DENSE_WEIGHT,
+    FUSION_SPARSE_WEIGHT,
+    RRF_K,
+    SEARCH_CANDIDATE_MULTIPLIER,
+    VERSE_TEXT_SOURCE
+)
+from services.fusion import reciprocal_rank_fusion, weighted_score_fusion
+from services.search_filters import qdrant_filter
+from services.metrics import QDRANT_LEG_SECONDS, timed, count_fallback
+from services.resilience import circuit_breaker, within_deadline
 from services.logger import logger
+import asyncio
 import traceback
 
+# Payload fields read from the hits (with_payload is narrowed to these)
+VERSE_PAYLOAD_FIELDS = ["quran_id", "surah_id", "ayah_id", "juz_id", "surah_type"]
+VERSE_TEXT_FIELDS = ["text_ar", "text_ur", "text_en", "surah_name_ar", "surah_name_ur", "surah_name_en", "transliteration"]
+HADITH_PAYLOAD_FIELDS = ["hadith_id", "book_id", "chapter_id", "book", "status"]
+
 class HybridQdrantService:
-    def __init__(self):
-        self.client = QdrantClient(url=QDRANT_URL, timeout=30)
-        self.dense_collection = QDRANT_DENSE_COLLECTION
-        self.sparse_collection = QDRANT_SPARSE_COLLECTION
+    def __init__(self, collection=QDRANT_COLLECTION, layout=QDRANT_COLLECTION_LAYOUT, payload_fields=None):
+        self.client = AsyncQdrantClient(url=QDRANT_URL, timeout=30)
+        self.collection = collection   # single named-vector collection or alias
+        self.layout = layout
+        if self.layout == "single":
+            self._use_single_collection(collection)
+        else:
+            self.dense_collection = QDRANT_DENSE_COLLECTION
+            self.sparse_collection = QDRANT_SPARSE_COLLECTION
+            self.dense_using = None
+        self._alias_task = None
+        # Searches fail fast (CircuitOpenError) after repeated errors or timeouts on this collection
+        self.breaker = circuit_breaker(f"qdrant:{collection}", "qdrant")
+        # Payload returned with each hit: the listed fields only, or everything when None
+        self.with_payload = list(payload_fields) if payload_fields else True
+        # Dense leg: HNSW ef and rescoring of quantized candidates with the original vectors
+        self.search_params = SearchParams(
+            hnsw_ef=QDRANT_HNSW_EF,
+            quantization=QuantizationSearchParams(
+                rescore=QDRANT_QUANTIZATION_RESCORE,
+                oversampling=QDRANT_QUANTIZATION_OVERSAMPLING
+            )
+        )
         
         logger.info(f"✅ Hybrid Qdrant initialized")
         logger.info(f"  Dense: {self.dense_collection}")
         logger.info(f"  Sparse: {self.sparse_collection}")
-        
-        # Verify collections
-        self._verify_collections()
     
-    def _verify_collections(self):
-        """Verify both collections exist"""
+    async def initialize(self):
+        """Verify collections once the event loop is running (called at app startup)"""
+        await self._verify_collections()
+        if self.layout == "single" and QDRANT_ALIAS_REFRESH_SECONDS > 0:
+            self._alias_task = asyncio.create_task(self._poll_alias())
+    
+    async def close(self):
+        """Close the underlying async client"""
+        if self._alias_task is not None:
+            self._alias_task.cancel()
+            self._alias_task = None
+        await self.client.close()
+    
+    async def _resolve_collection(self, name):
+        """Collection behind name when it is an alias (versioned builds), else name itself"""
+        try:
+            response = await self.client.get_aliases()
+            for description in response.aliases:
+                if description.alias_name == name:
+                    return description.collection_name
+        except Exception as e:
+            logger.warning(f"Alias lookup for {name} failed: {e}")
+        return name
+    
+    async def refresh_alias(self):
+        """Re-resolve self.collection and follow it to a newly swapped (or rolled back) build"""
+        if self.layout != "single":
+            return None
+        target = await self._resolve_collection(self.collection)
+        if target != self.dense_collection:
+            logger.info(f"🔁 Qdrant alias {self.collection} -> {target} (was {self.dense_collection})")
+            self._use_single_collection(target)
+        return target
+    
+    async def _poll_alias(self):
+        while True:
+            await asyncio.sleep(QDRANT_ALIAS_REFRESH_SECONDS)
+            try:
+                await self.refresh_alias()
+            except Exception as e:
+                logger.warning(f"Qdrant alias refresh failed: {e}")
+    
+    def _use_single_collection(self, collection):
+        """Both legs query named vectors of one collection"""
+        self.layout = "single"
+        self.dense_collection = collection
+        self.sparse_collection = collection
+        self.dense_using = "dense"
+    
+    async def _detect_layout(self):
+        """Pick the single named-vector collection (or alias target) when it exists with both vector types"""
+        try:
+            collection = await self._resolve_collection(self.collection)
+            if not await self.client.collection_exists(collection):
+                return
+            info = await self.client.get_collection(collection)
+            params = info.config.params
+            dense_named = isinstance(params.vectors, dict) and "dense" in params.vectors
+            sparse_named = "sparse" in (params.sparse_vectors or {})
+            if dense_named and sparse_named:
+                self._use_single_collection(collection)
+            else:
+                logger.warning(f"{self.collection} lacks named dense/sparse vectors, keeping split collections")
+        except Exception as e:
+            logger.error(f"Collection layout detection error: {e}")
+    
+    async def _verify_collections(self):
+        """Detect the collection layout (when set to auto) and verify the collections exist"""
+        if self.layout == "auto":
+            await self._detect_layout()
+            if self.layout == "auto":
+                self.layout = "split"
+        elif self.layout == "single":
+            await self.refresh_alias()
+        logger.info(f"Qdrant layout: {self.layout} ({self.dense_collection}, {self.sparse_collection})")
         try:
-            for col_name in [self.dense_collection, self.sparse_collection]:
-                info = self.client.get_collection(col_name)
+            for col_name in dict.fromkeys([self.dense_collection, self.sparse_collection]):
+                info = await self.client.get_collection(col_name)
                 logger.info(f"✓ {col_name}: {info.points_count} points")
         except Exception as e:
             logger.error(f"Collection verification error: {e}")
     
-    def hybrid_search(self, embeddings, top_k=5):
+    async def hybrid_search(self, embeddings, top_k=5, fusion=None, dense_weight=None, sparse_weight=None, filters=None):
         """
-        Perform hybrid search using both dense and sparse vectors
+        Perform hybrid search using both dense and sparse vectors.
+        
+        fusion: "rrf" (weighted reciprocal rank fusion), "weighted" (min-max normalized
+        score fusion) or "server" (Qdrant prefetch + RRF in one round trip; needs both
+        vectors in one collection). Defaults come from settings.
+        filters: {payload field: allowed values} (services.search_filters), applied
+        inside Qdrant on both legs.
         """
+        fusion = fusion or SEARCH_FUSION
+        query_filter = qdrant_filter(filters)
+        weights = [
+            FUSION_DENSE_WEIGHT if dense_weight is None else dense_weight,
+            FUSION_SPARSE_WEIGHT if sparse_weight is None else sparse_weight
+        ]
+        candidates = top_k * SEARCH_CANDIDATE_MULTIPLIER
+        
         try:
             dense_vector = embeddings["dense"]
             sparse_indices = embeddings["sparse"]["indices"]
             sparse_values = embeddings["sparse"]["values"]
             
-            logger.info(f"🔍 Hybrid search: dense={len(dense_vector)} dim, sparse={len(sparse_indices)} indices")
+            logger.debug(f"🔍 Hybrid search ({fusion}): dense={len(dense_vector)} dim, sparse={len(sparse_indices)} indices")
             
-            # 1. Search dense collection
-            logger.info("Searching dense collection...")
-            dense_results = self._search_dense(dense_vector, top_k * 2)
+            if fusion == "server":
+                if self.layout == "single":
+                    return await self._search_server_fusion(dense_vector, sparse_indices, sparse_values, top_k, candidates, query_filter)
+                logger.warning("Server-side fusion needs a single named-vector collection, using rrf")
+                fusion = "rrf"
             
-            # 2. Search sparse collection (if sparse data exists)
-            sparse_results = []
-            if sparse_indices and len(sparse_indices) > 0:
-                logger.info("Searching sparse collection...")
-                sparse_results = self._search_sparse(sparse_indices, sparse_values, top_k * 2)
+            # 1. Dense and sparse legs: one batched request (single collection) or two concurrent ones
+            if sparse_indices and len(sparse_indices) > 0 and self.layout == "single":
+                dense_results, sparse_results = await self._search_batched(dense_vector, sparse_indices, sparse_values, candidates, query_filter)
+            elif sparse_indices and len(sparse_indices) > 0:
+                dense_results, sparse_results = await asyncio.gather(
+                    self._search_dense(dense_vector, candidates, query_filter),
+                    self._search_sparse(sparse_indices, sparse_values, candidates, query_filter)
+                )
+            else:
+                dense_results, sparse_results = await self._search_dense(dense_vector, candidates, query_filter), []
             
-            # 3. Combine results
-            combined_results = self._combine_results(dense_results, sparse_results, top_k)
+            # 2. Fuse
+            if fusion == "weighted":
+                combined_results = weighted_score_fusion([dense_results, sparse_results], weights, top_k)
+            else:
+                combined_results = reciprocal_rank_fusion([dense_results, sparse_results], weights, top_k, RRF_K)
             
-            logger.info(f"✅ Found {len(combined_results)} combined results")
+            logger.debug(f"✅ Found {len(combined_results)} combined results")
             return combined_results
             
         except Exception as e:
@@ -58,78 +199,208 @@ class HybridQdrantService:
             logger.error(f"Traceback: {traceback.format_exc()}")
             
             # Fallback to dense-only
+            count_fallback("dense_only")
             try:
                 logger.info("Trying dense-only fallback...")
-                return self._search_dense(embeddings["dense"], top_k)
+                return await self._search_dense(embeddings["dense"], top_k, qdrant_filter(filters))
             except Exception as e2:
                 logger.error(f"Dense fallback also failed: {e2}")
                 raise
     
-    def _search_dense(self, dense_vector, limit):
-        """Search dense collection"""
-        try:
-            # Use query_points for Qdrant v1.9.0
-            search_result = self.client.query_points(
+    async def _search_batched(self, dense_vector, sparse_indices, sparse_values, limit, query_filter=None):
+        """Dense and sparse legs against the single collection in one query_batch_points call"""
+        with timed(QDRANT_LEG_SECONDS, collection=self.collection, leg="batched"):
+            responses = await self.client.query_batch_points(
                 collection_name=self.dense_collection,
-                query=dense_vector,
-                limit=limit,
-                with_payload=True
+                requests=[
+                    QueryRequest(query=dense_vector, using="dense", filter=query_filter, params=self.search_params, limit=limit, with_payload=self.with_payload),
+                    QueryRequest(
+                        query=SparseVector(indices=sparse_indices, values=sparse_values),
+                        using="sparse",
+                        filter=query_filter,
+                        limit=limit,
+                        with_payload=self.with_payload
+                    )
+                ]
             )
-            logger.info(f"Dense search returned {len(search_result.points)} points")
+        dense_response, sparse_response = responses
+        logger.debug(f"Batched search returned {len(dense_response.points)} dense, {len(sparse_response.points)} sparse points")
+        return dense_response.points, sparse_response.points
+    
+    def _server_prefetch(self, dense_vector, sparse_indices, sparse_values, candidates, query_filter=None):
+        prefetch = [Prefetch(query=dense_vector, using="dense", filter=query_filter, params=self.search_params, limit=candidates)]
+        if sparse_indices:
+            prefetch.append(Prefetch(
+                query=SparseVector(indices=sparse_indices, values=sparse_values),
+                using="sparse",
+                filter=query_filter,
+                limit=candidates
+            ))
+        return prefetch
+    
+    async def _search_server_fusion(self, dense_vector, sparse_indices, sparse_values, top_k, candidates, query_filter=None):
+        """Both legs as prefetches of one query, fused with RRF inside Qdrant"""
+        with timed(QDRANT_LEG_SECONDS, collection=self.collection, leg="server"):
+            search_result = await self.client.query_points(
+                collection_name=self.dense_collection,
+                prefetch=self._server_prefetch(dense_vector, sparse_indices, sparse_values, candidates, query_filter),
+                query=FusionQuery(fusion=Fusion.RRF),
+                limit=top_k,
+                with_payload=self.with_payload
+            )
+        logger.debug(f"Server-side fusion returned {len(search_result.points)} points")
+        return search_result.points
+    
+    async def _search_dense(self, dense_vector, limit, query_filter=None):
+        """Search dense collection"""
+        try:
+            with timed(QDRANT_LEG_SECONDS, collection=self.collection, leg="dense"):
+                search_result = await self.client.query_points(
+                    collection_name=self.dense_collection,
+                    query=dense_vector,
+                    using=self.dense_using,
+                    query_filter=query_filter,
+                    search_params=self.search_params,
+                    limit=limit,
+                    with_payload=self.with_payload
+                )
+            logger.debug(f"Dense search returned {len(search_result.points)} points")
             return search_result.points
         except Exception as e:
             logger.error(f"Dense search error: {e}")
             raise
     
-    def _search_sparse(self, indices, values, limit):
+    async def _search_sparse(self, indices, values, limit, query_filter=None):
         """Search sparse collection"""
         try:
             sparse_vector = SparseVector(indices=indices, values=values)
             
-            # Try with named vector approach
-            search_result = self.client.query_points(
-                collection_name=self.sparse_collection,
-                query={"name": "sparse", "vector": sparse_vector},
-                limit=limit,
-                with_payload=True
-            )
-            logger.info(f"Sparse search returned {len(search_result.points)} points")
+            with timed(QDRANT_LEG_SECONDS, collection=self.collection, leg="sparse"):
+                search_result = await self.client.query_points(
+                    collection_name=self.sparse_collection,
+                    query=sparse_vector,
+                    using="sparse",
+                    query_filter=query_filter,
+                    limit=limit,
+                    with_payload=self.with_payload
+                )
+            logger.debug(f"Sparse search returned {len(search_result.points)} points")
             return search_result.points
             
         except Exception as e:
             logger.warning(f"Sparse search failed: {e}")
             return []
     
-    def _combine_results(self, dense_results, sparse_results, top_k):
+    async def search(self, embeddings, top_k=5, **options):
+        """Main search method (options: fusion, dense_weight, sparse_weight, filters)"""
+        with self.breaker.guard():
+            return await within_deadline(self.hybrid_search(embeddings, top_k, **options), QDRANT_SEARCH_TIMEOUT, "search")
+    
+    async def search_batch(self, embeddings_list, top_k=5, **options):
         """
-        Simple combination: prefer dense results, add sparse if unique
+        hybrid_search for several queries with one query_batch_points call per collection;
+        results come back in query order. Falls back to one hybrid_search per query on error.
         """
-        from collections import OrderedDict
-        
-        # Start with dense results
-        combined = OrderedDict()
-        for point in dense_results:
-            combined[point.id] = point
-        
-        # Add unique sparse results
-        if sparse_results:
-            for point in sparse_results:
-                if point.id not in combined:
-                    combined[point.id] = point
-        
-        # Convert to list and take top_k
-        results_list = list(combined.values())[:top_k]
+        with self.breaker.guard():
+            return await within_deadline(
+                self._search_batch(embeddings_list, top_k, **options), QDRANT_BATCH_SEARCH_TIMEOUT, "search"
+            )
+    
+    async def _search_batch(self, embeddings_list, top_k=5, fusion=None, dense_weight=None, sparse_weight=None, filters=None):
+        fusion = fusion or SEARCH_FUSION
+        weights = [
+            FUSION_DENSE_WEIGHT if dense_weight is None else dense_weight,
+            FUSION_SPARSE_WEIGHT if sparse_weight is None else sparse_weight
+        ]
+        candidates = top_k * SEARCH_CANDIDATE_MULTIPLIER
+        query_filter = qdrant_filter(filters)
+        if fusion == "server" and self.layout != "single":
+            logger.warning("Server-side fusion needs a single named-vector collection, using rrf")
+            fusion = "rrf"
         
-        # Ensure each result has score attribute
-        for i, point in enumerate(results_list):
-            if not hasattr(point, 'score'):
-                point.score = 1.0 - (i * 0.01)  # Assign dummy score
+        try:
+            if fusion == "server":
+                responses = await self.client.query_batch_points(
+                    collection_name=self.dense_collection,
+                    requests=[
+                        QueryRequest(
+                            prefetch=self._server_prefetch(
+                                e["dense"], e["sparse"]["indices"], e["sparse"]["values"], candidates, query_filter
+                            ),
+                            query=FusionQuery(fusion=Fusion.RRF),
+                            limit=top_k,
+                            with_payload=self.with_payload
+                        )
+                        for e in embeddings_list
+                    ]
+                )
+                logger.debug(f"🔍 Batch search ({fusion}): {len(embeddings_list)} queries in one request")
+                return [response.points for response in responses]
+            
+            dense_requests = [
+                QueryRequest(query=e["dense"], using=self.dense_using, filter=query_filter, params=self.search_params, limit=candidates, with_payload=self.with_payload)
+                for e in embeddings_list
+            ]
+            sparse_rows = [i for i, e in enumerate(embeddings_list) if e["sparse"]["indices"]]
+            sparse_requests = [
+                QueryRequest(
+                    query=SparseVector(
+                        indices=embeddings_list[i]["sparse"]["indices"],
+                        values=embeddings_list[i]["sparse"]["values"]
+                    ),
+                    using="sparse",
+                    filter=query_filter,
+                    limit=candidates,
+                    with_payload=self.with_payload
+                )
+                for i in sparse_rows
+            ]
+            
+            if self.layout == "single":
+                responses = await self.client.query_batch_points(
+                    collection_name=self.dense_collection,
+                    requests=dense_requests + sparse_requests
+                )
+                dense_responses, sparse_responses = responses[:len(dense_requests)], responses[len(dense_requests):]
+            else:
+                dense_responses, sparse_responses = await asyncio.gather(
+                    self.client.query_batch_points(collection_name=self.dense_collection, requests=dense_requests),
+                    self._search_sparse_batch(sparse_requests)
+                )
+            
+            sparse_results = [[] for _ in embeddings_list]
+            for i, response in zip(sparse_rows, sparse_responses):
+                sparse_results[i] = response.points
+            
+            logger.debug(f"🔍 Batch search ({fusion}): {len(embeddings_list)} queries, {len(sparse_rows)} with sparse vectors")
+            if fusion == "weighted":
+                return [
+                    weighted_score_fusion([dense.points, sparse], weights, top_k)
+                    for dense, sparse in zip(dense_responses, sparse_results)
+                ]
+            return [
+                reciprocal_rank_fusion([dense.points, sparse], weights, top_k, RRF_K)
+                for dense, sparse in zip(dense_responses, sparse_results)
+            ]
         
-        return results_list
+        except Exception as e:
+            logger.error(f"Batch search error: {e}, searching queries one by one")
+            return await asyncio.gather(*(
+                self.hybrid_search(embeddings, top_k, fusion, dense_weight, sparse_weight, filters)
+                for embeddings in embeddings_list
+            ))
     
-    def search(self, embeddings, top_k=5):
-        """Main search method"""
-        return self.hybrid_search(embeddings, top_k)
+    async def _search_sparse_batch(self, requests):
+        """Sparse leg of a split-layout batch; like _search_sparse, a failure only drops the leg"""
+        if not requests:
+            return []
+        try:
+            return await self.client.query_batch_points(collection_name=self.sparse_collection, requests=requests)
+        except Exception as e:
+            logger.warning(f"Sparse batch search failed: {e}")
+            return []
 
 # Initialize service
-qdrant_service = HybridQdrantService()
\ No newline at end of file
+qdrant_service = HybridQdrantService(
+    payload_fields=VERSE_PAYLOAD_FIELDS + (VERSE_TEXT_FIELDS if VERSE_TEXT_SOURCE == "payload" else [])
+)
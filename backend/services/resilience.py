@@ -0,0 +1,197 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from config.settings import (
+    REQUEST_DEADLINES,
+    DEADLINE_MIN_STAGE_SECONDS,
+    CIRCUIT_BREAKERS_ENABLED,
+    CIRCUIT_BREAKERS
+)
+from services.logger import logger
+from services.metrics import CIRCUIT_STATE, CIRCUIT_REJECTED, DEADLINE_EXCEEDED, count, set_gauge
+from typing import Any, Callable, Dict, Optional
+
+# Request deadline (time.monotonic()), set once per HTTP request by api.middleware.RequestContextMiddleware
+deadline_var: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request deadline ran out before (or during) a stage; handled like any other timeout"""
+
+def request_deadline(path: str) -> float:
+    """Deadline budget in seconds for a request path"""
+    return REQUEST_DEADLINES.get(path, REQUEST_DEADLINES["default"])
+
+def start_deadline(seconds: Optional[float]):
+    return deadline_var.set(time.monotonic() + seconds if seconds else None)
+
+def end_deadline(token):
+    deadline_var.reset(token)
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline (None outside a request)"""
+    deadline = deadline_var.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def stage_timeout(timeout: float, stage: str) -> float:
+    """
+    Timeout for one stage: its own timeout capped by what is left of the request deadline.
+    Raises DeadlineExceeded when less than DEADLINE_MIN_STAGE_SECONDS is left.
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left < DEADLINE_MIN_STAGE_SECONDS:
+        count(DEADLINE_EXCEEDED, stage=stage)
+        raise DeadlineExceeded(f"Request deadline exceeded before {stage}")
+    return min(timeout, left)
+
+async def within_deadline(awaitable, timeout: float, stage: str):
+    """await awaitable under stage_timeout(timeout, stage); DeadlineExceeded when the deadline cut it short"""
+    limit = stage_timeout(timeout, stage)
+    try:
+        return await asyncio.wait_for(awaitable, limit)
+    except asyncio.TimeoutError:
+        if limit < timeout:
+            count(DEADLINE_EXCEEDED, stage=stage)
+            raise DeadlineExceeded(f"Request deadline exceeded during {stage}")
+        raise
+
+def _out_of_time(error: BaseException) -> bool:
+    """
+    Whether error is the request deadline's doing: DeadlineExceeded, or a timeout capped by
+    stage_timeout (e.g. asyncpg's timeout=) that fired with the deadline spent
+    """
+    if isinstance(error, DeadlineExceeded):
+        return True
+    left = remaining()
+    return isinstance(error, asyncio.TimeoutError) and left is not None and left < DEADLINE_MIN_STAGE_SECONDS
+
+class CircuitOpenError(Exception):
+    """Call refused without trying: the upstream's circuit is open"""
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. Closed: calls go through and failures are counted.
+    After failure_threshold failures in a row it opens and refuses calls (CircuitOpenError)
+    for reset_seconds, then half-opens: one probe call goes through, and its success closes
+    the circuit while its failure opens it again.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float, enabled: bool = True):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.enabled = enabled
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.rejected = 0
+        self.trips = 0
+        set_gauge(CIRCUIT_STATE, 0, breaker=name)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"⚡ Circuit {self.name}: {self.state} -> {state}")
+            self.state = state
+            set_gauge(CIRCUIT_STATE, self.STATE_VALUES[state], breaker=self.name)
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        if not self.enabled or self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN and not self.probing:
+            self.probing = True
+            return
+        self.rejected += 1
+        count(CIRCUIT_REJECTED, breaker=self.name)
+        raise CircuitOpenError(f"Circuit {self.name} is open")
+
+    def record_success(self):
+        self.failures = 0
+        self.probing = False
+        self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    @contextmanager
+    def guard(self, is_failure: Optional[Callable[[BaseException], bool]] = None):
+        """
+        Run the block as one call through the breaker. Exceptions (timeouts included) count as
+        failures unless is_failure says otherwise. A block cancelled (client gone, an outer
+        timeout) or cut short by the request deadline says nothing about the upstream and is not
+        recorded, so put the call's own timeout inside the block.
+        """
+        self.allow()
+        try:
+            yield
+        except Exception as e:
+            if _out_of_time(e):
+                # The request ran out of time, possibly in earlier stages: neither success nor failure
+                self.probing = False
+            elif is_failure is None or is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        except BaseException:
+            self.probing = False
+            raise
+        self.record_success()
+
+    def reset(self):
+        """Back to closed with no failures counted"""
+        self.failures = 0
+        self.probing = False
+        self._set_state(self.CLOSED)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips, "rejected": self.rejected}
+
+# One breaker per upstream (Qdrant: per collection), created on first use
+breakers: Dict[str, CircuitBreaker] = {}
+
+def circuit_breaker(name: str, kind: Optional[str] = None) -> CircuitBreaker:
+    """The breaker called name, configured from CIRCUIT_BREAKERS[kind or name]"""
+    breaker = breakers.get(name)
+    if breaker is None:
+        config = CIRCUIT_BREAKERS[kind or name]
+        breaker = breakers[name] = CircuitBreaker(
+            name, config["failures"], config["reset_seconds"], enabled=CIRCUIT_BREAKERS_ENABLED
+        )
+    return breaker
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: breaker.stats() for name, breaker in breakers.items()}
+
+class RollingPercentile:
+    """Percentile of the last `size` values (e.g. recent LLM call latencies)"""
+
+    def __init__(self, size: int = 200):
+        self.values = deque(maxlen=size)
+
+    def add(self, value: float):
+        self.values.append(value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.values:
+            return None
+        ordered = sorted(self.values)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
@@ -0,0 +1,27 @@
+from qdrant_client.models import Filter, FieldCondition, MatchAny
+from typing import Any, Dict, List, Optional
+
+# Request field -> Quran payload field (payload-indexed by quran_qdrant_ingestion.py)
+FILTER_FIELDS = {
+    "surah_ids": "surah_id",
+    "juz_ids": "juz_id",
+    "surah_type": "surah_type"
+}
+
+def request_filters(query) -> Optional[Dict[str, List[Any]]]:
+    """Filter fields set on a Query / BatchQuery as {payload field: allowed values}, or None"""
+    filters = {}
+    for field, payload_field in FILTER_FIELDS.items():
+        value = getattr(query, field, None)
+        if value:
+            filters[payload_field] = list(value) if isinstance(value, list) else [value]
+    return filters or None
+
+def qdrant_filter(filters: Optional[Dict[str, List[Any]]]) -> Optional[Filter]:
+    """Qdrant Filter matching every field (any of its values), or None when unfiltered"""
+    if not filters:
+        return None
+    return Filter(must=[
+        FieldCondition(key=field, match=MatchAny(any=values))
+        for field, values in filters.items()
+    ])
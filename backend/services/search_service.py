@@ -0,0 +1,6 @@
+from config.settings import SEARCH_ENGINE
+from services.local_search import local_search_service
+from services.qdrant_service import qdrant_service
+
+# Engine used for Quran search: in-process exact search or Qdrant
+search_service = local_search_service if SEARCH_ENGINE == "local" else qdrant_service
@@ -0,0 +1,177 @@
+import os
+import pickle
+import sys
+from array import array
+from config.settings import VERSE_STORE_ENABLED, VERSE_STORE_PATH, VERSE_STORE_VERSION
+from services.logger import logger
+from services.postgres_service import get_verse_texts_from_db, fetch_all_verses
+from typing import List, Dict, Any, Optional, Iterable
+
+TEXT_FIELDS = ("text_ar", "text_ur", "text_en")
+SURAH_FIELDS = ("source", "transliteration", "surah_name_ar", "surah_name_ur", "surah_name_en", "surah_type")
+
+class VerseStore:
+    """
+    Read-only, array-backed copy of the quran_ayah table indexed by quran_id.
+
+    Numeric columns live in typed arrays, the per-surah strings are interned once
+    per surah, and each text column is one contiguous UTF-8 buffer plus an offsets
+    array, so ~6k verses cost a few MB and no per-verse Python objects.
+    """
+
+    def __init__(self, version: int):
+        self.version = version
+        self.quran_ids = array("I")
+        self.juz_ids = array("H")
+        self.surah_ids = array("H")
+        self.ayah_ids = array("H")
+        self.surah_refs = array("H")       # row -> index into surah_table
+        self.surah_table: List[tuple] = []  # interned SURAH_FIELDS tuples
+        self.text_buffers: Dict[str, bytes] = {}
+        self.text_offsets: Dict[str, array] = {}
+        self.row_of = array("i")           # quran_id -> row, -1 when absent
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]], version: int) -> "VerseStore":
+        """Build the store from quran_ayah rows (dicts with the VERSE_QUERY columns)"""
+        store = cls(version)
+        surah_index: Dict[tuple, int] = {}
+        buffers = {field: bytearray() for field in TEXT_FIELDS}
+        offsets = {field: array("I", [0]) for field in TEXT_FIELDS}
+
+        for row in sorted(rows, key=lambda r: r["quran_id"]):
+            store.quran_ids.append(row["quran_id"])
+            store.juz_ids.append(row.get("juz_id") or 0)
+            store.surah_ids.append(row.get("surah_id") or 0)
+            store.ayah_ids.append(row.get("ayah_id") or 0)
+
+            surah_key = tuple(sys.intern(row.get(field) or "") for field in SURAH_FIELDS)
+            if surah_key not in surah_index:
+                surah_index[surah_key] = len(store.surah_table)
+                store.surah_table.append(surah_key)
+            store.surah_refs.append(surah_index[surah_key])
+
+            for field in TEXT_FIELDS:
+                buffers[field] += (row.get(field) or "").encode("utf-8")
+                offsets[field].append(len(buffers[field]))
+
+        store.text_buffers = {field: bytes(buf) for field, buf in buffers.items()}
+        store.text_offsets = offsets
+        store._build_index()
+        return store
+
+    def _build_index(self):
+        max_id = max(self.quran_ids) if self.quran_ids else 0
+        self.row_of = array("i", [-1]) * (max_id + 1)
+        for row, quran_id in enumerate(self.quran_ids):
+            self.row_of[quran_id] = row
+
+    def __len__(self):
+        return len(self.quran_ids)
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the arrays and text buffers"""
+        arrays = [self.quran_ids, self.juz_ids, self.surah_ids, self.ayah_ids, self.surah_refs, self.row_of]
+        total = sum(a.itemsize * len(a) for a in arrays)
+        total += sum(len(buf) for buf in self.text_buffers.values())
+        total += sum(a.itemsize * len(a) for a in self.text_offsets.values())
+        return total
+
+    def get(self, quran_id: int) -> Optional[Dict[str, Any]]:
+        """Return one verse as a dict shaped like a get_verse_texts_from_db row"""
+        if quran_id is None or quran_id < 0 or quran_id >= len(self.row_of):
+            return None
+        row = self.row_of[quran_id]
+        if row < 0:
+            return None
+
+        verse = {
+            "quran_id": quran_id,
+            "juz_id": self.juz_ids[row],
+            "surah_id": self.surah_ids[row],
+            "ayah_id": self.ayah_ids[row]
+        }
+        verse.update(zip(SURAH_FIELDS, self.surah_table[self.surah_refs[row]]))
+        for field in TEXT_FIELDS:
+            offsets = self.text_offsets[field]
+            verse[field] = self.text_buffers[field][offsets[row]:offsets[row + 1]].decode("utf-8")
+        return verse
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "VerseStore":
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        store = cls(state["version"])
+        store.__dict__.update(state)
+        return store
+
+verse_store: Optional[VerseStore] = None
+
+async def load_verse_store() -> Optional[VerseStore]:
+    """
+    Load the verse store at startup: use the on-disk snapshot when its version matches
+    VERSE_STORE_VERSION, otherwise rebuild it from PostgreSQL and rewrite the snapshot.
+    """
+    global verse_store
+    if not VERSE_STORE_ENABLED:
+        logger.info("Verse store disabled, verse texts will come from PostgreSQL")
+        return None
+
+    snapshot = None
+    if os.path.exists(VERSE_STORE_PATH):
+        try:
+            snapshot = VerseStore.load(VERSE_STORE_PATH)
+        except Exception as e:
+            logger.error(f"Verse store snapshot unreadable: {e}")
+
+    if snapshot is not None and snapshot.version == VERSE_STORE_VERSION:
+        verse_store = snapshot
+        logger.info(f"✅ Verse store loaded from snapshot: {len(snapshot)} verses, {snapshot.nbytes() / 1e6:.1f} MB")
+        return verse_store
+
+    try:
+        logger.info(f"Refreshing verse store from PostgreSQL (version {VERSE_STORE_VERSION})...")
+        store = VerseStore.from_rows(await fetch_all_verses(), VERSE_STORE_VERSION)
+        store.save(VERSE_STORE_PATH)
+        verse_store = store
+        logger.info(f"✅ Verse store built: {len(store)} verses, {store.nbytes() / 1e6:.1f} MB")
+    except Exception as e:
+        logger.error(f"Verse store refresh failed: {e}")
+        if snapshot is not None:
+            logger.warning(f"Using stale verse store snapshot (version {snapshot.version})")
+            verse_store = snapshot
+
+    return verse_store
+
+async def get_verse_texts(verse_details: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Same contract as get_verse_texts_from_db, served from the in-process store.
+    Falls back to PostgreSQL when the store is not loaded or is missing a verse.
+    """
+    if verse_store is None:
+        return await get_verse_texts_from_db(verse_details)
+
+    verse_texts = []
+    missing = []
+    for detail in verse_details:
+        quran_id = detail.get("quran_id")
+        if not quran_id:
+            continue
+        verse = verse_store.get(quran_id)
+        if verse is None:
+            missing.append(detail)
+        else:
+            verse_texts.append(verse)
+
+    if missing:
+        logger.warning(f"{len(missing)} verses missing from verse store, fetching from PostgreSQL")
+        verse_texts.extend(await get_verse_texts_from_db(missing))
+
+    return verse_texts
@@ -0,0 +1,215 @@
+"""
+Binary columnar layout for the (dense + sparse + payload) embedding exports.
+
+An embedding set is a directory:
+
+    manifest.json          format version, counts, dim, dtype
+    ids.npy                int64 point ids, one per row
+    dense.npy              (rows x dim) float32/float16 matrix
+    sparse_indptr.npy      int64 CSR row pointers (rows + 1)
+    sparse_indices.npy     int32 token ids
+    sparse_values.npy      float32 token weights
+    payloads.json          list of payload dicts, one per row
+
+Every array is a plain .npy file opened with mmap_mode="r", so readers share the page
+cache and nothing is parsed or copied until a row is touched. Convert the JSONL export
+written by notebook 4 with:
+
+    python -m utils.embedding_format convert Quran_Embeddings_Qdrant.jsonl Quran_Embeddings
+    python -m utils.embedding_format validate Quran_Embeddings
+"""
+import json
+import os
+import shutil
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+ARRAY_FILES = ("ids.npy", "dense.npy", "sparse_indptr.npy", "sparse_indices.npy", "sparse_values.npy")
+PAYLOAD_FILE = "payloads.json"
+REQUIRED_PAYLOAD_FIELDS = ("quran_id", "juz_id", "surah_id", "ayah_id", "surah_type", "source")
+
+class EmbeddingSet:
+    """Zero-copy reader over an embedding set directory"""
+
+    def __init__(self, path: str, manifest: Dict[str, Any], ids, dense, indptr, indices, values, payloads):
+        self.path = path
+        self.manifest = manifest
+        self.ids = ids
+        self.dense = dense
+        self.sparse_indptr = indptr
+        self.sparse_indices = indices
+        self.sparse_values = values
+        self.payloads = payloads
+
+    @classmethod
+    def open(cls, path: str) -> "EmbeddingSet":
+        with open(os.path.join(path, MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported embedding format version {manifest.get('format_version')}")
+
+        arrays = [np.load(os.path.join(path, name), mmap_mode="r") for name in ARRAY_FILES]
+        with open(os.path.join(path, PAYLOAD_FILE), "r", encoding="utf-8") as f:
+            payloads = json.load(f)
+        return cls(path, manifest, *arrays, payloads)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, MANIFEST))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.dense.shape[1]
+
+    def sparse_row(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(indices, values) views of one row's sparse vector"""
+        start, end = self.sparse_indptr[row], self.sparse_indptr[row + 1]
+        return self.sparse_indices[start:end], self.sparse_values[start:end]
+
+    def iter_batches(self, batch_size: int, start: int = 0) -> Iterator[Tuple[int, int]]:
+        """(start, end) row ranges covering the set from start"""
+        for begin in range(start, len(self), batch_size):
+            yield begin, min(begin + batch_size, len(self))
+
+    def term_major(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Transpose the sparse matrix into (indptr, rows, values) keyed by token id,
+        i.e. an inverted index for query-time scoring
+        """
+        rows = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.sparse_indptr))
+        terms = np.asarray(self.sparse_indices, dtype=np.int64)
+        order = np.argsort(terms, kind="stable")
+        vocab_size = int(terms.max()) + 1 if len(terms) else 0
+        indptr = np.zeros(vocab_size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=vocab_size), out=indptr[1:])
+        return indptr, rows[order], np.asarray(self.sparse_values)[order]
+
+def _count_lines(path: str) -> Tuple[int, int]:
+    """(records, dense dim) of a JSONL export"""
+    count, dim = 0, 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if count == 0:
+                dim = len(json.loads(line)["vector"]["dense"])
+            count += 1
+    return count, dim
+
+def convert_jsonl(jsonl_path: str, out_dir: str, dense_dtype: str = "float32") -> EmbeddingSet:
+    """
+    Convert a Qdrant JSONL export into an embedding set. Dense rows are streamed into
+    a preallocated .npy memmap; the directory only appears once complete.
+    """
+    count, dim = _count_lines(jsonl_path)
+    tmp_dir = f"{out_dir.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    dense = np.lib.format.open_memmap(os.path.join(tmp_dir, "dense.npy"), mode="w+", dtype=dense_dtype, shape=(count, dim))
+    ids = np.zeros(count, dtype=np.int64)
+    indptr = np.zeros(count + 1, dtype=np.int64)
+    index_parts: List[np.ndarray] = []
+    value_parts: List[np.ndarray] = []
+    payloads: List[Dict[str, Any]] = []
+
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        row = 0
+        for line in f:
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            ids[row] = obj["id"]
+            dense[row] = obj["vector"]["dense"]
+            sparse = obj["vector"].get("sparse") or {}
+            index_parts.append(np.asarray(sparse.get("indices", []), dtype=np.int32))
+            value_parts.append(np.asarray(sparse.get("values", []), dtype=np.float32))
+            indptr[row + 1] = indptr[row] + len(index_parts[-1])
+            payloads.append(obj.get("payload") or {})
+            row += 1
+
+    dense.flush()
+    del dense
+    np.save(os.path.join(tmp_dir, "ids.npy"), ids)
+    np.save(os.path.join(tmp_dir, "sparse_indptr.npy"), indptr)
+    np.save(os.path.join(tmp_dir, "sparse_indices.npy"), np.concatenate(index_parts) if index_parts else np.zeros(0, np.int32))
+    np.save(os.path.join(tmp_dir, "sparse_values.npy"), np.concatenate(value_parts) if value_parts else np.zeros(0, np.float32))
+    with open(os.path.join(tmp_dir, PAYLOAD_FILE), "w", encoding="utf-8") as f:
+        json.dump(payloads, f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({
+            "format_version": FORMAT_VERSION,
+            "source": os.path.basename(jsonl_path),
+            "count": count,
+            "dim": dim,
+            "dense_dtype": dense_dtype,
+            "sparse_nnz": int(indptr[-1])
+        }, f, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return EmbeddingSet.open(out_dir)
+
+def validate(embeddings: EmbeddingSet, dim: Optional[int] = 1024, required_fields=REQUIRED_PAYLOAD_FIELDS) -> List[str]:
+    """The notebook 4 checks, vectorized over the whole set; returns a list of problems"""
+    problems = []
+    count = len(embeddings)
+    if embeddings.manifest.get("count") != count:
+        problems.append(f"manifest count {embeddings.manifest.get('count')} != {count} rows")
+    if len(np.unique(embeddings.ids)) != count:
+        problems.append("duplicate point ids")
+    if embeddings.dense.shape[0] != count:
+        problems.append(f"dense has {embeddings.dense.shape[0]} rows for {count} ids")
+    if dim is not None and embeddings.dim != dim:
+        problems.append(f"dense dimension {embeddings.dim} (expected {dim})")
+    bad_rows = np.flatnonzero(~np.isfinite(embeddings.dense).all(axis=1))
+    if len(bad_rows):
+        problems.append(f"non-finite dense values in {len(bad_rows)} rows (first: {int(bad_rows[0])})")
+
+    indptr = embeddings.sparse_indptr
+    if len(indptr) != count + 1 or indptr[0] != 0 or np.any(np.diff(indptr) < 0):
+        problems.append("sparse indptr is not a valid CSR row pointer")
+    if len(embeddings.sparse_indices) != len(embeddings.sparse_values) or indptr[-1] != len(embeddings.sparse_indices):
+        problems.append("sparse indices/values length mismatch")
+    if len(embeddings.sparse_indices) and embeddings.sparse_indices.min() < 0:
+        problems.append("negative sparse token ids")
+
+    if len(embeddings.payloads) != count:
+        problems.append(f"{len(embeddings.payloads)} payloads for {count} rows")
+    for row, payload in enumerate(embeddings.payloads):
+        missing = [field for field in required_fields if field not in payload]
+        if missing:
+            problems.append(f"row {row}: payload missing {', '.join(missing)}")
+            break
+    return problems
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Binary embedding set utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="convert a Qdrant JSONL export")
+    convert.add_argument("jsonl")
+    convert.add_argument("out_dir")
+    convert.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    check = sub.add_parser("validate", help="run the notebook 4 checks on an embedding set")
+    check.add_argument("path")
+    check.add_argument("--dim", type=int, default=1024)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        embeddings = convert_jsonl(args.jsonl, args.out_dir, args.dtype)
+        print(f"Wrote {len(embeddings)} records ({embeddings.dim}-d {args.dtype}) to {args.out_dir}")
+    else:
+        embeddings = EmbeddingSet.open(args.path)
+        problems = validate(embeddings, args.dim)
+        for problem in problems:
+            print(f"✗ {problem}")
+        print(f"\nFile valid? ---> {not problems} ({len(embeddings)} records)")
+        raise SystemExit(1 if problems else 0)
@@ -0,0 +1,56 @@
+import argparse
+import time
+import psycopg2
+from pg_bulk_upsert import copy_upsert, iter_records
+from quran_postgresql_ingestion import DB_CONFIG, normalize_simple
+
+# Canonical dataset used by notebook 5 (before normalization)
+JSON_PATH = r"6_Al_Hadith_Dataset_FINAL.json"
+
+COLUMNS = (
+    "hadith_id", "book_id", "chapter_id", "source", "book",
+    "chapter_name_ar", "chapter_name_ur", "chapter_name_en", "narrator", "status",
+    "text_ar", "text_ur", "text_en"
+)
+
+def bukhari_row(r):
+    return (
+        r.get("hadith_id"),
+        r.get("book_id"),
+        r.get("chapter_id"),
+        r.get("source", "Hadith"),
+        normalize_simple(r.get("book")),
+        normalize_simple(r.get("chapter_name_ar")),
+        normalize_simple(r.get("chapter_name_ur")),
+        normalize_simple(r.get("chapter_name_en")),
+        normalize_simple(r.get("narrator")),
+        normalize_simple(r.get("status")),
+        r.get("arabic_text"),
+        r.get("urdu_text"),
+        r.get("english_text")
+    )
+
+def copy_upsert_bukhari(records, conn=None):
+    """COPY into a staging table, then insert new hadith and update those whose content changed"""
+    own_conn = conn is None
+    conn = conn or psycopg2.connect(**DB_CONFIG)
+    inserted, updated, unchanged = copy_upsert(conn, "bukhari_hadith", "hadith_id", COLUMNS, (bukhari_row(r) for r in records))
+    if own_conn:
+        conn.close()
+
+    print(f"Inserted {inserted}, updated {updated}, unchanged {unchanged} rows.")
+    return inserted, updated, unchanged
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the canonical Sahih Bukhari dataset into PostgreSQL")
+    parser.add_argument("--path", default=JSON_PATH, help="JSON array or JSONL file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    inserted, updated, unchanged = copy_upsert_bukhari(iter_records(args.path))
+    rows = inserted + updated + unchanged
+    elapsed = time.perf_counter() - start
+    print(f"{rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/sec)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import io
+import json
+from itertools import islice
+
+COPY_CHUNK_ROWS = 5000   # rows buffered per COPY chunk
+
+def iter_records(path):
+    """Records from a JSON array file or, streamed line by line, from a JSONL file"""
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        yield from json.load(f)
+
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+def _copy_value(value):
+    """One field in COPY text format (NULL is \\N, so None and "" stay distinct)"""
+    if value is None:
+        return "\\N"
+    return str(value).translate(COPY_ESCAPES)
+
+def _copy_chunk(rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+def copy_upsert(conn, table, key, columns, rows, chunk_rows=COPY_CHUNK_ROWS):
+    """
+    Stream rows into a temporary staging table with COPY, then merge them into table
+    with one INSERT ... ON CONFLICT DO UPDATE. The table's content_hash column holds an
+    md5 of the content columns, and only rows whose hash changed are rewritten.
+    Runs in one transaction; returns (inserted, updated, unchanged).
+    """
+    stage = f"{table}_stage"
+    column_list = ", ".join(columns)
+    content = [c for c in columns if c != key]
+    content_hash = f"md5(ROW({', '.join(content)})::text)"
+
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+        copy_sql = f"COPY {stage} ({column_list}) FROM STDIN"
+
+        staged = 0
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, chunk_rows))
+            if not chunk:
+                break
+            cur.copy_expert(copy_sql, _copy_chunk(chunk))
+            staged += len(chunk)
+
+        cur.execute(f"""
+            INSERT INTO {table} ({column_list}, content_hash)
+            SELECT DISTINCT ON ({key}) {column_list}, {content_hash}
+            FROM {stage}
+            ORDER BY {key}
+            ON CONFLICT ({key}) DO UPDATE SET
+                {", ".join(f"{c} = EXCLUDED.{c}" for c in content)},
+                content_hash = EXCLUDED.content_hash
+            WHERE {table}.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+            RETURNING (xmax = 0) AS inserted
+        """)
+        flags = [row[0] for row in cur.fetchall()]
+
+    conn.commit()
+    inserted = sum(flags)
+    updated = len(flags) - inserted
+    return inserted, updated, staged - inserted - updated
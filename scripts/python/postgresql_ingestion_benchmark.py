@@ -0,0 +1,84 @@
+"""
+Rows/sec of the legacy executemany insert vs COPY + hash merge, on a scratch table
+in the dev PostgreSQL (dev/docker-compose.yml):
+
+    python postgresql_ingestion_benchmark.py --rows 6236
+"""
+import argparse
+import random
+import time
+
+import psycopg2
+
+from pg_bulk_upsert import copy_upsert
+from quran_postgresql_ingestion import COLUMNS, DB_CONFIG
+
+TABLE = "bench_quran_ayah"
+
+def create_table(conn):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.execute(f"""
+            CREATE TABLE {TABLE} (
+                quran_id INT PRIMARY KEY, juz_id INT, surah_id INT, ayah_id INT, source VARCHAR(50),
+                transliteration VARCHAR(200), surah_name_ar VARCHAR(200), surah_name_ur VARCHAR(200),
+                surah_name_en VARCHAR(200), surah_type VARCHAR(50), text_ar TEXT, text_ur TEXT, text_en TEXT,
+                content_hash CHAR(32)
+            )
+        """)
+    conn.commit()
+
+def synthetic_rows(count, revision=0, changed_fraction=0.0, seed=0):
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        edit = f" (rev {revision})" if revision and rng.random() < changed_fraction else ""
+        yield (
+            i, i * 30 // count + 1, i * 114 // count + 1, i % 50 + 1, "Quran",
+            "Al-Fatiha", "الفاتحة", "الفاتحہ", "The Opening", "Meccan",
+            "بِسْمِ اللَّهِ الرَّحْمَٰنِ الرَّحِيمِ " * 4,
+            "اللہ کے نام سے جو بڑا مہربان نہایت رحم والا ہے " * 4 + edit,
+            "In the name of Allah, the Entirely Merciful, the Especially Merciful " * 4 + edit
+        )
+
+def executemany_insert(conn, rows):
+    with conn.cursor() as cur:
+        cur.executemany(
+            f"INSERT INTO {TABLE} ({', '.join(COLUMNS)}) VALUES ({', '.join(['%s'] * len(COLUMNS))}) "
+            f"ON CONFLICT (quran_id) DO NOTHING",
+            list(rows)
+        )
+    conn.commit()
+
+def timed(label, rows, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    detail = f"   inserted/updated/unchanged {result}" if result else ""
+    print(f"{label:>34}: {rows / elapsed:9.0f} rows/sec ({elapsed:.2f}s){detail}")
+
+def main():
+    parser = argparse.ArgumentParser(description="PostgreSQL ingestion benchmark")
+    parser.add_argument("--rows", type=int, default=6236)
+    parser.add_argument("--changed", type=float, default=0.05, help="fraction of rows edited in the update run")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+
+    create_table(conn)
+    timed("executemany, empty table", args.rows, lambda: executemany_insert(conn, synthetic_rows(args.rows)))
+
+    create_table(conn)
+    timed("COPY + merge, empty table", args.rows,
+          lambda: copy_upsert(conn, TABLE, "quran_id", COLUMNS, synthetic_rows(args.rows)))
+    timed("COPY + merge, unchanged rerun", args.rows,
+          lambda: copy_upsert(conn, TABLE, "quran_id", COLUMNS, synthetic_rows(args.rows)))
+    timed(f"COPY + merge, {args.changed:.0%} edited", args.rows,
+          lambda: copy_upsert(conn, TABLE, "quran_id", COLUMNS, synthetic_rows(args.rows, 1, args.changed)))
+
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE {TABLE}")
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    main()
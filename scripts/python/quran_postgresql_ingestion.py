@@ -1,6 +1,7 @@
-import json
+import argparse
+import time
 import psycopg2
-from pathlib import Path
+from pg_bulk_upsert import copy_upsert, iter_records
 
 DB_CONFIG = {
     "host": "localhost",
@@ -12,13 +13,38 @@ DB_CONFIG = {
 
 JSON_PATH = r"3_Al_Quran_Dataset_FINAL.json"
 
+COLUMNS = (
+    "quran_id", "juz_id", "surah_id", "ayah_id", "source",
+    "transliteration", "surah_name_ar", "surah_name_ur", "surah_name_en", "surah_type",
+    "text_ar", "text_ur", "text_en"
+)
+
 def normalize_simple(text):
     if text is None:
         return None
     return text.strip()
 
-def batch_insert_quran(records):
-    conn = psycopg2.connect(**DB_CONFIG)
+def quran_row(r):
+    return (
+        r.get("quran_id"),
+        r.get("juz"),
+        r.get("surah_id"),
+        r.get("ayah_id"),
+        r.get("source", "Quran"),
+        normalize_simple(r.get("transliteration")),
+        normalize_simple(r.get("surah_name_ar")),
+        normalize_simple(r.get("surah_name_ur")),
+        normalize_simple(r.get("surah_name_en")),
+        normalize_simple(r.get("surah_type")),
+        r.get("text_ar"),
+        r.get("text_ur"),
+        r.get("text_en")
+    )
+
+def batch_insert_quran(records, conn=None):
+    """Legacy mode: one INSERT round trip per row, existing rows are never updated"""
+    own_conn = conn is None
+    conn = conn or psycopg2.connect(**DB_CONFIG)
     cur = conn.cursor()
 
     sql = """
@@ -33,34 +59,42 @@ def batch_insert_quran(records):
     ON CONFLICT (quran_id) DO NOTHING;
     """
 
-    batch = []
-    for r in records:
-        batch.append((
-            r.get("quran_id"),
-            r.get("juz"),
-            r.get("surah_id"),
-            r.get("ayah_id"),
-            r.get("source", "Quran"),
-            normalize_simple(r.get("transliteration")),
-            normalize_simple(r.get("surah_name_ar")),
-            normalize_simple(r.get("surah_name_ur")),
-            normalize_simple(r.get("surah_name_en")),
-            normalize_simple(r.get("surah_type")),
-            r.get("text_ar"),
-            r.get("text_ur"),
-            r.get("text_en")
-        ))
+    batch = [quran_row(r) for r in records]
 
     cur.executemany(sql, batch)
     conn.commit()
-    conn.close()
+    if own_conn:
+        conn.close()
 
     print(f"Inserted {len(batch)} rows.")
 
+def copy_upsert_quran(records, conn=None):
+    """COPY into a staging table, then insert new rows and update rows whose content changed"""
+    own_conn = conn is None
+    conn = conn or psycopg2.connect(**DB_CONFIG)
+    inserted, updated, unchanged = copy_upsert(conn, "quran_ayah", "quran_id", COLUMNS, (quran_row(r) for r in records))
+    if own_conn:
+        conn.close()
+
+    print(f"Inserted {inserted}, updated {updated}, unchanged {unchanged} rows.")
+    return inserted, updated, unchanged
+
 def main():
-    with open(JSON_PATH, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    batch_insert_quran(data)
+    parser = argparse.ArgumentParser(description="Load the canonical Quran dataset into PostgreSQL")
+    parser.add_argument("--path", default=JSON_PATH, help="JSON array or JSONL file")
+    parser.add_argument("--mode", choices=["copy", "executemany"], default="copy")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.mode == "copy":
+        inserted, updated, unchanged = copy_upsert_quran(iter_records(args.path))
+        rows = inserted + updated + unchanged
+    else:
+        records = list(iter_records(args.path))
+        batch_insert_quran(records)
+        rows = len(records)
+    elapsed = time.perf_counter() - start
+    print(f"{rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/sec)")
 
 if __name__ == "__main__":
     main()
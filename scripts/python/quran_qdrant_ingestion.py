@@ -1,14 +1,63 @@
+import argparse
 import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 from tqdm import tqdm
+from pg_bulk_upsert import iter_records
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend"))
+from utils.embedding_format import EmbeddingSet  # noqa: E402
 
 # configuration...
 QDRANT_URL = "http://localhost:6333"
-COLLECTION_NAME = "quran_ayahs"
-EMBEDDING_FILE = "Quran_Embeddings_Qdrant.jsonl"   
+COLLECTION_NAME = "quran_ayahs"   # alias the backend queries; builds go to quran_ayahs_vN
+EMBEDDING_FILE = "Quran_Embeddings_Qdrant.jsonl"
+EMBEDDING_DIR = "Quran_Embeddings"   # binary embedding set, used instead of the default JSONL when present
+CHECKPOINT_FILE = "quran_qdrant_ingestion.checkpoint.json"
+# Canonical dataset whose display text is copied into the payloads (--payload-text), so the
+# backend can serve results straight from Qdrant (VERSE_TEXT_SOURCE = "payload")
+PAYLOAD_TEXT_FILE = None   # e.g. "3_Al_Quran_Dataset_FINAL.json"
+PAYLOAD_TEXT_FIELDS = ("text_ar", "text_ur", "text_en", "surah_name_ar", "surah_name_ur", "surah_name_en", "transliteration")
+
+BATCH_SIZE = 300
+UPLOAD_WORKERS = 4        # parallel upsert threads
+QUEUE_BATCHES = 8         # bounded queue between the reader and the workers
+UPLOAD_RETRIES = 3
+BARRIER_TIMEOUT = 300     # seconds to wait for all wait=False upserts to be applied
+INDEXING_THRESHOLD = 20000   # restored after the bulk load (Qdrant default); 0 while loading
+OPTIMIZER_TIMEOUT = 1800     # seconds to wait for the index build before swapping the alias
+OPTIMIZER_SETTLE = 30        # green this long with nothing indexed: nothing to index (segments under the threshold)
+KEEP_VERSIONS = 2            # current + previous (for rollback)
+
+# Collection storage (see quran_qdrant_quantization_benchmark.py for recall / latency / RAM)
+QUANTIZATION = None          # None, "scalar" (int8) or "binary"
+QUANTIZATION_ALWAYS_RAM = True   # keep the quantized vectors in RAM
+VECTORS_ON_DISK = False      # original float32 vectors memory-mapped from disk
+HNSW_M = 16
+HNSW_EF_CONSTRUCT = 100
+
+# Payload indexes for the search filters (created before loading, so the HNSW build
+# adds the extra links Qdrant uses for filtered search)
+PAYLOAD_INDEXES = {
+    "surah_id": models.PayloadSchemaType.INTEGER,
+    "juz_id": models.PayloadSchemaType.INTEGER,
+    "surah_type": models.PayloadSchemaType.KEYWORD,
+    "source": models.PayloadSchemaType.KEYWORD
+}
+
+def use_embedding_set():
+    """Whether points come from the binary embedding set (EMBEDDING_DIR) rather than the JSONL"""
+    return bool(EMBEDDING_DIR) and EmbeddingSet.exists(EMBEDDING_DIR)
 
 def get_vector_dim():
+    if use_embedding_set():
+        return EmbeddingSet.open(EMBEDDING_DIR).dim
     with open(EMBEDDING_FILE, "r", encoding="utf-8") as f:
         first = json.loads(f.readline())
         dense_vec = first["vector"]["dense"]
@@ -17,49 +66,170 @@ def get_vector_dim():
 def build_sparse_vector(sparse_obj):
     if not sparse_obj:
         return None
-    
+
     return models.SparseVector(
         indices=[int(i) for i in sparse_obj["indices"]],
         values=[float(v) for v in sparse_obj["values"]],
     )
 
-def create_collection(client, vector_dim):
-    print(f"Creating/recreating collection: {COLLECTION_NAME}")
+def quantization_config(kind, always_ram=QUANTIZATION_ALWAYS_RAM):
+    """Qdrant quantization config for "scalar" (int8), "binary" or None"""
+    if kind == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=always_ram)
+        )
+    if kind == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=always_ram))
+    if kind is None:
+        return None
+    raise ValueError(f"Unknown quantization {kind!r}")
+
+def create_collection(client, vector_dim, collection_name=COLLECTION_NAME, indexing_threshold=None,
+                      quantization=QUANTIZATION, on_disk=VECTORS_ON_DISK, hnsw_m=HNSW_M, hnsw_ef_construct=HNSW_EF_CONSTRUCT,
+                      payload_indexes=PAYLOAD_INDEXES):
+    print(f"Creating/recreating collection: {collection_name} "
+          f"(quantization={quantization}, on_disk={on_disk}, m={hnsw_m}, ef_construct={hnsw_ef_construct})")
 
-    if client.collection_exists(COLLECTION_NAME):
-        client.delete_collection(COLLECTION_NAME)
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
 
     client.create_collection(
-        collection_name=COLLECTION_NAME,
+        collection_name=collection_name,
         vectors_config={
             "dense": models.VectorParams(
                 size=vector_dim,
-                distance=models.Distance.COSINE
+                distance=models.Distance.COSINE,
+                on_disk=on_disk
             )
         },
         sparse_vectors_config={
             "sparse": models.SparseVectorParams()
-        }
+        },
+        hnsw_config=models.HnswConfigDiff(m=hnsw_m, ef_construct=hnsw_ef_construct),
+        quantization_config=quantization_config(quantization),
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=indexing_threshold)
+        if indexing_threshold is not None else None
     )
-    print("Collection ready!")
+    for field, schema in (payload_indexes or {}).items():
+        client.create_payload_index(collection_name, field_name=field, field_schema=schema, wait=True)
+    print(f"Collection ready! (payload indexes: {', '.join(payload_indexes or {}) or 'none'})")
 
-def ingest_to_qdrant():
-    client = QdrantClient(url=QDRANT_URL, timeout=60)
+def collection_versions(client, alias):
+    """{version: collection name} of the alias_vN builds"""
+    pattern = re.compile(rf"^{re.escape(alias)}_v(\d+)$")
+    versions = {}
+    for collection in client.get_collections().collections:
+        match = pattern.match(collection.name)
+        if match:
+            versions[int(match.group(1))] = collection.name
+    return versions
 
-    print("Reading dimension...")
-    vector_dim = get_vector_dim()
+def alias_target(client, alias):
+    """Collection the alias points to, or None"""
+    for description in client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return description.collection_name
+    return None
 
-    create_collection(client, vector_dim)
+def wait_for_optimizer(client, collection_name, expected, timeout=OPTIMIZER_TIMEOUT, settle=OPTIMIZER_SETTLE):
+    """
+    Wait until the HNSW index covers the expected points; returns indexed_vectors_count.
+    Right after indexing_threshold is restored the collection can still be green because the
+    optimizer has not started, so green alone is not enough: the index must reach expected,
+    or the collection must have left green and come back.
+    """
+    deadline = time.monotonic() + timeout
+    left_green = False
+    green_since = None
+    while True:
+        info = client.get_collection(collection_name)
+        indexed = info.indexed_vectors_count or 0
+        if info.status != models.CollectionStatus.GREEN:
+            left_green, green_since = True, None
+        elif indexed >= expected or left_green:
+            return indexed
+        else:
+            green_since = green_since or time.monotonic()
+            if time.monotonic() - green_since >= settle:
+                print(f"Optimizer idle for {settle}s with {indexed}/{expected} vectors indexed "
+                      f"(segments under the indexing threshold are searched exactly)")
+                return indexed
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{collection_name} still {info.status}, {indexed}/{expected} vectors indexed after {timeout}s")
+        time.sleep(1.0)
 
-    print("Starting ingestion...")
+def swap_alias(client, alias, collection_name, drop_legacy=False):
+    """Atomically point alias at collection_name (delete + create in one request)"""
+    if alias in {c.name for c in client.get_collections().collections}:
+        if not drop_legacy:
+            raise SystemExit(
+                f"A collection named {alias} exists, so the alias cannot be created. "
+                f"Rerun with --drop-legacy to delete it (search is down until the alias is created)."
+            )
+        print(f"Dropping legacy collection {alias}")
+        client.delete_collection(alias)
 
-    batch = []
-    batch_size = 300
+    operations = []
+    if alias_target(client, alias) is not None:
+        operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)))
+    operations.append(models.CreateAliasOperation(
+        create_alias=models.CreateAlias(collection_name=collection_name, alias_name=alias)
+    ))
+    client.update_collection_aliases(change_aliases_operations=operations)
+    print(f"Alias {alias} -> {collection_name}")
+
+def prune_versions(client, alias, keep=KEEP_VERSIONS):
+    """Delete builds older than the newest `keep` versions, never the alias target"""
+    target = alias_target(client, alias)
+    versions = collection_versions(client, alias)
+    for version in sorted(versions)[:-keep] if keep > 0 else []:
+        if versions[version] != target:
+            print(f"Deleting old build {versions[version]}")
+            client.delete_collection(versions[version])
+
+def rollback(url=QDRANT_URL, alias=COLLECTION_NAME):
+    """Point the alias back at the newest build older than its current target"""
+    client = QdrantClient(url=url, timeout=60)
+    target = alias_target(client, alias)
+    versions = collection_versions(client, alias)
+    current = next((v for v, name in versions.items() if name == target), None)
+    older = [v for v in versions if current is None or v < current]
+    if not older:
+        raise SystemExit(f"No build older than {target} to roll back to")
+    swap_alias(client, alias, versions[max(older)])
+    client.close()
+
+def count_points():
+    """Number of points in the source (binary set or JSONL)"""
+    if use_embedding_set():
+        return len(EmbeddingSet.open(EMBEDDING_DIR))
+    with open(EMBEDDING_FILE, "r", encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+def iter_points(start=0):
+    """PointStructs from the binary embedding set (zero-copy) or, failing that, the JSONL, from offset start"""
+    if use_embedding_set():
+        embeddings = EmbeddingSet.open(EMBEDDING_DIR)
+        for row in range(start, len(embeddings)):
+            indices, values = embeddings.sparse_row(row)
+            yield models.PointStruct(
+                id=int(embeddings.ids[row]),
+                vector={
+                    "dense": embeddings.dense[row].tolist(),
+                    "sparse": models.SparseVector(indices=indices.tolist(), values=values.tolist())
+                },
+                payload=embeddings.payloads[row]
+            )
+        return
 
     with open(EMBEDDING_FILE, "r", encoding="utf-8") as f:
-        for line in tqdm(f, desc="Uploading"):
+        offset = 0
+        for line in f:
             if not line.strip():
                 continue
+            offset += 1
+            if offset <= start:
+                continue
 
             obj = json.loads(line)
 
@@ -71,31 +241,245 @@ def ingest_to_qdrant():
                 "sparse": sparse,
             }
 
-            point = models.PointStruct(
+            yield models.PointStruct(
                 id=obj["id"],
                 vector=full_vector,
                 payload=obj["payload"]
             )
 
-            batch.append(point)
-
-            if len(batch) >= batch_size:
-                client.upsert(
-                    collection_name=COLLECTION_NAME,
-                    points=batch,
-                    wait=True
-                )
-                batch = []
-
-    if batch:
-        client.upsert(
-            collection_name=COLLECTION_NAME,
-            points=batch,
-            wait=True
-        )
+def load_payload_texts(path):
+    """quran_id -> display text fields from the canonical dataset, normalized like the PostgreSQL load"""
+    texts = {}
+    for record in iter_records(path):
+        text = {field: record.get(field) for field in PAYLOAD_TEXT_FIELDS}
+        for field in ("surah_name_ar", "surah_name_ur", "surah_name_en", "transliteration"):
+            if text[field] is not None:
+                text[field] = text[field].strip()
+        texts[record["quran_id"]] = text
+    return texts
+
+def with_payload_texts(points, texts):
+    """Merge each point's display text into its payload (points without a match are left as they are)"""
+    for point in points:
+        extra = texts.get((point.payload or {}).get("quran_id"))
+        if extra:
+            point.payload = {**point.payload, **extra}
+        yield point
+
+class Checkpoint:
+    """
+    Last committed source offset, persisted atomically. Batches finish out of order,
+    so the offset only advances over a contiguous run of acknowledged batches.
+    """
 
-    print("Quran embeddings ingested into the Qdrant!")
+    def __init__(self, path, collection_name, offset=0):
+        self.path = path
+        self.collection_name = collection_name
+        self.offset = offset
+        self._done = {}   # batch start -> batch end, acknowledged but not yet contiguous
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        """Saved checkpoint at path, or None"""
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            return cls(path, state["collection"], state.get("offset", 0))
+        return None
+
+    def ack(self, start, end):
+        with self._lock:
+            self._done[start] = end
+            advanced = False
+            while self.offset in self._done:
+                self.offset = self._done.pop(self.offset)
+                advanced = True
+            if advanced:
+                self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"collection": self.collection_name, "offset": self.offset, "updated_at": time.time()}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+def _upload_worker(url, collection_name, batches, checkpoint, progress, errors):
+    """Consume (start, end, points) batches; upsert with wait=False and retry with backoff"""
+    client = QdrantClient(url=url, timeout=60)
+    while True:
+        item = batches.get()
+        if item is None:
+            break
+        start, end, points = item
+        if errors:
+            continue   # another worker failed: drain without uploading
+        for attempt in range(1, UPLOAD_RETRIES + 1):
+            try:
+                client.upsert(collection_name=collection_name, points=points, wait=False)
+                checkpoint.ack(start, end)
+                progress.update(len(points))
+                break
+            except Exception as e:
+                if attempt == UPLOAD_RETRIES:
+                    errors.append(f"batch {start}-{end}: {e}")
+                else:
+                    time.sleep(0.5 * 2 ** (attempt - 1))
+    client.close()
+
+def wait_for_points(client, collection_name, expected, timeout=BARRIER_TIMEOUT):
+    """Consistency barrier: wait until every wait=False upsert has been applied"""
+    deadline = time.monotonic() + timeout
+    while True:
+        count = client.count(collection_name=collection_name, exact=True).count
+        if count >= expected:
+            return count
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{collection_name}: {count}/{expected} points applied after {timeout}s")
+        time.sleep(0.2)
+
+def run_pipeline(url, collection_name, points, start, total, batch_size, workers, queue_batches, checkpoint):
+    """
+    Stream points through a bounded queue to parallel upload workers; returns (points uploaded, errors).
+    The reader thread (the caller) parses/builds batches while workers upload.
+    """
+    batches = queue.Queue(maxsize=queue_batches)
+    errors = []
+    progress = tqdm(total=total, initial=start, desc="Uploading", unit="pts")
+    threads = [
+        threading.Thread(target=_upload_worker, args=(url, collection_name, batches, checkpoint, progress, errors), daemon=True)
+        for _ in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    batch, batch_start, offset = [], start, start
+    for point in points:
+        batch.append(point)
+        offset += 1
+        if len(batch) >= batch_size:
+            batches.put((batch_start, offset, batch))
+            batch, batch_start = [], offset
+        if errors:
+            break
+    if batch and not errors:
+        batches.put((batch_start, offset, batch))
+
+    for _ in threads:
+        batches.put(None)
+    for thread in threads:
+        thread.join()
+    progress.close()
+    return offset - start, errors
+
+def ingest_to_qdrant(url=QDRANT_URL, alias=COLLECTION_NAME, batch_size=BATCH_SIZE, workers=UPLOAD_WORKERS,
+                     queue_batches=QUEUE_BATCHES, checkpoint_path=CHECKPOINT_FILE, fresh=False, drop_legacy=False,
+                     collection_options=None, payload_text=PAYLOAD_TEXT_FILE):
+    """
+    Build a new alias_vN collection with indexing deferred, wait for the index, then
+    swap the alias to it. Search keeps hitting the previous build the whole time.
+    """
+    client = QdrantClient(url=url, timeout=60)
+    total = count_points()
+    versions = collection_versions(client, alias)
+
+    checkpoint = None if fresh else Checkpoint.load(checkpoint_path)
+    if checkpoint and checkpoint.collection_name in versions.values():
+        print(f"Resuming {checkpoint.collection_name} from offset {checkpoint.offset}/{total}")
+    else:
+        collection_name = f"{alias}_v{max(versions, default=0) + 1}"
+        checkpoint = Checkpoint(checkpoint_path, collection_name)
+        print("Reading dimension...")
+        vector_dim = get_vector_dim()
+        # indexing_threshold=0: no HNSW building while bulk loading
+        create_collection(client, vector_dim, collection_name, indexing_threshold=0, **(collection_options or {}))
+    collection_name = checkpoint.collection_name
+
+    points = iter_points(checkpoint.offset)
+    if payload_text:
+        texts = load_payload_texts(payload_text)
+        print(f"Storing display text of {len(texts)} verses in the payloads")
+        points = with_payload_texts(points, texts)
+
+    print(f"Starting ingestion ({workers} workers, batches of {batch_size})...")
+    start = checkpoint.offset
+    started_at = time.perf_counter()
+    uploaded, errors = run_pipeline(
+        url, collection_name, points, start, total, batch_size, workers, queue_batches, checkpoint
+    )
+    if errors:
+        print(f"Ingestion stopped at committed offset {checkpoint.offset}; rerun to resume. Errors:")
+        for error in errors:
+            print(f"  {error}")
+        client.close()
+        raise SystemExit(1)
+
+    applied = wait_for_points(client, collection_name, total)
+    elapsed = time.perf_counter() - started_at
+    print(f"Uploaded {uploaded} points in {elapsed:.1f}s ({uploaded / elapsed:.0f} points/sec), {applied} in collection")
+
+    print("Building index...")
+    client.update_collection(
+        collection_name=collection_name,
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=INDEXING_THRESHOLD)
+    )
+    indexed = wait_for_optimizer(client, collection_name, applied)
+    print(f"Index ready in {time.perf_counter() - started_at - elapsed:.1f}s ({indexed} vectors indexed)")
+
+    swap_alias(client, alias, collection_name, drop_legacy)
+    checkpoint.clear()
+    prune_versions(client, alias)
+    client.close()
+
+    print(f"Embeddings ingested into the Qdrant ({alias} -> {collection_name})!")
 
 
 if __name__ == "__main__":
-    ingest_to_qdrant()
+    parser = argparse.ArgumentParser(description="Ingest Quran embeddings into Qdrant")
+    parser.add_argument("--url", default=QDRANT_URL)
+    parser.add_argument("--alias", default=COLLECTION_NAME, help="alias swapped to the new build")
+    # Default source: EMBEDDING_DIR when present, else EMBEDDING_FILE; naming one uses only that one
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--embeddings-file",
+                        help=f"JSONL source (default {EMBEDDING_FILE}), e.g. the Bukhari embeddings with --alias bukhari_hadith")
+    source.add_argument("--embeddings-dir", help=f"binary embedding set (default {EMBEDDING_DIR}, when present)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=UPLOAD_WORKERS)
+    parser.add_argument("--queue-batches", type=int, default=QUEUE_BATCHES)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    parser.add_argument("--fresh", action="store_true", help="ignore the checkpoint and start a new build")
+    parser.add_argument("--drop-legacy", action="store_true",
+                        help="delete a pre-alias collection named like the alias before the first swap")
+    parser.add_argument("--rollback", action="store_true", help="point the alias back at the previous build and exit")
+    parser.add_argument("--quantization", choices=["none", "scalar", "binary"], default=QUANTIZATION or "none")
+    parser.add_argument("--on-disk", action="store_true", default=VECTORS_ON_DISK, help="keep original vectors on disk")
+    parser.add_argument("--hnsw-m", type=int, default=HNSW_M)
+    parser.add_argument("--hnsw-ef-construct", type=int, default=HNSW_EF_CONSTRUCT)
+    parser.add_argument("--payload-text", default=PAYLOAD_TEXT_FILE,
+                        help="canonical Quran dataset; store its display text in the payloads")
+    args = parser.parse_args()
+    if args.embeddings_file:
+        EMBEDDING_FILE, EMBEDDING_DIR = args.embeddings_file, None
+    elif args.embeddings_dir:
+        if not EmbeddingSet.exists(args.embeddings_dir):
+            parser.error(f"no binary embedding set in {args.embeddings_dir}")
+        EMBEDDING_DIR = args.embeddings_dir
+
+    if args.rollback:
+        rollback(args.url, args.alias)
+    else:
+        ingest_to_qdrant(args.url, args.alias, args.batch_size, args.workers,
+                         args.queue_batches, args.checkpoint, args.fresh, args.drop_legacy,
+                         collection_options={
+                             "quantization": None if args.quantization == "none" else args.quantization,
+                             "on_disk": args.on_disk,
+                             "hnsw_m": args.hnsw_m,
+                             "hnsw_ef_construct": args.hnsw_ef_construct
+                         },
+                         payload_text=args.payload_text)
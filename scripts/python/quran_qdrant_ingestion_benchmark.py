@@ -0,0 +1,80 @@
+"""
+Ingestion throughput against a local Qdrant (dev/docker-compose.yml): the old
+sequential upsert(wait=True) loop vs the queued pipeline with N workers and wait=False.
+
+    python quran_qdrant_ingestion_benchmark.py --points 6236 --workers 1 2 4 8
+"""
+import argparse
+import time
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from quran_qdrant_ingestion import Checkpoint, create_collection, run_pipeline, wait_for_points
+
+VOCAB_SIZE = 250_002
+
+def synthetic_points(count, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        indices = np.unique(rng.integers(0, VOCAB_SIZE, size=rng.integers(8, 40)))
+        yield models.PointStruct(
+            id=i + 1,
+            vector={
+                "dense": rng.standard_normal(dim).astype(np.float32).tolist(),
+                "sparse": models.SparseVector(indices=indices.tolist(), values=rng.random(len(indices)).tolist())
+            },
+            payload={"quran_id": i + 1, "source": "Quran"}
+        )
+
+def sequential(client, collection_name, points, batch_size):
+    batch = []
+    for point in points:
+        batch.append(point)
+        if len(batch) >= batch_size:
+            client.upsert(collection_name=collection_name, points=batch, wait=True)
+            batch = []
+    if batch:
+        client.upsert(collection_name=collection_name, points=batch, wait=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Qdrant ingestion throughput benchmark")
+    parser.add_argument("--url", default="http://localhost:6333")
+    parser.add_argument("--points", type=int, default=6236)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--batch-size", type=int, default=300)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--queue-batches", type=int, default=8)
+    args = parser.parse_args()
+
+    collection_name = "bench_ingestion"
+    client = QdrantClient(url=args.url, timeout=60)
+    results = []
+
+    create_collection(client, args.dim, collection_name)
+    start = time.perf_counter()
+    sequential(client, collection_name, synthetic_points(args.points, args.dim), args.batch_size)
+    results.append(("sequential, wait=True", time.perf_counter() - start))
+
+    for workers in args.workers:
+        create_collection(client, args.dim, collection_name)
+        start = time.perf_counter()
+        _, errors = run_pipeline(
+            args.url, collection_name, synthetic_points(args.points, args.dim), 0, args.points,
+            args.batch_size, workers, args.queue_batches, Checkpoint(None, collection_name)
+        )
+        if errors:
+            raise SystemExit(f"{workers} workers failed: {errors}")
+        wait_for_points(client, collection_name, args.points)
+        results.append((f"pipeline, {workers} workers, wait=False", time.perf_counter() - start))
+
+    client.delete_collection(collection_name)
+    client.close()
+
+    print()
+    for label, elapsed in results:
+        print(f"{label:>36}: {args.points / elapsed:8.0f} points/sec ({elapsed:.2f}s)")
+
+if __name__ == "__main__":
+    main()
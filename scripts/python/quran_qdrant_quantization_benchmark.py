@@ -0,0 +1,151 @@
+"""
+Recall@k vs latency vs RAM for Qdrant collection storage options, against a local
+Qdrant (dev/docker-compose.yml). Each configuration is built with the ingestion
+script's create_collection, queried through the backend's dense leg
+(HybridQdrantService._search_dense) with several rescore/oversampling settings,
+and scored against exact NumPy cosine search.
+
+    python quran_qdrant_quantization_benchmark.py --embeddings Quran_Embeddings --queries 300
+    python quran_qdrant_quantization_benchmark.py --qdrant-pid $(pgrep -f qdrant)   # measured RSS too
+
+RAM is estimated from the configuration (originals + quantized vectors + HNSW links);
+with --qdrant-pid the RSS growth of the Qdrant process is printed as well.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http import models
+
+from quran_qdrant_ingestion import create_collection, wait_for_optimizer, wait_for_points
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend"))
+from services.qdrant_service import HybridQdrantService  # noqa: E402
+from utils.embedding_format import EmbeddingSet  # noqa: E402
+
+COLLECTION = "bench_quantization"
+
+# (label, create_collection options)
+CONFIGS = [
+    ("float32 in RAM", {"quantization": None, "on_disk": False}),
+    ("float32 on disk", {"quantization": None, "on_disk": True}),
+    ("int8 RAM + originals on disk", {"quantization": "scalar", "on_disk": True}),
+    ("binary RAM + originals on disk", {"quantization": "binary", "on_disk": True}),
+    ("int8, m=32 ef_construct=200", {"quantization": "scalar", "on_disk": True, "hnsw_m": 32, "hnsw_ef_construct": 200}),
+]
+
+# (label, rescore, oversampling) for quantized collections
+QUERY_VARIANTS = [
+    ("no rescore", False, None),
+    ("rescore x1", True, 1.0),
+    ("rescore x2", True, 2.0),
+    ("rescore x4", True, 4.0),
+]
+
+def load_vectors(path, points, dim, seed=0):
+    """Corpus vectors from a binary embedding set, or clustered synthetic ones"""
+    if path:
+        return np.asarray(EmbeddingSet.open(path).dense, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(points // 50, 1), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), points)] + 0.6 * rng.standard_normal((points, dim)).astype(np.float32)
+    return vectors
+
+def make_queries(vectors, count, seed=1):
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(vectors), count)
+    noise = 0.3 * np.linalg.norm(vectors[rows], axis=1, keepdims=True) / np.sqrt(vectors.shape[1])
+    return vectors[rows] + noise * rng.standard_normal((count, vectors.shape[1])).astype(np.float32)
+
+def exact_top_k(vectors, queries, k):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    return np.argsort(-(q @ normed.T), axis=1)[:, :k] + 1   # point ids are row + 1
+
+def estimated_ram_mb(count, dim, options):
+    originals = 0 if options.get("on_disk") else count * dim * 4
+    quantized = {"scalar": count * dim, "binary": count * dim / 8}.get(options.get("quantization"), 0)
+    links = count * options.get("hnsw_m", 16) * 2 * 4   # level-0 graph dominates
+    return (originals + quantized + links) / 1e6
+
+def rss_mb(pid):
+    if not pid:
+        return None
+    with open(f"/proc/{pid}/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+def build(client, vectors, options, batch_size=256):
+    create_collection(client, vectors.shape[1], COLLECTION, **options)
+    for start in range(0, len(vectors), batch_size):
+        client.upsert(
+            collection_name=COLLECTION,
+            points=[
+                models.PointStruct(id=i + 1, vector={"dense": vectors[i].tolist()}, payload={"quran_id": i + 1})
+                for i in range(start, min(start + batch_size, len(vectors)))
+            ],
+            wait=False
+        )
+    wait_for_points(client, COLLECTION, len(vectors))
+    wait_for_optimizer(client, COLLECTION, len(vectors))
+
+async def measure(url, queries, truth, k, rescore, oversampling):
+    service = HybridQdrantService()
+    service.client = AsyncQdrantClient(url=url, timeout=60)
+    service._use_single_collection(COLLECTION)
+    service.search_params = models.SearchParams(
+        quantization=models.QuantizationSearchParams(rescore=rescore, oversampling=oversampling)
+    )
+    latencies, hits = [], 0
+    try:
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            points = await service._search_dense(query.tolist(), k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len({p.id for p in points} & set(expected.tolist()))
+    finally:
+        await service.client.close()
+    return hits / truth.size, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+def main():
+    parser = argparse.ArgumentParser(description="Qdrant quantization / on-disk benchmark")
+    parser.add_argument("--url", default="http://localhost:6333")
+    parser.add_argument("--embeddings", help="binary embedding set (default: synthetic)")
+    parser.add_argument("--points", type=int, default=6236)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--qdrant-pid", type=int, help="Qdrant process id on this host, for measured RSS")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.embeddings, args.points, args.dim)
+    queries = make_queries(vectors, args.queries)
+    truth = exact_top_k(vectors, queries, args.top_k)
+    client = QdrantClient(url=args.url, timeout=120)
+
+    print(f"{len(vectors)} x {vectors.shape[1]} vectors, {len(queries)} queries, recall@{args.top_k}\n")
+    print(f"{'configuration':>32} {'query':>11} {'recall':>7} {'p50 ms':>7} {'p99 ms':>7} {'est RAM MB':>10} {'RSS +MB':>8}")
+    for label, options in CONFIGS:
+        if client.collection_exists(COLLECTION):
+            client.delete_collection(COLLECTION)
+        before = rss_mb(args.qdrant_pid)
+        build(client, vectors, options)
+        variants = QUERY_VARIANTS if options.get("quantization") else [("exact vectors", False, None)]
+        for query_label, rescore, oversampling in variants:
+            recall, p50, p99 = asyncio.run(measure(args.url, queries, truth, args.top_k, rescore, oversampling))
+            after = rss_mb(args.qdrant_pid)
+            growth = f"{after - before:8.1f}" if before is not None else f"{'-':>8}"
+            print(f"{label:>32} {query_label:>11} {recall:7.3f} {p50:7.2f} {p99:7.2f} "
+                  f"{estimated_ram_mb(len(vectors), vectors.shape[1], options):10.1f} {growth}")
+
+    client.delete_collection(COLLECTION)
+    client.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+-- 1) Main canonical table
+CREATE TABLE IF NOT EXISTS bukhari_hadith (
+    hadith_id       INT PRIMARY KEY,
+    book_id         INT,
+    chapter_id      INT,
+    source          VARCHAR(50) DEFAULT 'Hadith',
+    book            VARCHAR(100) DEFAULT 'Sahih Bukhari',
+    chapter_name_ar VARCHAR(500),
+    chapter_name_ur VARCHAR(500),
+    chapter_name_en VARCHAR(500),
+    narrator        TEXT,
+    status          VARCHAR(50),
+    text_ar         TEXT,
+    text_ur         TEXT,
+    text_en         TEXT,
+    content_hash    CHAR(32)      -- md5 of the content columns, set by the COPY merge
+);
+
+-- 2) Indexes for fast filters
+CREATE INDEX IF NOT EXISTS idx_bukhari_book_id    ON bukhari_hadith (book_id);
+CREATE INDEX IF NOT EXISTS idx_bukhari_chapter_id ON bukhari_hadith (chapter_id);
+CREATE INDEX IF NOT EXISTS idx_bukhari_status     ON bukhari_hadith (status);
@@ -12,9 +12,13 @@ CREATE TABLE IF NOT EXISTS quran_ayah (
     surah_type      VARCHAR(50),
     text_ar         TEXT,
     text_ur         TEXT,
-    text_en         TEXT
+    text_en         TEXT,
+    content_hash    CHAR(32)      -- md5 of the content columns, set by the COPY merge
 );
 
+-- Existing tables created before content_hash
+ALTER TABLE quran_ayah ADD COLUMN IF NOT EXISTS content_hash CHAR(32);
+
 -- 2) Indexes for fast filters
 CREATE INDEX IF NOT EXISTS idx_quran_surah_id ON quran_ayah (surah_id);
 CREATE INDEX IF NOT EXISTS idx_quran_juz_id   ON quran_ayah (juz_id);